@@ -1,6 +1,15 @@
-from fastapi import FastAPI
-from supabase import create_client, Client
+"""
+This package handles authentication, and holds the Supabase configuration shared by the whole backend.
+
+The Supabase client is only created the first time `get_supabase()` is called:
+importing the `supabase` package and building its auth, storage and realtime
+sub-clients is one of the slowest parts of a cold start, and most requests
+(everything that only reads the database) never need it.
+"""
+
 import os
+from functools import lru_cache
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,7 +17,11 @@ load_dotenv()
 # Supabase configuration
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-# FastAPI app
-app = FastAPI()
\ No newline at end of file
+
+@lru_cache(maxsize=None)
+def get_supabase():
+    """Returns the shared Supabase client, creating it on first use."""
+    from supabase import create_client
+
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
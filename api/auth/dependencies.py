@@ -8,18 +8,28 @@ logged-in user.
 
 from fastapi import Depends, HTTPException, Query
 from fastapi.security import OAuth2PasswordBearer
-from auth import supabase
+from auth.models import User
+from auth.verifier import InvalidToken, verifier
 
 # This is the scheme that FastAPI uses to know how to handle the authentication.
 # We are telling it that the token will be sent in the authorization header as a Bearer token.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def _unauthorized() -> HTTPException:
+    return HTTPException(
+        status_code=401,
+        detail="Invalid authentication credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     """
     This is a dependency function that gets the currently logged-in user.
 
-    It takes the JWT access token from the request's Authorization header, sends it
-    to Supabase to verify it, and returns the user's information if the token is valid.
+    It takes the JWT access token from the request's Authorization header, verifies
+    its signature, expiry and audience locally, and returns the user's information
+    if the token is valid. No request is made to Supabase for tokens we have
+    already seen.
 
     If the token is invalid, it raises an HTTPException, which tells the client
     that they are not authorized.
@@ -28,28 +38,41 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         token: The JWT access token from the request's Authorization header.
 
     Returns:
-        The user object from Supabase if the token is valid.
+        The User built from the token's claims.
     """
     try:
-        # Send the token to Supabase to get the user information
-        user_response = supabase.auth.get_user(token)
-        # The actual user data is in the .user attribute of the response
-        return user_response.user
-    except Exception as e:
+        return await verifier.verify(token)
+    except InvalidToken:
         # If anything goes wrong (e.g., the token is invalid or expired),
         # we raise an HTTPException to let the client know they are not authorized.
-        raise HTTPException(
-            status_code=401,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized()
 
-async def get_current_user_ws(token: str = Query(...)):
+async def get_current_user_verified(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    This is a dependency function that gets the currently logged-in user, checked by Supabase.
+
+    Unlike get_current_user, it sends the token to Supabase on every request, so it
+    also rejects tokens that were revoked before they expired. Use it only for
+    routes where that matters (e.g. changing a password).
+
+    Args:
+        token: The JWT access token from the request's Authorization header.
+
+    Returns:
+        The User returned by Supabase if the token is valid.
+    """
+    try:
+        return await verifier.verify_remote(token)
+    except InvalidToken:
+        raise _unauthorized()
+
+async def get_current_user_ws(token: str = Query(...)) -> User:
     """
     This is a dependency function that gets the currently logged-in user for websockets.
 
-    It takes the JWT access token from the query parameters, sends it
-    to Supabase to verify it, and returns the user's information if the token is valid.
+    It takes the JWT access token from the query parameters, verifies it locally
+    in the same way as get_current_user, and returns the user's information if
+    the token is valid.
 
     If the token is invalid, it raises an HTTPException, which tells the client
     that they are not authorized.
@@ -58,18 +81,9 @@ async def get_current_user_ws(token: str = Query(...)):
         token: The JWT access token from the query parameters.
 
     Returns:
-        The user object from Supabase if the token is valid.
+        The User built from the token's claims.
     """
     try:
-        # Send the token to Supabase to get the user information
-        user_response = supabase.auth.get_user(token)
-        # The actual user data is in the .user attribute of the response
-        return user_response.user
-    except Exception as e:
-        # If anything goes wrong (e.g., the token is invalid or expired),
-        # we raise an HTTPException to let the client know they are not authorized.
-        raise HTTPException(
-            status_code=401,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        return await verifier.verify(token)
+    except InvalidToken:
+        raise _unauthorized()
@@ -6,10 +6,12 @@ It provides endpoints for users to request a password reset link and to update
 their password after they have been authenticated with a temporary token.
 """
 
+import httpx
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from auth import supabase
-from auth.dependencies import get_current_user
+from auth import SUPABASE_KEY, SUPABASE_URL, get_supabase
+from metrics import track_upstream
+from auth.dependencies import get_current_user_verified, oauth2_scheme
 
 # Create a new router for the forgot password endpoints
 router = APIRouter()
@@ -27,7 +29,7 @@ class UpdatePassword(BaseModel):
 # --- API Endpoints ---
 
 @router.post("/forgot-password")
-async def request_password_reset(payload: ForgotPassword):
+def request_password_reset(payload: ForgotPassword):
     """
     Sends a password reset link to the user's email address.
 
@@ -36,14 +38,16 @@ async def request_password_reset(payload: ForgotPassword):
     """
     try:
         # Use the Supabase client to send a password reset email.
-        supabase.auth.reset_password_email(payload.email)
+        with track_upstream("auth", "reset_password_email"):
+            get_supabase().auth.reset_password_email(payload.email)
         return {"message": "Password reset email sent. Please check your inbox."}
     except Exception as e:
         # If anything goes wrong, raise an HTTPException.
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/update-password")
-async def update_user_password(payload: UpdatePassword, current_user = Depends(get_current_user)):
+async def update_user_password(payload: UpdatePassword, current_user = Depends(get_current_user_verified),
+                               token: str = Depends(oauth2_scheme)):
     """
     Updates the user's password.
 
@@ -51,13 +55,26 @@ async def update_user_password(payload: UpdatePassword, current_user = Depends(g
     their email and has been redirected back to the application. The user will
     be authenticated with a temporary token, which is used to authorize this request.
     """
+    # The get_current_user_verified dependency checks the token with Supabase, so a
+    # revoked reset token cannot be reused. The password is then changed with that
+    # same token, not with the session of the shared Supabase client, which belongs
+    # to whoever signed in last.
     try:
-        # The get_current_user dependency will handle the token verification.
-        # If the token is valid, we can update the user's password.
-        supabase.auth.update_user({"password": payload.password})
-        return {"message": "Password updated successfully."}
-    except Exception as e:
-        # If the token is invalid or expired, the get_current_user dependency will
-        # raise an HTTPException, so we don't need to handle it here.
-        # This catch block is for any other unexpected errors.
+        with track_upstream("auth", "update_user"):
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.put(
+                    f"{SUPABASE_URL.rstrip('/')}/auth/v1/user",
+                    json={"password": payload.password},
+                    headers={"apikey": SUPABASE_KEY, "Authorization": f"Bearer {token}"},
+                )
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if response.status_code == 401:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials",
+                            headers={"WWW-Authenticate": "Bearer"})
+    if response.is_error:
+        # Supabase rejects weak or unchanged passwords with a 4xx and a message for the user.
+        body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+        detail = body.get("msg") or body.get("message") or body.get("error_description") or response.text
+        raise HTTPException(status_code=400 if response.status_code < 500 else 500, detail=detail)
+    return {"message": "Password updated successfully."}
@@ -7,7 +7,8 @@ JWT access token that can be used to authenticate with the API.
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from auth import supabase
+from auth import get_supabase
+from metrics import track_upstream
 
 # Create a new router for the login endpoints
 router = APIRouter()
@@ -27,7 +28,7 @@ class UserLogin(BaseModel):
 # --- API Endpoints ---
 
 @router.post("/login", response_model=Token)
-async def login_and_get_token(user: UserLogin):
+def login_and_get_token(user: UserLogin):
     """
     Logs in a user with their email and password.
 
@@ -35,10 +36,11 @@ async def login_and_get_token(user: UserLogin):
     """
     try:
         # Use the Supabase client to sign in the user with their email and password
-        response = supabase.auth.sign_in_with_password({
-            "email": user.email,
-            "password": user.password,
-        })
+        with track_upstream("auth", "sign_in_with_password"):
+            response = get_supabase().auth.sign_in_with_password({
+                "email": user.email,
+                "password": user.password,
+            })
 
         # Extract the access token from the response
         access_token = response.session.access_token
@@ -0,0 +1,20 @@
+"""
+This file handles the endpoint that tells a logged-in user who they are.
+"""
+
+from fastapi import APIRouter, Depends
+from auth.dependencies import get_current_user
+from auth.models import User
+
+# Create a new router for the current user endpoint
+router = APIRouter()
+
+
+@router.get("/users/me", response_model=User)
+async def read_current_user_info(current_user: User = Depends(get_current_user)):
+    """
+    Get the basic information for the currently logged-in user.
+
+    This is a protected endpoint and requires a valid JWT access token.
+    """
+    return {"id": current_user.id, "email": current_user.email}
@@ -10,7 +10,8 @@ The signup process involves two steps:
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from auth import supabase
+from auth import get_supabase
+from metrics import track_upstream
 
 # Create a new router for the signup endpoints
 router = APIRouter()
@@ -31,7 +32,7 @@ class OtpVerify(BaseModel):
 # --- API Endpoints ---
 
 @router.post("/signup")
-async def start_signup_and_send_otp(user: UserCreate):
+def start_signup_and_send_otp(user: UserCreate):
     """
     Starts the signup process for a new user.
 
@@ -42,22 +43,23 @@ async def start_signup_and_send_otp(user: UserCreate):
         # Use the Supabase client to sign up the user.
         # Supabase will automatically send an email with an OTP to the user.
         # The user's name is stored in the raw_user_meta_data field in Supabase.
-        response = supabase.auth.sign_up({
-            "email": user.email,
-            "password": user.password,
-            "options": {
-                "data": {
-                    "name": user.name
+        with track_upstream("auth", "sign_up"):
+            response = get_supabase().auth.sign_up({
+                "email": user.email,
+                "password": user.password,
+                "options": {
+                    "data": {
+                        "name": user.name
+                    }
                 }
-            }
-        })
+            })
         return {"message": "Sign-up request successful. An OTP has been sent to your email."}
     except Exception as e:
         # If the signup fails (e.g., the user already exists), raise an HTTPException.
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/verify-otp")
-async def complete_signup_with_otp(payload: OtpVerify):
+def complete_signup_with_otp(payload: OtpVerify):
     """
     Completes the signup process by verifying the user's email with an OTP.
 
@@ -67,11 +69,12 @@ async def complete_signup_with_otp(payload: OtpVerify):
     """
     try:
         # Use the Supabase client to verify the OTP.
-        response = supabase.auth.verify_otp({
-            "type": "email",
-            "email": payload.email,
-            "token": payload.token,
-        })
+        with track_upstream("auth", "verify_otp"):
+            response = get_supabase().auth.verify_otp({
+                "type": "email",
+                "email": payload.email,
+                "token": payload.token,
+            })
         return {"message": "Email verification successful. You can now log in."}
     except Exception as e:
         # If the OTP is incorrect, raise an HTTPException.
@@ -0,0 +1,172 @@
+"""
+This file verifies Supabase access tokens locally, without a round trip to Supabase.
+
+Supabase access tokens are JWTs signed either with the project's JWT secret
+(HS256) or with an asymmetric key published at the project's JWKS endpoint
+(RS256/ES256). We check the signature, the expiry and the audience ourselves
+and build the `User` straight from the token's claims.
+
+Verified tokens are cached by their SHA-256 hash until they expire, so repeated
+requests with the same token only pay for a dictionary lookup. Because a locally
+verified token stays valid until it expires even if the user signs out, routes
+that must honour revocation (e.g. changing a password) should use
+`verify_remote` instead.
+"""
+
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import jwt
+from starlette.concurrency import run_in_threadpool
+
+from auth import SUPABASE_URL, get_supabase
+from auth.models import User
+from cache import TTLCache
+from metrics import track_upstream
+
+# The secret used to sign HS256 tokens. Found under Project Settings > API in Supabase.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+# The audience Supabase puts in the tokens of signed-in users.
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", f"{(SUPABASE_URL or '').rstrip('/')}/auth/v1/.well-known/jwks.json")
+# How long the signing keys from the JWKS endpoint are trusted before they are fetched again.
+JWKS_CACHE_SECONDS = float(os.getenv("JWKS_CACHE_SECONDS", "600"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# Tolerated clock difference between us and Supabase, in seconds.
+JWT_LEEWAY = float(os.getenv("JWT_LEEWAY", "10"))
+
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+
+class InvalidToken(Exception):
+    """Raised when a token cannot be verified."""
+
+
+class TokenVerifier:
+    """Verifies access tokens and caches the resulting users until their tokens expire."""
+
+    def __init__(self, secret: Optional[str] = SUPABASE_JWT_SECRET, audience: str = SUPABASE_JWT_AUDIENCE,
+                 jwks_url: str = SUPABASE_JWKS_URL, cache_size: int = AUTH_CACHE_SIZE):
+        self.secret = secret
+        self.audience = audience
+        self.jwks_url = jwks_url
+        self.users = TTLCache(maxsize=cache_size)
+        self._jwks: Dict[str, Any] = {}
+        self._jwks_fetched_at = 0.0
+        self._warned_no_secret = False
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        # The cache is keyed by a hash so raw tokens are never kept in memory longer than needed.
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def verify(self, token: str) -> User:
+        """Returns the user a token belongs to, raising InvalidToken if it is not valid."""
+        key = self.token_key(token)
+        user = self.users.get(key)
+        if user is not None:
+            return user
+
+        claims = await self.decode(token)
+        user = user_from_claims(claims)
+        self.users.set(key, user, ttl=claims["exp"] - time.time())
+        return user
+
+    async def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+
+        algorithm = header.get("alg")
+        if algorithm == "HS256":
+            if not self.secret:
+                # Without the secret we cannot check the signature ourselves, so ask Supabase.
+                if not self._warned_no_secret:
+                    logging.warning("SUPABASE_JWT_SECRET is not set; falling back to remote token verification.")
+                    self._warned_no_secret = True
+                return await self.decode_remote(token)
+            signing_key: Any = self.secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            signing_key = await self.get_signing_key(header.get("kid"))
+        else:
+            raise InvalidToken(f"Unsupported token algorithm: {algorithm}")
+
+        try:
+            return jwt.decode(
+                token,
+                signing_key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                leeway=JWT_LEEWAY,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+
+    async def get_signing_key(self, kid: Optional[str]) -> Any:
+        """Returns the public key for `kid`, refreshing the JWKS when the key is unknown or stale."""
+        age = time.monotonic() - self._jwks_fetched_at
+        # Unknown keys trigger a refresh (keys get rotated), but at most every few seconds
+        # so that tokens with made-up key ids cannot make us hammer the JWKS endpoint.
+        if age > JWKS_CACHE_SECONDS or (kid not in self._jwks and age > 5):
+            await self.refresh_jwks()
+        if kid not in self._jwks:
+            raise InvalidToken("Unknown signing key")
+        return self._jwks[kid]
+
+    async def refresh_jwks(self):
+        # Failed fetches count too, so that the throttle in get_signing_key also holds while the endpoint is down.
+        self._jwks_fetched_at = time.monotonic()
+        try:
+            with track_upstream("auth", "jwks") as call:
+                async with httpx.AsyncClient(timeout=5) as client:
+                    response = await client.get(self.jwks_url)
+                    call.response_size = len(response.content)
+                    response.raise_for_status()
+                    keys = response.json().get("keys", [])
+        except (httpx.HTTPError, ValueError, AttributeError) as e:
+            logging.error(f"Failed to fetch JWKS from {self.jwks_url}: {e}")
+            return
+
+        # A key we can't use (unsupported type or algorithm, malformed) is skipped rather than failing every token.
+        jwks = {}
+        for k in keys if isinstance(keys, list) else []:
+            try:
+                jwks[k.get("kid")] = jwt.PyJWK(k).key
+            except (jwt.PyJWTError, AttributeError, TypeError, ValueError) as e:
+                logging.warning(f"Skipping a signing key from {self.jwks_url}: {e}")
+        self._jwks = jwks
+
+    async def decode_remote(self, token: str) -> Dict[str, Any]:
+        """Asks Supabase for the user and returns it as a minimal set of claims."""
+        user = await self.verify_remote(token)
+        # Remote answers cannot tell us the expiry, so only trust them for a short while.
+        return {"sub": user.id, "email": user.email, "exp": time.time() + 60}
+
+    async def verify_remote(self, token: str) -> User:
+        """
+        Verifies a token with Supabase itself.
+
+        Unlike `verify`, this notices tokens that were revoked before they expired
+        (e.g. after a sign out), at the cost of a network round trip.
+        """
+        try:
+            with track_upstream("auth", "get_user"):
+                response = await run_in_threadpool(get_supabase().auth.get_user, token)
+        except Exception as e:
+            raise InvalidToken(str(e))
+        if not response or not response.user:
+            raise InvalidToken("User not found")
+        return User(id=str(response.user.id), email=response.user.email or "")
+
+
+def user_from_claims(claims: Dict[str, Any]) -> User:
+    return User(id=str(claims["sub"]), email=claims.get("email") or "")
+
+
+verifier = TokenVerifier()
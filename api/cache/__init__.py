@@ -0,0 +1,8 @@
+"""
+This package contains the caches shared across the TeamJoin backend.
+"""
+
+from .memory import TTLCache
+from .backends import get_backend
+from .ideas import idea_cache
+from .profiles import profile_cache
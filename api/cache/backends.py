@@ -0,0 +1,118 @@
+"""
+This file contains the storage backends for the shared caches.
+
+Two backends are available, selected with the CACHE_BACKEND environment variable:
+
+- "memory" (the default) keeps entries in a TTL+LRU cache inside the process.
+  It needs nothing extra, but every worker has its own copy, so an invalidation
+  in one worker only reaches the others when their entries expire.
+- "redis" keeps entries in any Redis-compatible server at REDIS_URL, shared by
+  all workers, so invalidations take effect everywhere at once. It needs the
+  optional `redis` package (`pip install redis`).
+
+Both backends have the same async interface, and values must be JSON-serializable.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from .memory import TTLCache
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "teamjoin:")
+
+
+class MemoryBackend:
+    """Keeps entries in this process only."""
+
+    def __init__(self, maxsize: int = CACHE_MAX_ENTRIES):
+        self.entries = TTLCache(maxsize=maxsize)
+
+    async def get(self, key: str) -> Any:
+        return self.entries.get(key)
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        return [self.entries.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self.entries.set(key, value, ttl=ttl)
+
+    async def set_many(self, items: Dict[str, Any], ttl: float):
+        for key, value in items.items():
+            self.entries.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.entries.delete(key)
+
+
+class RedisBackend:
+    """Keeps entries in a Redis-compatible server shared by all workers."""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = REDIS_KEY_PREFIX):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package: pip install redis")
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Any:
+        try:
+            raw = await self.client.get(self.prefix + key)
+        except Exception as e:
+            # A cache outage must never take the API down with it; fall through to the database.
+            logging.error(f"Redis get failed for {key}: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        if not keys:
+            return []
+        try:
+            raws = await self.client.mget([self.prefix + key for key in keys])
+        except Exception as e:
+            logging.error(f"Redis mget failed for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+        return [json.loads(raw) if raw is not None else None for raw in raws]
+
+    async def set(self, key: str, value: Any, ttl: float):
+        try:
+            await self.client.set(self.prefix + key, json.dumps(value), px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            logging.error(f"Redis set failed for {key}: {e}")
+
+    async def set_many(self, items: Dict[str, Any], ttl: float):
+        if not items:
+            return
+        try:
+            # One round trip for all the entries.
+            pipeline = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipeline.set(self.prefix + key, json.dumps(value), px=max(1, int(ttl * 1000)))
+            await pipeline.execute()
+        except Exception as e:
+            logging.error(f"Redis set failed for {len(items)} keys: {e}")
+
+    async def delete(self, *keys: str):
+        if not keys:
+            return
+        try:
+            await self.client.delete(*(self.prefix + key for key in keys))
+        except Exception as e:
+            logging.error(f"Redis delete failed for {keys}: {e}")
+
+
+_backend: Optional[Any] = None
+
+
+def get_backend():
+    """Returns the configured backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        _backend = RedisBackend() if CACHE_BACKEND == "redis" else MemoryBackend()
+    return _backend
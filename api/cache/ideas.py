@@ -0,0 +1,95 @@
+"""
+This file contains the read-through cache for ideas and their memberships.
+
+The idea detail view and every chat authorization check need the same few
+facts: the idea record, who owns it and who its accepted members are. They are
+read through this cache, so for a hot idea none of them costs a database hop.
+
+Entries are invalidated explicitly by the code paths that change them (creating
+an idea, joining one and accepting or rejecting a join request). The TTLs only
+bound how stale an entry can get if a change happens elsewhere (e.g. directly in
+the database, or in another worker when the in-memory backend is used).
+"""
+
+import os
+from typing import Any, Dict, Optional, Set
+
+import db
+from db.repositories import IDEA_COLUMNS
+from .backends import get_backend
+
+IDEA_CACHE_TTL = float(os.getenv("IDEA_CACHE_TTL", "60"))
+MEMBERS_CACHE_TTL = float(os.getenv("MEMBERS_CACHE_TTL", "30"))
+# An idea never changes owner, so the owner can be kept much longer.
+OWNER_CACHE_TTL = float(os.getenv("OWNER_CACHE_TTL", "3600"))
+
+# The idea record together with all of its members, as shown on the detail page.
+IDEA_DETAIL_COLUMNS = f"{IDEA_COLUMNS},members:idea_members(*)"
+
+
+def _idea_key(idea_id: str) -> str:
+    return f"idea:{idea_id}"
+
+
+def _owner_key(idea_id: str) -> str:
+    return f"idea_owner:{idea_id}"
+
+
+def _chat_key(idea_id: str) -> str:
+    return f"idea_chat:{idea_id}"
+
+
+class IdeaCache:
+    """Reads idea records, owners and accepted members through the configured cache backend."""
+
+    async def get_idea(self, idea_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the idea with its members embedded, or None if it does not exist."""
+        backend = get_backend()
+        idea = await backend.get(_idea_key(idea_id))
+        if idea is None:
+            idea = await db.ideas.get(idea_id, columns=IDEA_DETAIL_COLUMNS)
+            if idea is None:
+                return None
+            await backend.set(_idea_key(idea_id), idea, IDEA_CACHE_TTL)
+            await backend.set(_owner_key(idea_id), idea["user_id"], OWNER_CACHE_TTL)
+        return idea
+
+    async def get_owner_id(self, idea_id: str) -> Optional[str]:
+        backend = get_backend()
+        owner_id = await backend.get(_owner_key(idea_id))
+        if owner_id is None:
+            # Through the request's loader, so concurrent owner lookups share one query.
+            idea = await db.loaders().ideas.load(idea_id)
+            if idea is None:
+                return None
+            owner_id = idea["user_id"]
+            await backend.set(_owner_key(idea_id), owner_id, OWNER_CACHE_TTL)
+        return owner_id
+
+    async def get_chat_member_ids(self, idea_id: str) -> Set[str]:
+        """
+        Returns the IDs of everyone allowed in the idea's chat: its owner and its accepted members.
+
+        On a miss, the owner and the members are read together in a single query.
+        """
+        backend = get_backend()
+        member_ids = await backend.get(_chat_key(idea_id))
+        if member_ids is None:
+            members = await db.ideas.get_chat_members(idea_id)
+            if members is None:
+                return set()
+            member_ids = [members["user_id"]] + members["member_ids"]
+            await backend.set(_chat_key(idea_id), member_ids, MEMBERS_CACHE_TTL)
+            await backend.set(_owner_key(idea_id), members["user_id"], OWNER_CACHE_TTL)
+        return set(member_ids)
+
+    async def invalidate(self, idea_id: str):
+        """Forgets everything cached about an idea. Call it after any write to the idea or its members."""
+        await get_backend().delete(_idea_key(idea_id), _owner_key(idea_id), _chat_key(idea_id))
+
+    async def invalidate_members(self, idea_id: str):
+        """Forgets the idea's members, but keeps its owner."""
+        await get_backend().delete(_idea_key(idea_id), _chat_key(idea_id))
+
+
+idea_cache = IdeaCache()
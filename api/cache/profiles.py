@@ -0,0 +1,86 @@
+"""
+This file contains the read-through cache of user profiles used to look up many profiles at once.
+
+Member lists, chat participants and search results all need the names and
+avatars of many users at a time. `get_many` deduplicates the requested IDs,
+serves the ones it has from the cache in a single lookup, and loads the rest
+from the database in chunks that run concurrently, so a large roster costs one
+short round trip instead of one huge query.
+
+Users without a profile are remembered too, so that they don't cost a query
+every time. Entries are invalidated when a profile is created or updated.
+"""
+
+import asyncio
+import os
+import uuid
+from typing import Any, Dict, Iterable, List
+
+import db
+from .backends import get_backend
+
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+# The number of profiles asked for per query when loading cache misses.
+PROFILE_BATCH_CHUNK_SIZE = int(os.getenv("PROFILE_BATCH_CHUNK_SIZE", "50"))
+
+# Cached for users who have no profile. It is compared by value, since it comes
+# back from the cache backend as a new object (e.g. decoded from Redis).
+_NO_PROFILE = {"__missing__": True}
+
+
+def _profile_key(user_id: str) -> str:
+    return f"profile:{user_id}"
+
+
+def _normalize(user_ids: Iterable[str]) -> List[str]:
+    """Returns the IDs in their canonical lowercase form, once each. IDs that aren't UUIDs are dropped."""
+    normalized = []
+    for user_id in user_ids:
+        try:
+            normalized.append(str(uuid.UUID(str(user_id))))
+        except ValueError:
+            continue
+    return list(dict.fromkeys(normalized))
+
+
+class ProfileCache:
+    """Reads profiles by user ID through the configured cache backend."""
+
+    async def get_many(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the profiles of the given users, keyed by their canonical (lowercase) user ID.
+
+        Users without a profile are left out. Each ID is looked up once, however
+        many times and in whatever case it is given.
+        """
+        user_ids = _normalize(user_ids)
+        if not user_ids:
+            return {}
+        backend = get_backend()
+        cached = await backend.get_many([_profile_key(user_id) for user_id in user_ids])
+
+        profiles: Dict[str, Dict[str, Any]] = {}
+        misses: List[str] = []
+        for user_id, profile in zip(user_ids, cached):
+            if profile is None:
+                misses.append(user_id)
+            elif profile != _NO_PROFILE:
+                profiles[user_id] = profile
+
+        if misses:
+            chunks = [misses[i:i + PROFILE_BATCH_CHUNK_SIZE] for i in range(0, len(misses), PROFILE_BATCH_CHUNK_SIZE)]
+            results = await asyncio.gather(*(db.profiles.list_by_ids(chunk) for chunk in chunks))
+            loaded = {str(uuid.UUID(str(row["uuid"]))): row for rows in results for row in rows}
+            await backend.set_many(
+                {_profile_key(user_id): loaded.get(user_id, _NO_PROFILE) for user_id in misses},
+                PROFILE_CACHE_TTL,
+            )
+            profiles.update(loaded)
+        return profiles
+
+    async def invalidate(self, user_id: str):
+        """Forgets the cached profile of a user. Call it after creating or updating the profile."""
+        await get_backend().delete(_profile_key(str(uuid.UUID(str(user_id)))))
+
+
+profile_cache = ProfileCache()
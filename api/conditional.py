@@ -0,0 +1,111 @@
+"""
+This file contains conditional GET support (ETag, Last-Modified and 304 Not Modified) for the read endpoints.
+
+Clients poll the feed, ideas, profiles and teams. When nothing changed, they
+send back the validators of the copy they have, and get an empty
+`304 Not Modified` instead of the same body again, which also skips validating
+and serializing it.
+
+- The ETag is a hash of the data the endpoint is about to return, so it changes
+  exactly when the data does. Hashing the raw rows is much cheaper than
+  building the response. It is a weak ETag, because it identifies the data
+  rather than the exact bytes of the body.
+- Rows have no `updated_at` column, so Last-Modified is the time this worker
+  first served the current version of a resource. A new version always gets a
+  later time than the one it replaces. If-Modified-Since is only looked at when
+  the request has no If-None-Match, as RFC 9110 requires.
+
+Public resources are sent with `Cache-Control: public` so that a CDN in front of
+the deployment can absorb repeat reads. Per-user resources are `private` and
+must be revalidated on every use.
+"""
+
+import hashlib
+import math
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+from cache import TTLCache
+from serialization import dumps, fast_response
+
+# How long browsers may reuse a public response without asking again, and how long a CDN may.
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+HTTP_CACHE_SHARED_MAX_AGE = int(os.getenv("HTTP_CACHE_SHARED_MAX_AGE", "5"))
+# How many resources the first-served times are remembered for.
+HTTP_CACHE_VERSIONS = int(os.getenv("HTTP_CACHE_VERSIONS", "10000"))
+
+# Resource key -> (ETag, Last-Modified as a Unix time in whole seconds).
+_versions = TTLCache(maxsize=HTTP_CACHE_VERSIONS, ttl=24 * 3600)
+
+
+def compute_etag(content: Any) -> str:
+    return f'W/"{hashlib.blake2b(dumps(content), digest_size=16).hexdigest()}"'
+
+
+def _last_modified(key: str, etag: str) -> int:
+    version = _versions.get(key)
+    if version is not None and version[0] == etag:
+        return version[1]
+    # HTTP dates have a one-second resolution, so make sure a new version never
+    # shares its second with the one it replaces.
+    modified = math.ceil(time.time())
+    if version is not None:
+        modified = max(modified, version[1] + 1)
+    _versions.set(key, (etag, modified))
+    return modified
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: `W/"x"` and `"x"` are the same validator.
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: str, modified: int) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return modified <= since
+
+
+def conditional_response(request: Request, response: Response, response_type: Any, content: Any,
+                         trusted: bool = False, private_to: Optional[str] = None) -> Any:
+    """
+    Returns `content` from a read endpoint, or a 304 if the client already has it.
+
+    Args:
+        request: The request, for its If-None-Match and If-Modified-Since headers.
+        response: The response FastAPI injected into the endpoint, which gets the
+            validators when `content` itself is returned.
+        response_type: The response model of the endpoint (see `fast_response`).
+        trusted: Whether `content` was built only from database rows (see `fast_response`).
+        private_to: The user the resource belongs to, for per-user resources.
+    """
+    etag = compute_etag(content)
+    key = f"{private_to or ''}:{request.url.path}?{request.url.query}"
+    modified = _last_modified(key, etag)
+    if private_to:
+        cache_control = "private, no-cache"
+    else:
+        cache_control = f"public, max-age={HTTP_CACHE_MAX_AGE}, s-maxage={HTTP_CACHE_SHARED_MAX_AGE}"
+    headers = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True), "Cache-Control": cache_control}
+    if private_to:
+        headers["Vary"] = "Authorization"
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if (_etag_matches(if_none_match, etag) if if_none_match is not None
+            else if_modified_since is not None and _not_modified_since(if_modified_since, modified)):
+        return Response(status_code=304, headers=headers)
+
+    result = fast_response(response_type, content, trusted=trusted)
+    target = result if isinstance(result, Response) else response
+    target.headers.update(headers)
+    return result
@@ -0,0 +1,32 @@
+"""
+This package is the async data access layer of the TeamJoin backend.
+
+Routers use the repositories exported here (`db.ideas`, `db.idea_members`,
+`db.profiles` and `db.messages`) instead of calling the synchronous Supabase
+client, so database round trips never block the event loop.
+
+The DB_BACKEND environment variable selects where the repositories send their queries:
+
+- "postgrest" (the default) goes through the Supabase REST API (see client.py).
+- "postgres" talks to the database directly through a pool of connections with
+  prepared statements (see postgres.py). It needs DATABASE_URL and the optional
+  `asyncpg` package.
+
+Lookups by ID should go through `loaders()` (see loader.py), which batches and
+memoizes them for the duration of a request.
+"""
+
+import os
+
+from .client import PostgrestError, get_client
+
+DB_BACKEND = os.getenv("DB_BACKEND", "postgrest")
+
+if DB_BACKEND == "postgres":
+    from .postgres import ideas, idea_members, profiles, messages
+    from .postgres import close_pool as close_client
+else:
+    from .repositories import ideas, idea_members, profiles, messages
+    from .client import close_client
+
+from .loader import LoaderMiddleware, loaders
@@ -0,0 +1,303 @@
+"""
+This file contains the async HTTP client used to talk to the Supabase REST API (PostgREST).
+
+The synchronous Supabase client blocks the event loop for the whole duration of
+every query, so a single slow round trip stalls every other request in the
+worker. This client is built on a single pooled `httpx.AsyncClient` with
+keep-alive and HTTP/2, so queries from many concurrent requests are multiplexed
+over a handful of connections without ever blocking the loop.
+
+The query builder deliberately mirrors the Supabase builder
+(`table(...).select(...).eq(...).execute()`) so the calling code reads the same
+as before, except that `execute()` must now be awaited.
+"""
+
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from auth import SUPABASE_URL, SUPABASE_KEY
+from metrics import track_upstream
+
+# Connection pool settings. These can be tuned per deployment through the environment.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+DB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DB_MAX_KEEPALIVE_CONNECTIONS", "20"))
+DB_KEEPALIVE_EXPIRY = float(os.getenv("DB_KEEPALIVE_EXPIRY", "30"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "10"))
+DB_HTTP2 = os.getenv("DB_HTTP2", "true").lower() == "true"
+
+
+class PostgrestError(Exception):
+    """Raised when PostgREST answers a query with an error status."""
+
+    def __init__(self, status_code: int, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.code = code
+
+
+class APIResponse:
+    """The result of a query. `data` holds the returned rows, `count` the total row count if requested."""
+
+    __slots__ = ("data", "count")
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def quote_value(value: Any) -> str:
+    """Formats a single filter value, quoting it if it contains PostgREST reserved characters."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    text = str(value)
+    if any(char in text for char in ',()":'):
+        escaped = text.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+    return text
+
+
+class QueryBuilder:
+    """
+    Builds a single PostgREST request for one table.
+
+    Every filter method returns the builder itself so calls can be chained, and
+    nothing is sent until `execute()` is awaited.
+    """
+
+    def __init__(self, client: "PostgrestClient", table: str):
+        self._client = client
+        self.table = table
+        self.method = "GET"
+        self.params: List[Tuple[str, str]] = []
+        self.headers: Dict[str, str] = {}
+        self.body: Any = None
+        self.columns = "*"
+        self.filters: List[Tuple[str, str, Any]] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self.limit_count: Optional[int] = None
+        self.offset_count: Optional[int] = None
+
+    # --- Operations ---
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "QueryBuilder":
+        self.method = "GET"
+        self.columns = columns
+        if count:
+            self.headers["Prefer"] = f"count={count}"
+        return self
+
+    def insert(self, values: Any) -> "QueryBuilder":
+        self.method = "POST"
+        self.body = values
+        self.headers["Prefer"] = "return=representation"
+        return self
+
+    def upsert(self, values: Any, on_conflict: Optional[str] = None, ignore_duplicates: bool = False) -> "QueryBuilder":
+        self.method = "POST"
+        self.body = values
+        resolution = "ignore-duplicates" if ignore_duplicates else "merge-duplicates"
+        self.headers["Prefer"] = f"return=representation,resolution={resolution}"
+        if on_conflict:
+            self.params.append(("on_conflict", on_conflict))
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "QueryBuilder":
+        self.method = "PATCH"
+        self.body = values
+        self.headers["Prefer"] = "return=representation"
+        return self
+
+    def delete(self) -> "QueryBuilder":
+        self.method = "DELETE"
+        self.headers["Prefer"] = "return=representation"
+        return self
+
+    def returning(self, columns: str) -> "QueryBuilder":
+        """Sets the columns an insert, upsert, update or delete sends back."""
+        self.columns = columns
+        return self
+
+    # --- Filters ---
+
+    def _filter(self, column: str, operator: str, value: Any) -> "QueryBuilder":
+        self.filters.append((column, operator, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "lte", value)
+
+    def ilike(self, column: str, pattern: str) -> "QueryBuilder":
+        return self._filter(column, "ilike", pattern)
+
+    def is_(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter(column, "is", value)
+
+    def in_(self, column: str, values: Iterable[Any]) -> "QueryBuilder":
+        return self._filter(column, "in", list(values))
+
+    def or_(self, filters: str) -> "QueryBuilder":
+        """Adds a raw PostgREST `or` filter, e.g. `title.ilike.*x*,sub_title.ilike.*x*`."""
+        return self._filter("or", "raw", f"({filters})")
+
+    # --- Modifiers ---
+
+    def order(self, column: str, desc: bool = False) -> "QueryBuilder":
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "QueryBuilder":
+        self.limit_count = count
+        return self
+
+    def range(self, start: int, end: int) -> "QueryBuilder":
+        self.offset_count = start
+        self.limit_count = end - start + 1
+        return self
+
+    # --- Execution ---
+
+    def build_params(self) -> List[Tuple[str, str]]:
+        """Turns the collected filters and modifiers into PostgREST query parameters."""
+        params = list(self.params)
+        if self.method == "GET" or self.headers.get("Prefer", "").startswith("return=representation"):
+            params.append(("select", self.columns))
+        for column, operator, value in self.filters:
+            if operator == "raw":
+                params.append((column, value))
+            elif operator == "in":
+                params.append((column, f"in.({','.join(quote_value(v) for v in value)})"))
+            else:
+                params.append((column, f"{operator}.{quote_value(value)}"))
+        if self.orders:
+            params.append(("order", ",".join(f"{c}.{'desc' if d else 'asc'}" for c, d in self.orders)))
+        if self.limit_count is not None:
+            params.append(("limit", str(self.limit_count)))
+        if self.offset_count is not None:
+            params.append(("offset", str(self.offset_count)))
+        return params
+
+    async def execute(self) -> APIResponse:
+        return await self._client.send(self)
+
+
+def _row_count(data: Any) -> int:
+    if isinstance(data, list):
+        return len(data)
+    return 0 if data is None else 1
+
+
+class PostgrestClient:
+    """A pooled, non-blocking client for the Supabase REST API."""
+
+    def __init__(self, url: str, key: str):
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=DB_HTTP2,
+            timeout=DB_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=DB_MAX_CONNECTIONS,
+                max_keepalive_connections=DB_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=DB_KEEPALIVE_EXPIRY,
+            ),
+            headers={
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+                "Accept": "application/json",
+            },
+        )
+
+    def table(self, name: str) -> QueryBuilder:
+        return QueryBuilder(self, name)
+
+    async def send(self, query: QueryBuilder) -> APIResponse:
+        params = query.build_params()
+        with track_upstream("postgrest", f"{query.method} {query.table}") as call:
+            response = await self.http.request(
+                query.method,
+                f"/{query.table}",
+                params=params,
+                headers=query.headers,
+                json=query.body,
+            )
+            call.response_size = len(response.content)
+            result = self._parse(response)
+            call.tag(**{
+                "db.table": query.table,
+                "db.operation": query.method,
+                "db.filter": "&".join(f"{key}={value}" for key, value in params if key != "select"),
+                "db.rows": _row_count(result.data),
+            })
+            return result
+
+    async def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> APIResponse:
+        """Calls a Postgres function exposed through PostgREST."""
+        with track_upstream("postgrest", f"RPC {function}") as call:
+            response = await self.http.post(f"/rpc/{function}", json=params or {})
+            call.response_size = len(response.content)
+            result = self._parse(response)
+            call.tag(**{"db.function": function, "db.rows": _row_count(result.data)})
+            return result
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> APIResponse:
+        if response.status_code >= 400:
+            try:
+                error = response.json()
+            except ValueError:
+                error = {"message": response.text}
+            logging.error(f"PostgREST error {response.status_code}: {error}")
+            raise PostgrestError(response.status_code, error.get("message", response.text), error.get("code"))
+
+        count = None
+        content_range = response.headers.get("content-range")
+        if content_range and "/" in content_range:
+            total = content_range.split("/")[-1]
+            count = int(total) if total.isdigit() else None
+
+        data = response.json() if response.content else []
+        return APIResponse(data=data, count=count)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+# The client is created lazily so that it binds to the event loop that is actually serving requests.
+_client: Optional[PostgrestClient] = None
+
+
+def get_client() -> PostgrestClient:
+    """Returns the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = PostgrestClient(SUPABASE_URL, SUPABASE_KEY)
+    return _client
+
+
+async def close_client():
+    """Closes the pooled connections. Called when the application shuts down."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
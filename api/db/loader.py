@@ -0,0 +1,163 @@
+"""
+This file contains request-scoped batching loaders for looking rows up by key.
+
+Code that needs a profile or an idea by ID calls `loaders().profiles.load(user_id)`
+instead of querying the repository directly. All the keys asked for in the same
+tick of the event loop (e.g. by coroutines running under `asyncio.gather`) are
+fetched together in a single `in` query, and every result is remembered until
+the end of the request, so asking for the same key again costs nothing. This
+removes N+1 query patterns without writing a batch query for each of them.
+
+A fresh set of loaders is created for every HTTP request by `LoaderMiddleware`.
+Outside of a request (e.g. in a WebSocket handler or a background task),
+`loaders()` returns one shared set per event loop that batches the lookups made
+in the same tick but remembers nothing, since nothing would ever clear it.
+"""
+
+import asyncio
+import os
+import uuid
+import weakref
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+# The repositories of the configured backend (see __init__.py, which binds them before importing this file).
+from . import ideas, profiles
+from .repositories import IDEA_COLUMNS
+
+# The largest number of keys fetched in one query. Larger batches are split into concurrent queries.
+LOADER_MAX_BATCH_SIZE = int(os.getenv("LOADER_MAX_BATCH_SIZE", "100"))
+
+
+class DataLoader:
+    """
+    Batches and memoizes lookups by key.
+
+    Args:
+        batch_load: Fetches the rows of a list of keys and returns them keyed by key.
+            Keys it returns nothing for are loaded as None.
+        memoize: Whether results are remembered once loaded. Without it, only
+            lookups of the same key made while it is being fetched share the result.
+    """
+
+    def __init__(self, batch_load: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+                 max_batch_size: int = LOADER_MAX_BATCH_SIZE, memoize: bool = True):
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        self.memoize = memoize
+        self._results: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self._batches = set()
+
+    def load(self, key: Hashable) -> "asyncio.Future":
+        """Returns an awaitable for the row of `key`, fetched with every other key asked for in this tick."""
+        future = self._results.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._results[key] = future
+            if not self._queue:
+                loop.call_soon(self._dispatch)
+            self._queue.append(key)
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: Hashable, value: Any):
+        """Remembers `value` as the row of `key`, e.g. after writing it."""
+        if not self.memoize:
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._results[key] = future
+
+    def clear(self, key: Hashable):
+        self._results.pop(key, None)
+
+    def _dispatch(self):
+        queue, self._queue = self._queue, []
+        for start in range(0, len(queue), self.max_batch_size):
+            batch = asyncio.ensure_future(self._run(queue[start:start + self.max_batch_size]))
+            # Keep a reference until the batch is done, or it could be garbage collected while running.
+            self._batches.add(batch)
+            batch.add_done_callback(self._batches.discard)
+
+    async def _run(self, keys: List[Hashable]):
+        try:
+            rows = await self.batch_load(keys)
+        except Exception as e:
+            for key in keys:
+                future = self._results.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+        for key in keys:
+            future = self._results.get(key)
+            if future is not None and not future.done():
+                future.set_result(rows.get(key))
+                if not self.memoize:
+                    del self._results[key]
+
+
+def _canonical_id(key: Any) -> Optional[str]:
+    try:
+        return str(uuid.UUID(str(key)))
+    except ValueError:
+        return None
+
+
+async def _load_profiles(user_ids: List[str]) -> Dict[str, Any]:
+    # Like the profile cache, match IDs in their canonical form, whatever form they were asked for in.
+    # IDs that aren't UUIDs load as None instead of failing the whole batch.
+    canonical = {user_id: _canonical_id(user_id) for user_id in user_ids}
+    wanted = [user_id for user_id in dict.fromkeys(canonical.values()) if user_id]
+    rows = await profiles.list_by_ids(wanted) if wanted else []
+    by_id = {_canonical_id(row["uuid"]): row for row in rows}
+    return {user_id: by_id.get(canonical_id) for user_id, canonical_id in canonical.items()}
+
+
+async def _load_ideas(idea_ids: List[str]) -> Dict[str, Any]:
+    return {row["id"]: row for row in await ideas.list_by_ids(idea_ids, columns=IDEA_COLUMNS)}
+
+
+class Loaders:
+    """The loaders of one request: profiles by user ID and ideas (IDEA_COLUMNS) by idea ID."""
+
+    def __init__(self, memoize: bool = True):
+        self.profiles = DataLoader(_load_profiles, memoize=memoize)
+        self.ideas = DataLoader(_load_ideas, memoize=memoize)
+
+
+_loaders: ContextVar[Optional[Loaders]] = ContextVar("loaders", default=None)
+# The loaders used outside of requests, one set per event loop since their futures belong to it.
+_shared_loaders: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Loaders]" = weakref.WeakKeyDictionary()
+
+
+def loaders() -> Loaders:
+    """Returns the loaders of the current request, or the shared, non-memoizing ones outside of a request."""
+    current = _loaders.get()
+    if current is not None:
+        return current
+    loop = asyncio.get_running_loop()
+    shared = _shared_loaders.get(loop)
+    if shared is None:
+        shared = _shared_loaders[loop] = Loaders(memoize=False)
+    return shared
+
+
+class LoaderMiddleware:
+    """Gives every HTTP request its own loaders, so nothing is remembered from one request to the next."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _loaders.set(Loaders())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _loaders.reset(token)
@@ -0,0 +1,96 @@
+"""
+This file contains the opaque cursors used for keyset pagination.
+
+A cursor is the `(created_at, id)` of the last row of a page, JSON-encoded and
+base64url-encoded, so clients can pass it back without knowing what is inside.
+Pages ranked by something other than recency use a ranked cursor, which puts the
+rank value of the last row in front: `(rank, created_at, id)`.
+
+Cursors are validated when they are decoded, so a forged or corrupted cursor is
+rejected with InvalidCursor instead of reaching the database.
+
+Endpoints cut their pages with `fetch_page`, which asks for one row more than
+the page holds to find out whether another page follows, without counting the
+table.
+"""
+
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def _encode(values: List[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str, length: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def _check_position(created_at: Any, row_id: Any):
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise InvalidCursor("Invalid cursor")
+    try:
+        datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        uuid.UUID(row_id)
+    except ValueError:
+        raise InvalidCursor("Invalid cursor")
+
+
+def encode_cursor(created_at: str, row_id: str) -> str:
+    return _encode([created_at, row_id])
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    created_at, row_id = _decode(cursor, 2)
+    _check_position(created_at, row_id)
+    return created_at, row_id
+
+
+def encode_ranked_cursor(rank: int, created_at: str, row_id: str) -> str:
+    return _encode([rank, created_at, row_id])
+
+
+def decode_ranked_cursor(cursor: str) -> Tuple[int, str, str]:
+    rank, created_at, row_id = _decode(cursor, 3)
+    if not isinstance(rank, int) or isinstance(rank, bool) or not 0 <= rank < 2 ** 31:
+        raise InvalidCursor("Invalid cursor")
+    _check_position(created_at, row_id)
+    return rank, created_at, row_id
+
+
+def cursor_after(row: Dict[str, Any]) -> str:
+    """Returns the cursor of the page that starts after `row`."""
+    return encode_cursor(row["created_at"], row["id"])
+
+
+async def fetch_page(fetch: Callable[[int], Awaitable[List[Dict[str, Any]]]],
+                     limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Fetches one page of at most `limit` rows and tells whether another page follows.
+
+    Args:
+        fetch: Fetches up to the given number of rows, in page order.
+        limit: The number of rows on the page.
+
+    Returns:
+        The rows of the page, and whether there are more after them.
+    """
+    # One extra row tells whether there is a next page without counting the table.
+    rows = await fetch(limit + 1)
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,491 @@
+"""
+This file contains the direct Postgres backend of the data access layer.
+
+Instead of going through PostgREST over HTTP, the repositories in this file
+query the Supabase Postgres database directly through an `asyncpg` connection
+pool. Every query is a single SQL statement whose text only depends on the
+shape of the call (never on its values), so asyncpg prepares it once per
+connection and reuses the prepared statement afterwards, and results are
+decoded from Postgres' binary protocol. The hot paths (the feed, the chat
+membership check and reading or writing messages) are each one round trip.
+
+The repositories have exactly the same methods as the ones in repositories.py
+and return the same JSON-like dictionaries (UUIDs and timestamps as strings),
+so the routers work unchanged with either backend. The backend is selected with
+DB_BACKEND=postgres (see __init__.py) and needs the optional `asyncpg` package
+(`pip install asyncpg`) and a DATABASE_URL.
+
+The `columns` arguments accept the subset of the PostgREST select syntax the
+routers use: plain column lists, `*`, and an embedded `alias:idea_members(...)`
+with columns, `*` or `count`. Column names are checked against the tables below.
+"""
+
+import asyncio
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from metrics import track_upstream
+
+from .client import DB_TIMEOUT
+from .repositories import IDEA_COLUMNS, MESSAGE_COLUMNS, PROFILE_COLUMNS
+
+# The direct connection string of the database, e.g. postgresql://postgres:<password>@db.<project>.supabase.co:5432/postgres
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Prepared statements kept per connection. Set it to 0 when DATABASE_URL points at a
+# pooler in transaction mode (e.g. Supavisor on port 6543), which can't keep them.
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+TABLE_COLUMNS = {
+    "ideas": ("id", "title", "sub_title", "full_explained_idea", "user_id", "image_url", "image_variants", "created_at",
+              "member_count"),
+    "idea_members": ("id", "idea_id", "user_id", "status", "created_at"),
+    "profiles": ("uuid", "user_data", "skills"),
+    "messages": ("id", "idea_id", "sender_id", "content", "created_at"),
+}
+
+# The resources that can be embedded: (table, embedded table) -> (column of the embedded table, column of the table).
+RELATIONS = {
+    ("ideas", "idea_members"): ("idea_id", "id"),
+}
+
+_EMBED = re.compile(r"^(?:(\w+):)?(\w+)\((.*)\)$")
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def _init_connection(connection):
+    # Return json and jsonb columns (and the embedded resources built with json_agg) as Python objects.
+    for name in ("json", "jsonb"):
+        await connection.set_type_codec(name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def get_pool():
+    """Returns the shared connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                try:
+                    import asyncpg
+                except ImportError:
+                    raise RuntimeError("DB_BACKEND=postgres needs the 'asyncpg' package: pip install asyncpg")
+                if not DATABASE_URL:
+                    raise RuntimeError("DB_BACKEND=postgres needs DATABASE_URL to be set")
+                _pool = await asyncpg.create_pool(
+                    DATABASE_URL,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                    command_timeout=DB_TIMEOUT,
+                    init=_init_connection,
+                )
+    return _pool
+
+
+async def close_pool():
+    """Closes the connection pool. Called when the application shuts down."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+def _value(value: Any) -> Any:
+    # Match what PostgREST returns, so that both backends produce the same JSON.
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _row(record) -> Dict[str, Any]:
+    return {key: _value(value) for key, value in record.items()}
+
+
+def _split(columns: str) -> List[str]:
+    """Splits a select string on the commas that are not inside parentheses."""
+    items, depth, current = [], 0, ""
+    for char in columns:
+        if char == "," and depth == 0:
+            items.append(current.strip())
+            current = ""
+            continue
+        depth += (char == "(") - (char == ")")
+        current += char
+    items.append(current.strip())
+    return [item for item in items if item]
+
+
+def _column(table: str, name: str) -> str:
+    if name not in TABLE_COLUMNS[table]:
+        raise ValueError(f"Unknown column '{name}' of table '{table}'")
+    return f'"{name}"'
+
+
+def _embed(table: str, alias: Optional[str], embedded: str, columns: str, status_param: Optional[int]) -> str:
+    relation = RELATIONS.get((table, embedded))
+    if relation is None:
+        raise ValueError(f"'{embedded}' can't be embedded in '{table}'")
+    foreign_key, key = relation
+    where = f'e.{_column(embedded, foreign_key)} = t.{_column(table, key)}'
+    if status_param is not None:
+        where += f" AND (${status_param}::text IS NULL OR e.status = ${status_param})"
+    source = f'FROM "{embedded}" e WHERE {where}'
+
+    if columns.strip() == "count":
+        value = f"(SELECT json_build_array(json_build_object('count', count(*))) {source})"
+    else:
+        names = TABLE_COLUMNS[embedded] if columns.strip() == "*" else _split(columns)
+        fields = ", ".join(f"'{name}', e.{_column(embedded, name)}" for name in names)
+        value = f"(SELECT coalesce(json_agg(json_build_object({fields}) ORDER BY e.created_at), '[]'::json) {source})"
+    return f'{value} AS "{alias or embedded}"'
+
+
+@lru_cache(maxsize=256)
+def select_list(table: str, columns: str, status_param: Optional[int] = None) -> str:
+    """
+    Translates a PostgREST select string into the select list of a query on `table` aliased as `t`.
+
+    `status_param` is the number of the query parameter that filters the status of
+    the embedded rows; when that parameter is NULL, they are not filtered.
+    """
+    parts = []
+    for item in _split(columns):
+        embed = _EMBED.match(item)
+        if embed:
+            parts.append(_embed(table, embed.group(1), embed.group(2), embed.group(3), status_param))
+        elif item == "*":
+            parts.extend(f"t.{_column(table, name)}" for name in TABLE_COLUMNS[table])
+        else:
+            parts.append(f"t.{_column(table, item)}")
+    return ", ".join(parts)
+
+
+def _seek(first_param: int, older: bool) -> str:
+    """The SQL counterpart of `repositories.seek`: a row comparison on `(created_at, id)` that the index can seek to."""
+    operator = "<" if older else ">"
+    return f"(t.created_at, t.id) {operator} (${first_param}::text::timestamptz, ${first_param + 1}::uuid)"
+
+
+@lru_cache(maxsize=64)
+def _insert_sql(table: str, keys: Tuple[str, ...], returning: str) -> str:
+    names = ", ".join(_column(table, key) for key in keys)
+    params = ", ".join(f"${number}" for number in range(1, len(keys) + 1))
+    return f'INSERT INTO "{table}" AS t ({names}) VALUES ({params}) RETURNING {select_list(table, returning)}'
+
+
+@lru_cache(maxsize=64)
+def _update_sql(table: str, key: str, keys: Tuple[str, ...], returning: str) -> str:
+    assignments = ", ".join(f"{_column(table, name)} = ${number}" for number, name in enumerate(keys, start=2))
+    return f'UPDATE "{table}" AS t SET {assignments} WHERE t.{_column(table, key)} = $1 RETURNING {select_list(table, returning)}'
+
+
+async def fetch(operation: str, table: str, sql: str, *args: Any) -> List[Dict[str, Any]]:
+    """Runs one statement on a pooled connection and returns its rows as dictionaries."""
+    pool = await get_pool()
+    with track_upstream("postgres", f"{operation} {table}") as call:
+        records = await pool.fetch(sql, *args)
+        call.tag(**{"db.table": table, "db.operation": operation, "db.rows": len(records)})
+    return [_row(record) for record in records]
+
+
+async def fetch_one(operation: str, table: str, sql: str, *args: Any) -> Optional[Dict[str, Any]]:
+    rows = await fetch(operation, table, sql, *args)
+    return rows[0] if rows else None
+
+
+class Repository:
+    """The base class for all repositories. `table` is the name of the table it queries."""
+
+    table: str = ""
+
+    async def _select(self, columns: str, where: str = "", *args: Any, suffix: str = "") -> List[Dict[str, Any]]:
+        sql = f'SELECT {select_list(self.table, columns)} FROM "{self.table}" t'
+        if where:
+            sql += f" WHERE {where}"
+        if suffix:
+            sql += f" {suffix}"
+        return await fetch("SELECT", self.table, sql, *args)
+
+    async def _insert(self, values: Dict[str, Any], returning: str = "*") -> Optional[Dict[str, Any]]:
+        keys = tuple(values)
+        return await fetch_one("INSERT", self.table, _insert_sql(self.table, keys, returning), *values.values())
+
+    async def _update(self, key: str, key_value: Any, values: Dict[str, Any], returning: str = "*") -> Optional[Dict[str, Any]]:
+        keys = tuple(values)
+        return await fetch_one("UPDATE", self.table, _update_sql(self.table, key, keys, returning), key_value, *values.values())
+
+
+class IdeasRepository(Repository):
+    """Queries for the 'ideas' table."""
+
+    table = "ideas"
+
+    async def list(self, columns: str = IDEA_COLUMNS) -> List[Dict[str, Any]]:
+        return await self._select(columns)
+
+    async def page(self, columns: str, limit: int, after: Optional[Tuple[str, str]] = None,
+                   member_status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` ideas, newest first, using keyset pagination on `(created_at, id)`.
+
+        `after` is the `(created_at, id)` of the last idea of the previous page.
+
+        If `columns` embeds the members as `members:idea_members(...)`, `member_status`
+        restricts the embedded members (or their count) to that status.
+        """
+        args: List[Any] = [limit]
+        where = ""
+        if after:
+            where = _seek(2, older=True)
+            args.extend(after)
+        status_param = None
+        if any(_EMBED.match(item) for item in _split(columns)):
+            args.append(member_status)
+            status_param = len(args)
+        sql = f'SELECT {select_list(self.table, columns, status_param)} FROM "{self.table}" t'
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY t.created_at DESC, t.id DESC LIMIT $1"
+        return await fetch("SELECT", self.table, sql, *args)
+
+    async def page_by_members(self, columns: str, limit: int,
+                              after: Optional[Tuple[int, str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` ideas with the most members first (newest first on ties),
+        using keyset pagination on `(member_count, created_at, id)`.
+
+        `after` is the `(member_count, created_at, id)` of the last idea of the previous page.
+        """
+        args: List[Any] = [limit]
+        where = ""
+        if after:
+            where = "(t.member_count, t.created_at, t.id) < ($2::int, $3::text::timestamptz, $4::uuid)"
+            args.extend(after)
+        return await self._select(columns, where, *args,
+                                  suffix="ORDER BY t.member_count DESC, t.created_at DESC, t.id DESC LIMIT $1")
+
+    async def get(self, idea_id: str, columns: str = IDEA_COLUMNS) -> Optional[Dict[str, Any]]:
+        rows = await self._select(columns, "t.id = $1", idea_id)
+        return rows[0] if rows else None
+
+    async def get_owner_id(self, idea_id: str) -> Optional[str]:
+        idea = await self.get(idea_id, columns="user_id")
+        return idea["user_id"] if idea else None
+
+    async def get_chat_members(self, idea_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the owner (`user_id`) and the accepted members (`member_ids`) of an idea in one query.
+
+        Returns None if the idea does not exist.
+        """
+        idea = await fetch_one(
+            "SELECT", self.table,
+            "SELECT t.user_id, array(SELECT m.user_id FROM idea_members m"
+            " WHERE m.idea_id = t.id AND m.status = 'accepted') AS members"
+            ' FROM "ideas" t WHERE t.id = $1',
+            idea_id,
+        )
+        if idea is None:
+            return None
+        return {"user_id": str(idea["user_id"]), "member_ids": [str(member) for member in idea["members"]]}
+
+    async def list_by_owner(self, user_id: str, columns: str = IDEA_COLUMNS) -> List[Dict[str, Any]]:
+        return await self._select(columns, "t.user_id = $1", user_id)
+
+    async def list_by_ids(self, idea_ids: Iterable[str], columns: str = IDEA_COLUMNS) -> List[Dict[str, Any]]:
+        idea_ids = list(idea_ids)
+        if not idea_ids:
+            return []
+        return await self._select(columns, "t.id = ANY($1::uuid[])", idea_ids)
+
+    async def list_for_user(self, user_id: str, limit: int, after: Optional[Tuple[str, str]] = None,
+                            member_counts: bool = False) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` of the ideas a user owns or is an accepted member of, newest first, in one query.
+
+        Every row has the user's `role` ("owner" or "member") and, with `member_counts`,
+        the idea's number of accepted members (see user/user_ideas.sql).
+        """
+        return await fetch(
+            "RPC", "user_ideas",
+            "SELECT * FROM user_ideas($1::uuid, $2, $3::text::timestamptz, $4::uuid, $5)",
+            user_id, limit, after[0] if after else None, after[1] if after else None, member_counts,
+        )
+
+    async def search(self, tsquery: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """Runs a full-text search (see search/search_index.sql). Returns rows of `id, score, highlight, data`."""
+        return await fetch("RPC", "search_ideas", "SELECT id, score, highlight, data FROM search_ideas($1, $2, $3)",
+                           tsquery, limit, offset)
+
+    async def create(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self._insert(values, IDEA_COLUMNS)
+
+    async def list_by_images(self, image_urls: Iterable[str], columns: str = "id,image_url,image_variants") -> List[Dict[str, Any]]:
+        """Returns the ideas whose `image_url`, or the `full` URL of whose `image_variants`, is one of `image_urls`."""
+        image_urls = list(dict.fromkeys(image_urls))
+        if not image_urls:
+            return []
+        return await self._select(columns, "t.image_url = ANY($1::text[]) OR t.image_variants->>'full' = ANY($1::text[])", image_urls)
+
+    async def update(self, idea_id: str, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self._update("id", idea_id, values, IDEA_COLUMNS)
+
+
+class IdeaMembersRepository(Repository):
+    """Queries for the 'idea_members' table, which holds join requests and team memberships."""
+
+    table = "idea_members"
+
+    async def get(self, request_id: str, columns: str = "*") -> Optional[Dict[str, Any]]:
+        rows = await self._select(columns, "t.id = $1", request_id)
+        return rows[0] if rows else None
+
+    async def find(self, idea_id: str, user_id: str, status: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        rows = await self._select("*", "t.idea_id = $1 AND t.user_id = $2 AND ($3::text IS NULL OR t.status = $3)",
+                                 idea_id, user_id, status)
+        return rows[0] if rows else None
+
+    async def list_for_idea(self, idea_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await self._select("*", "t.idea_id = $1 AND ($2::text IS NULL OR t.status = $2)", idea_id, status)
+
+    async def list_for_ideas(self, idea_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        idea_ids = list(idea_ids)
+        if not idea_ids:
+            return []
+        return await self._select("*", "t.idea_id = ANY($1::uuid[])", idea_ids)
+
+    async def list_by_ids(self, request_ids: Iterable[str], columns: str = "*") -> List[Dict[str, Any]]:
+        request_ids = list(request_ids)
+        if not request_ids:
+            return []
+        return await self._select(columns, "t.id = ANY($1::uuid[])", request_ids)
+
+    async def list_for_owner(self, owner_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns the join requests for all the ideas of an owner, oldest first, in one query."""
+        return await self._select(
+            "*", "t.idea_id IN (SELECT i.id FROM ideas i WHERE i.user_id = $1) AND ($2::text IS NULL OR t.status = $2)",
+            owner_id, status, suffix="ORDER BY t.created_at",
+        )
+
+    async def list_idea_ids_for_user(self, user_id: str, status: str = "accepted") -> List[str]:
+        rows = await self._select("idea_id", "t.user_id = $1 AND t.status = $2", user_id, status)
+        return [row["idea_id"] for row in rows]
+
+    async def create(self, idea_id: str, user_id: str, status: str = "pending") -> Optional[Dict[str, Any]]:
+        return await self._insert({"idea_id": idea_id, "user_id": user_id, "status": status})
+
+    async def join(self, idea_ids: Iterable[str], user_id: str) -> List[Dict[str, Any]]:
+        """
+        Asks to join every idea in `idea_ids` with a single upsert (see message/join_ideas.sql).
+
+        Returns one row per existing idea: a new pending request, or the user's
+        existing one, unchanged. `created` tells the two apart.
+        """
+        idea_ids = list(idea_ids)
+        if not idea_ids:
+            return []
+        return await fetch("RPC", "join_ideas", "SELECT * FROM join_ideas($1::uuid, $2::uuid[])", user_id, idea_ids)
+
+    async def review(self, decisions: Dict[str, str], owner_id: str) -> List[Dict[str, Any]]:
+        """
+        Sets the status of many join requests in one statement (see message/review_join_requests.sql).
+
+        `decisions` maps request IDs to their new status. Only requests for ideas
+        owned by `owner_id` are updated. Returns the updated rows.
+        """
+        if not decisions:
+            return []
+        return await fetch(
+            "RPC", "review_join_requests", "SELECT * FROM review_join_requests($1::uuid, $2::jsonb)", owner_id,
+            [{"request_id": request_id, "status": status} for request_id, status in decisions.items()],
+        )
+
+    async def update_status(self, request_id: str, status: str) -> Optional[Dict[str, Any]]:
+        return await self._update("id", request_id, {"status": status})
+
+
+class ProfilesRepository(Repository):
+    """Queries for the 'profiles' table."""
+
+    table = "profiles"
+
+    async def get(self, user_id: str, columns: str = PROFILE_COLUMNS) -> Optional[Dict[str, Any]]:
+        rows = await self._select(columns, "t.uuid = $1", user_id)
+        return rows[0] if rows else None
+
+    async def list_by_ids(self, user_ids: Iterable[str], columns: str = PROFILE_COLUMNS) -> List[Dict[str, Any]]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        return await self._select(columns, "t.uuid = ANY($1::uuid[])", user_ids)
+
+    async def search(self, tsquery: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """Runs a full-text search (see search/search_index.sql). Returns rows of `id, score, highlight, data`."""
+        return await fetch("RPC", "search_profiles", "SELECT id, score, highlight, data FROM search_profiles($1, $2, $3)",
+                           tsquery, limit, offset)
+
+    async def create(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self._insert(values, PROFILE_COLUMNS)
+
+    async def update(self, user_id: str, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self._update("uuid", user_id, values, PROFILE_COLUMNS)
+
+
+class MessagesRepository(Repository):
+    """Queries for the 'messages' table, which holds the chat of every idea."""
+
+    table = "messages"
+
+    async def create(self, idea_id: str, sender_id: str, content: str) -> Optional[Dict[str, Any]]:
+        return await self._insert({"idea_id": idea_id, "sender_id": sender_id, "content": content}, MESSAGE_COLUMNS)
+
+    async def create_many(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inserts several messages in one round trip and returns the stored rows in the same order."""
+        if not rows:
+            return []
+        return await fetch(
+            "INSERT", self.table,
+            'INSERT INTO "messages" AS t (idea_id, sender_id, content)'
+            " SELECT * FROM unnest($1::uuid[], $2::uuid[], $3::text[])"
+            f" RETURNING {select_list(self.table, MESSAGE_COLUMNS)}",
+            [row["idea_id"] for row in rows],
+            [row["sender_id"] for row in rows],
+            [row["content"] for row in rows],
+        )
+
+    async def page(self, idea_id: str, limit: int, columns: str = MESSAGE_COLUMNS,
+                   before: Optional[Tuple[str, str]] = None,
+                   since: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` messages of an idea's chat, using keyset pagination on `(created_at, id)`.
+
+        With `since`, returns the messages right after that position, oldest first.
+        Otherwise returns the latest messages (before `before`, if given), newest first.
+        """
+        where, args = "t.idea_id = $1", [idea_id, limit]
+        if since:
+            where += f" AND {_seek(3, older=False)}"
+            args.extend(since)
+            order = "t.created_at, t.id"
+        else:
+            if before:
+                where += f" AND {_seek(3, older=True)}"
+                args.extend(before)
+            order = "t.created_at DESC, t.id DESC"
+        return await self._select(columns, where, *args, suffix=f"ORDER BY {order} LIMIT $2")
+
+
+ideas = IdeasRepository()
+idea_members = IdeaMembersRepository()
+profiles = ProfilesRepository()
+messages = MessagesRepository()
@@ -0,0 +1,338 @@
+"""
+This file contains one repository per table in the Supabase database.
+
+Each repository wraps the queries the routers need for its table, so the
+routers never build queries against the REST API themselves. All methods are
+coroutines and return plain dictionaries (or lists of them), exactly like the
+`.data` attribute of a Supabase response.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .client import QueryBuilder, get_client, quote_value
+
+# The columns returned when a caller does not ask for specific ones. They are listed
+# explicitly so that internal columns (like the full-text `search_vector`) never
+# travel over the wire.
+IDEA_COLUMNS = "id,title,sub_title,full_explained_idea,user_id,image_url,image_variants,created_at"
+PROFILE_COLUMNS = "uuid,user_data,skills"
+
+
+MESSAGE_COLUMNS = "id,idea_id,sender_id,content,created_at"
+
+
+def seek(query: QueryBuilder, position: Tuple[str, str], older: bool) -> QueryBuilder:
+    """
+    Adds a keyset filter on `(created_at, id)` to a query.
+
+    With `older=True` only rows strictly before `position` are kept, otherwise only
+    rows strictly after it. The query seeks straight to that position instead of
+    skipping rows with an offset, so it costs the same however deep it goes.
+    """
+    operator = "lt" if older else "gt"
+    created_at, row_id = quote_value(position[0]), quote_value(position[1])
+    return query.or_(f"created_at.{operator}.{created_at},and(created_at.eq.{created_at},id.{operator}.{row_id})")
+
+
+class Repository:
+    """The base class for all repositories. `table` is the name of the table it queries."""
+
+    table: str = ""
+
+    def query(self) -> QueryBuilder:
+        return get_client().table(self.table)
+
+
+class IdeasRepository(Repository):
+    """Queries for the 'ideas' table."""
+
+    table = "ideas"
+
+    async def list(self, columns: str = IDEA_COLUMNS) -> List[Dict[str, Any]]:
+        response = await self.query().select(columns).execute()
+        return response.data or []
+
+    async def page(self, columns: str, limit: int, after: Optional[Tuple[str, str]] = None,
+                   member_status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` ideas, newest first, using keyset pagination on `(created_at, id)`.
+
+        `after` is the `(created_at, id)` of the last idea of the previous page.
+
+        If `columns` embeds the members as `members:idea_members(...)`, `member_status`
+        restricts the embedded members (or their count) to that status.
+        """
+        query = self.query().select(columns).order("created_at", desc=True).order("id", desc=True).limit(limit)
+        if member_status:
+            query = query.eq("members.status", member_status)
+        if after:
+            query = seek(query, after, older=True)
+        response = await query.execute()
+        return response.data or []
+
+    async def page_by_members(self, columns: str, limit: int,
+                              after: Optional[Tuple[int, str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` ideas with the most members first (newest first on ties),
+        using keyset pagination on `(member_count, created_at, id)`.
+
+        `after` is the `(member_count, created_at, id)` of the last idea of the previous page.
+        """
+        query = (
+            self.query().select(columns)
+            .order("member_count", desc=True).order("created_at", desc=True).order("id", desc=True)
+            .limit(limit)
+        )
+        if after:
+            count = int(after[0])
+            created_at, row_id = quote_value(after[1]), quote_value(after[2])
+            query = query.or_(
+                f"member_count.lt.{count},"
+                f"and(member_count.eq.{count},created_at.lt.{created_at}),"
+                f"and(member_count.eq.{count},created_at.eq.{created_at},id.lt.{row_id})"
+            )
+        response = await query.execute()
+        return response.data or []
+
+    async def get(self, idea_id: str, columns: str = IDEA_COLUMNS) -> Optional[Dict[str, Any]]:
+        response = await self.query().select(columns).eq("id", idea_id).execute()
+        return response.data[0] if response.data else None
+
+    async def get_owner_id(self, idea_id: str) -> Optional[str]:
+        idea = await self.get(idea_id, columns="user_id")
+        return idea["user_id"] if idea else None
+
+    async def get_chat_members(self, idea_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the owner (`user_id`) and the accepted members (`member_ids`) of an idea in one query.
+
+        Returns None if the idea does not exist.
+        """
+        response = await (
+            self.query()
+            .select("user_id,members:idea_members(user_id)")
+            .eq("id", idea_id)
+            .eq("members.status", "accepted")
+            .execute()
+        )
+        if not response.data:
+            return None
+        idea = response.data[0]
+        return {"user_id": idea["user_id"], "member_ids": [member["user_id"] for member in idea.get("members") or []]}
+
+    async def list_by_owner(self, user_id: str, columns: str = IDEA_COLUMNS) -> List[Dict[str, Any]]:
+        response = await self.query().select(columns).eq("user_id", user_id).execute()
+        return response.data or []
+
+    async def list_by_ids(self, idea_ids: Iterable[str], columns: str = IDEA_COLUMNS) -> List[Dict[str, Any]]:
+        idea_ids = list(idea_ids)
+        if not idea_ids:
+            return []
+        response = await self.query().select(columns).in_("id", idea_ids).execute()
+        return response.data or []
+
+    async def list_for_user(self, user_id: str, limit: int, after: Optional[Tuple[str, str]] = None,
+                            member_counts: bool = False) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` of the ideas a user owns or is an accepted member of, newest first, in one query.
+
+        Every row has the user's `role` ("owner" or "member") and, with `member_counts`,
+        the idea's number of accepted members (see user/user_ideas.sql).
+        """
+        response = await get_client().rpc("user_ideas", {
+            "member_id": user_id,
+            "max_results": limit,
+            "after_created_at": after[0] if after else None,
+            "after_id": after[1] if after else None,
+            "with_member_counts": member_counts,
+        })
+        return response.data or []
+
+    async def search(self, tsquery: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """Runs a full-text search (see search/search_index.sql). Returns rows of `id, score, highlight, data`."""
+        response = await get_client().rpc("search_ideas", {"query": tsquery, "max_results": limit, "skip": offset})
+        return response.data or []
+
+    async def create(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        response = await self.query().insert(values).returning(IDEA_COLUMNS).execute()
+        return response.data[0] if response.data else None
+
+    async def list_by_images(self, image_urls: Iterable[str], columns: str = "id,image_url,image_variants") -> List[Dict[str, Any]]:
+        """Returns the ideas whose `image_url`, or the `full` URL of whose `image_variants`, is one of `image_urls`."""
+        values = ",".join(quote_value(url) for url in dict.fromkeys(image_urls))
+        if not values:
+            return []
+        query = self.query().select(columns).or_(f"image_url.in.({values}),image_variants->>full.in.({values})")
+        response = await query.execute()
+        return response.data or []
+
+    async def update(self, idea_id: str, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        response = await self.query().update(values).eq("id", idea_id).returning(IDEA_COLUMNS).execute()
+        return response.data[0] if response.data else None
+
+
+class IdeaMembersRepository(Repository):
+    """Queries for the 'idea_members' table, which holds join requests and team memberships."""
+
+    table = "idea_members"
+
+    async def get(self, request_id: str, columns: str = "*") -> Optional[Dict[str, Any]]:
+        response = await self.query().select(columns).eq("id", request_id).execute()
+        return response.data[0] if response.data else None
+
+    async def find(self, idea_id: str, user_id: str, status: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        query = self.query().select("*").eq("idea_id", idea_id).eq("user_id", user_id)
+        if status:
+            query = query.eq("status", status)
+        response = await query.execute()
+        return response.data[0] if response.data else None
+
+    async def list_for_idea(self, idea_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = self.query().select("*").eq("idea_id", idea_id)
+        if status:
+            query = query.eq("status", status)
+        response = await query.execute()
+        return response.data or []
+
+    async def list_for_ideas(self, idea_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        idea_ids = list(idea_ids)
+        if not idea_ids:
+            return []
+        response = await self.query().select("*").in_("idea_id", idea_ids).execute()
+        return response.data or []
+
+    async def list_by_ids(self, request_ids: Iterable[str], columns: str = "*") -> List[Dict[str, Any]]:
+        request_ids = list(request_ids)
+        if not request_ids:
+            return []
+        response = await self.query().select(columns).in_("id", request_ids).execute()
+        return response.data or []
+
+    async def list_for_owner(self, owner_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns the join requests for all the ideas of an owner, oldest first, in one query."""
+        query = self.query().select("*,idea:ideas!inner(user_id)").eq("idea.user_id", owner_id).order("created_at")
+        if status:
+            query = query.eq("status", status)
+        response = await query.execute()
+        rows = response.data or []
+        for row in rows:
+            row.pop("idea", None)
+        return rows
+
+    async def list_idea_ids_for_user(self, user_id: str, status: str = "accepted") -> List[str]:
+        response = await self.query().select("idea_id").eq("user_id", user_id).eq("status", status).execute()
+        return [row["idea_id"] for row in response.data or []]
+
+    async def create(self, idea_id: str, user_id: str, status: str = "pending") -> Optional[Dict[str, Any]]:
+        response = await self.query().insert({
+            "idea_id": idea_id,
+            "user_id": user_id,
+            "status": status,
+        }).execute()
+        return response.data[0] if response.data else None
+
+    async def join(self, idea_ids: Iterable[str], user_id: str) -> List[Dict[str, Any]]:
+        """
+        Asks to join every idea in `idea_ids` with a single upsert (see message/join_ideas.sql).
+
+        Returns one row per existing idea: a new pending request, or the user's
+        existing one, unchanged. `created` tells the two apart.
+        """
+        idea_ids = list(idea_ids)
+        if not idea_ids:
+            return []
+        response = await get_client().rpc("join_ideas", {"member_id": user_id, "idea_ids": idea_ids})
+        return response.data or []
+
+    async def review(self, decisions: Dict[str, str], owner_id: str) -> List[Dict[str, Any]]:
+        """
+        Sets the status of many join requests in one statement (see message/review_join_requests.sql).
+
+        `decisions` maps request IDs to their new status. Only requests for ideas
+        owned by `owner_id` are updated. Returns the updated rows.
+        """
+        if not decisions:
+            return []
+        response = await get_client().rpc("review_join_requests", {
+            "owner_id": owner_id,
+            "decisions": [{"request_id": request_id, "status": status} for request_id, status in decisions.items()],
+        })
+        return response.data or []
+
+    async def update_status(self, request_id: str, status: str) -> Optional[Dict[str, Any]]:
+        response = await self.query().update({"status": status}).eq("id", request_id).execute()
+        return response.data[0] if response.data else None
+
+
+class ProfilesRepository(Repository):
+    """Queries for the 'profiles' table."""
+
+    table = "profiles"
+
+    async def get(self, user_id: str, columns: str = PROFILE_COLUMNS) -> Optional[Dict[str, Any]]:
+        response = await self.query().select(columns).eq("uuid", user_id).execute()
+        return response.data[0] if response.data else None
+
+    async def list_by_ids(self, user_ids: Iterable[str], columns: str = PROFILE_COLUMNS) -> List[Dict[str, Any]]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        response = await self.query().select(columns).in_("uuid", user_ids).execute()
+        return response.data or []
+
+    async def search(self, tsquery: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """Runs a full-text search (see search/search_index.sql). Returns rows of `id, score, highlight, data`."""
+        response = await get_client().rpc("search_profiles", {"query": tsquery, "max_results": limit, "skip": offset})
+        return response.data or []
+
+    async def create(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        response = await self.query().insert(values).returning(PROFILE_COLUMNS).execute()
+        return response.data[0] if response.data else None
+
+    async def update(self, user_id: str, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        response = await self.query().update(values).eq("uuid", user_id).returning(PROFILE_COLUMNS).execute()
+        return response.data[0] if response.data else None
+
+
+class MessagesRepository(Repository):
+    """Queries for the 'messages' table, which holds the chat of every idea."""
+
+    table = "messages"
+
+    async def create(self, idea_id: str, sender_id: str, content: str) -> Optional[Dict[str, Any]]:
+        response = await self.query().insert({
+            "idea_id": idea_id,
+            "sender_id": sender_id,
+            "content": content,
+        }).returning(MESSAGE_COLUMNS).execute()
+        return response.data[0] if response.data else None
+
+    async def create_many(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inserts several messages in one round trip and returns the stored rows in the same order."""
+        response = await self.query().insert(rows).returning(MESSAGE_COLUMNS).execute()
+        return response.data or []
+
+    async def page(self, idea_id: str, limit: int, columns: str = MESSAGE_COLUMNS,
+                   before: Optional[Tuple[str, str]] = None,
+                   since: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` messages of an idea's chat, using keyset pagination on `(created_at, id)`.
+
+        With `since`, returns the messages right after that position, oldest first.
+        Otherwise returns the latest messages (before `before`, if given), newest first.
+        """
+        query = self.query().select(columns).eq("idea_id", idea_id).limit(limit)
+        if since:
+            query = seek(query, since, older=False).order("created_at").order("id")
+        else:
+            if before:
+                query = seek(query, before, older=True)
+            query = query.order("created_at", desc=True).order("id", desc=True)
+        response = await query.execute()
+        return response.data or []
+
+
+ideas = IdeasRepository()
+idea_members = IdeaMembersRepository()
+profiles = ProfilesRepository()
+messages = MessagesRepository()
@@ -0,0 +1,80 @@
+"""
+This file builds the pages of the idea feed.
+
+The feed is paginated with a keyset (cursor) on `(created_at, id)`: each page
+asks the database for the ideas that come right after the last idea of the
+previous page, so page 1000 costs exactly as much as page 1. Only the columns a
+feed card shows are fetched, together with the number of members of each idea.
+
+Ranked by members, the keyset is `(member_count, created_at, id)` instead. It
+relies on the `member_count` column, the number of accepted members that a
+trigger keeps up to date (see member_count.sql), so the ranking covers the whole
+feed, not just one page.
+
+The cursor handed to clients is opaque (see db/pagination.py).
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+import db
+from db.pagination import InvalidCursor, cursor_after, decode_cursor, decode_ranked_cursor, encode_ranked_cursor, fetch_page
+
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "20"))
+FEED_MAX_PAGE_SIZE = int(os.getenv("FEED_MAX_PAGE_SIZE", "100"))
+
+# Only what the feed card needs. `members:idea_members(count)` makes PostgREST
+# count the members of each idea in the same query instead of returning them;
+# like `member_count`, only accepted members count, not pending join requests.
+FEED_COLUMNS = "id,title,sub_title,user_id,image_url,image_variants,created_at,members:idea_members(count)"
+# Ranked by members, the count comes from the column the ranking sorts on.
+RANKED_FEED_COLUMNS = "id,title,sub_title,user_id,image_url,image_variants,created_at,member_count"
+
+RANK_RECENT = "recent"
+RANK_MEMBERS = "members"
+
+
+def _to_feed_item(row: Dict[str, Any]) -> Dict[str, Any]:
+    members = row.pop("members", None) or []
+    row["member_count"] = members[0]["count"] if members else 0
+    return row
+
+
+async def get_feed_page(limit: int = FEED_PAGE_SIZE, cursor: Optional[str] = None, rank: str = RANK_RECENT) -> Dict[str, Any]:
+    """
+    Returns one page of the feed and the cursor of the next page.
+
+    Pages are always cut from a keyset, so their cost does not depend on the
+    size of the table. With `rank="members"`, the ideas with the most accepted
+    members come first (newest first on ties).
+
+    Args:
+        limit: The number of ideas on the page.
+        cursor: The `next_cursor` of the previous page, or None for the first page.
+            Cursors only work with the `rank` they were issued for.
+        rank: Either "recent" or "members".
+
+    Returns:
+        A dictionary with the `items` of the page and the `next_cursor`, which is
+        None on the last page.
+    """
+    items: List[Dict[str, Any]]
+    if rank == RANK_MEMBERS:
+        ranked_after = decode_ranked_cursor(cursor) if cursor else None
+        items, has_more = await fetch_page(
+            lambda n: db.ideas.page_by_members(RANKED_FEED_COLUMNS, n, after=ranked_after), limit)
+    else:
+        after = decode_cursor(cursor) if cursor else None
+        items, has_more = await fetch_page(
+            lambda n: db.ideas.page(FEED_COLUMNS, n, after=after, member_status="accepted"), limit)
+        items = [_to_feed_item(row) for row in items]
+
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        if rank == RANK_MEMBERS:
+            next_cursor = encode_ranked_cursor(last["member_count"], last["created_at"], last["id"])
+        else:
+            next_cursor = cursor_after(last)
+
+    return {"items": items, "next_cursor": next_cursor}
@@ -1,13 +1,24 @@
-from fastapi import APIRouter
-from typing import List
-from ideas.models import Idea
-from user.database import supabase
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import Literal, Optional
+from . import engine
+from .models import FeedPage
+from conditional import conditional_response
+from ideas import storage
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Idea])
-async def get_feed():
-    response = supabase.table("ideas").select("*").execute()
-    if response.data:
-        return response.data
-    return []
\ No newline at end of file
+@router.get("/", response_model=FeedPage)
+async def get_feed(
+    request: Request,
+    response: Response,
+    limit: int = Query(engine.FEED_PAGE_SIZE, ge=1, le=engine.FEED_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    rank: Literal["recent", "members"] = engine.RANK_RECENT,
+):
+    try:
+        page = await engine.get_feed_page(limit=limit, cursor=cursor, rank=rank)
+        # The images of the whole page are signed together, with at most one storage call.
+        page["items"] = await storage.sign_images(page["items"])
+        return conditional_response(request, response, FeedPage, page, trusted=True)
+    except engine.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,50 @@
+-- Member counts for GET /feed/?rank=members.
+--
+-- Run this once in the Supabase SQL editor. It adds `ideas.member_count`, the
+-- number of accepted members of each idea (the same number the feed shows), fills
+-- it in for existing ideas, and adds a trigger that keeps it up to date as join
+-- requests are accepted, rejected or removed. Pending and rejected requests don't
+-- count. Running it again recounts every idea. The index
+-- matches the order of the ranked feed, `(member_count, created_at, id)`, so each
+-- page seeks straight to where the previous one ended.
+--
+-- The trigger function is SECURITY DEFINER so that a join request also updates
+-- the count of an idea the requesting user doesn't own. Trigger functions can't
+-- be called through the REST API.
+
+ALTER TABLE public.ideas ADD COLUMN IF NOT EXISTS member_count integer NOT NULL DEFAULT 0;
+
+UPDATE public.ideas i
+SET member_count = (SELECT count(*) FROM public.idea_members m WHERE m.idea_id = i.id AND m.status = 'accepted');
+
+CREATE INDEX IF NOT EXISTS ideas_member_count_created_at_id_idx
+  ON public.ideas (member_count DESC, created_at DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION public.count_idea_members()
+RETURNS trigger
+LANGUAGE plpgsql SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status AND OLD.idea_id = NEW.idea_id THEN
+    RETURN NULL;
+  END IF;
+  -- The row as it was stops counting, and the row as it is now starts counting.
+  IF TG_OP <> 'INSERT' THEN
+    IF OLD.status = 'accepted' THEN
+      UPDATE public.ideas SET member_count = member_count - 1 WHERE id = OLD.idea_id;
+    END IF;
+  END IF;
+  IF TG_OP <> 'DELETE' THEN
+    IF NEW.status = 'accepted' THEN
+      UPDATE public.ideas SET member_count = member_count + 1 WHERE id = NEW.idea_id;
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS idea_members_count ON public.idea_members;
+CREATE TRIGGER idea_members_count
+AFTER INSERT OR DELETE OR UPDATE OF status, idea_id ON public.idea_members
+FOR EACH ROW EXECUTE FUNCTION public.count_idea_members();
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from ideas.models import ImageVariants
+
+class FeedItem(BaseModel):
+    """The fields a feed card needs. The full idea text and members are loaded on the detail page."""
+    id: str
+    title: str
+    sub_title: Optional[str] = None
+    user_id: Optional[str] = None
+    image_url: Optional[str] = None
+    image_variants: Optional[ImageVariants] = None
+    created_at: Optional[datetime] = None
+    member_count: int = 0
+
+class FeedPage(BaseModel):
+    """One page of the feed. Pass `next_cursor` back as `cursor` to get the next page."""
+    items: List[FeedItem]
+    next_cursor: Optional[str] = None
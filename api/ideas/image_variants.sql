@@ -0,0 +1,8 @@
+-- Resized variants of idea images (see images.py).
+--
+-- Run this once in the Supabase SQL editor, before user/user_ideas.sql. It adds
+-- the column that holds the public URLs of an idea's image variants, as
+-- `{"thumb": ..., "card": ..., "full": ...}`. It is NULL for ideas without an
+-- image, or whose image couldn't be processed.
+
+ALTER TABLE public.ideas ADD COLUMN IF NOT EXISTS image_variants jsonb;
@@ -0,0 +1,164 @@
+"""
+This file contains the pipeline that turns an uploaded idea image into resized WebP variants.
+
+Idea images are uploaded at full resolution, often several hundred kilobytes
+for a photo, while a feed card only shows a small version of it. When an idea
+is created with an uploaded image, the image is decoded, resized to each of
+IMAGE_VARIANTS (never enlarged) and encoded as WebP, and the variants are stored
+next to the original. Clients pick the smallest variant that fits.
+
+This happens after the idea is created, in a background task of the request
+(`add_variants`), so creating an idea never waits for it: the idea starts out
+with only its original image and gets `image_variants` a moment later.
+
+- Decoding and encoding images is CPU-bound, so it runs in a pool of worker
+  processes (IMAGE_WORKERS) and never holds up the event loop. With
+  IMAGE_WORKERS=0 (the default on Vercel, where there is no room for extra
+  processes), it runs in a thread instead.
+- Variants are stored under the SHA-256 of the original image, so uploading the
+  same image again, by anyone, reuses the stored variants without processing them again.
+
+It needs the optional `Pillow` package (`pip install Pillow`). Without it, ideas
+keep only their original image.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+import db
+from auth import get_supabase
+from cache import idea_cache
+from metrics import track_upstream
+
+from .storage import STORAGE_BUCKET
+
+# The variants to create: name -> the longest edge in pixels.
+IMAGE_VARIANTS = {"thumb": 160, "card": 640, "full": 1600}
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "0" if os.getenv("VERCEL") else "2"))
+# Originals larger than this are not processed.
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+# The images this worker is processing, by digest, so that concurrent uploads of the same image are processed once.
+_processing: Dict[str, "asyncio.Future"] = {}
+
+
+def render_variants(data: bytes) -> Dict[str, bytes]:
+    """Resizes an image to each of IMAGE_VARIANTS and encodes them as WebP. Runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        # Apply the camera's orientation, since the EXIF data that holds it isn't kept.
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        variants = {}
+        for name, size in IMAGE_VARIANTS.items():
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            variant.save(output, format="WEBP", quality=IMAGE_QUALITY, method=4)
+            variants[name] = output.getvalue()
+        return variants
+
+
+@lru_cache(maxsize=None)
+def images_enabled() -> bool:
+    if importlib.util.find_spec("PIL") is None:
+        logging.warning("Pillow is not installed; idea images are served without resized variants.")
+        return False
+    return True
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Not forked: a fork of the server copies the locks its threads hold, which can deadlock the worker.
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def _render(data: bytes) -> Dict[str, bytes]:
+    if IMAGE_WORKERS > 0:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), render_variants, data)
+    return await run_in_threadpool(render_variants, data)
+
+
+def _variant_path(digest: str, name: str) -> str:
+    return f"variants/{digest}/{name}.webp"
+
+
+async def _store_variants(bucket, digest: str, data: bytes):
+    # "full" is uploaded last, so once it exists all the variants do.
+    with track_upstream("storage", "exists"):
+        if await run_in_threadpool(bucket.exists, _variant_path(digest, "full")):
+            return
+
+    variants = await _render(data)
+    for name in sorted(variants, key=lambda name: name == "full"):
+        with track_upstream("storage", "upload"):
+            await run_in_threadpool(
+                bucket.upload, _variant_path(digest, name), variants[name],
+                {"content-type": "image/webp", "cache-control": "31536000", "upsert": "true"},
+            )
+
+
+async def create_variants(path: str) -> Optional[Dict[str, str]]:
+    """
+    Creates the variants of the image at `path` in STORAGE_BUCKET and returns their public URLs by name.
+
+    Returns None if the image can't be processed (e.g. it isn't an image), in
+    which case the idea just keeps its original image.
+    """
+    if not images_enabled():
+        return None
+    bucket = get_supabase().storage.from_(STORAGE_BUCKET)
+    try:
+        with track_upstream("storage", "download"):
+            data = await run_in_threadpool(bucket.download, path)
+        if len(data) > IMAGE_MAX_BYTES:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+
+        stored = _processing.get(digest)
+        if stored is None:
+            stored = _processing[digest] = asyncio.ensure_future(_store_variants(bucket, digest, data))
+            stored.add_done_callback(lambda _: _processing.pop(digest, None))
+        # Shielded, so that a client that goes away doesn't cancel the work others are waiting for.
+        await asyncio.shield(stored)
+        return {name: bucket.get_public_url(_variant_path(digest, name)) for name in IMAGE_VARIANTS}
+    except Exception as e:
+        logging.warning(f"Could not create the variants of {STORAGE_BUCKET}/{path}: {e}")
+        return None
+
+
+async def add_variants(idea_id: str, path: str):
+    """Creates the variants of an idea's image at `path` and stores their URLs on the idea."""
+    variants = await create_variants(path)
+    if not variants:
+        return
+    try:
+        await db.ideas.update(idea_id, {"image_variants": variants})
+        await idea_cache.invalidate(idea_id)
+    except Exception as e:
+        logging.warning(f"Could not store the image variants of idea {idea_id}: {e}")
+
+
+def close_pool():
+    """Stops the worker processes. Called when the application shuts down."""
+    global _pool
+    if _pool is not None:
+        # Waits for the image being processed, if any: the server can be gone before the pool would
+        # tell its workers to exit otherwise (uvicorn re-raises SIGTERM), and they would be left running.
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
@@ -1,109 +1,153 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from typing import List, Optional
-from .models import Idea
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from typing import List, Literal, Optional
+from .models import Idea, IdeaPage, SignedUrls, UploadUrl
+from . import images, storage
 from auth.dependencies import get_current_user
 from auth.models import User
-from user.database import supabase
+from serialization import fast_response
+from conditional import conditional_response
 from uuid import UUID
+import db
+from cache import idea_cache
+from db.repositories import IDEA_COLUMNS
+from db.pagination import InvalidCursor, cursor_after, decode_cursor, fetch_page
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Idea])
-async def get_ideas():
+IDEAS_PAGE_SIZE = int(os.getenv("IDEAS_PAGE_SIZE", "20"))
+IDEAS_MAX_PAGE_SIZE = int(os.getenv("IDEAS_MAX_PAGE_SIZE", "100"))
+# The most files that can get upload URLs, and objects that can be signed, in one request.
+UPLOAD_BATCH_MAX_SIZE = int(os.getenv("UPLOAD_BATCH_MAX_SIZE", "20"))
+SIGN_BATCH_MAX_SIZE = int(os.getenv("SIGN_BATCH_MAX_SIZE", "200"))
+
+# The members are embedded by PostgREST, so ideas and members come back in one round trip.
+IDEA_COLUMNS_WITH_MEMBERS = f"{IDEA_COLUMNS},members:idea_members(*)"
+IDEA_COLUMNS_WITH_MEMBER_COUNT = f"{IDEA_COLUMNS},members:idea_members(count)"
+
+@router.get("/", response_model=IdeaPage)
+async def get_ideas(
+    limit: int = Query(IDEAS_PAGE_SIZE, ge=1, le=IDEAS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[Literal["pending", "accepted", "rejected"]] = None,
+    members: Literal["full", "count"] = "full",
+):
+    """
+    Returns a page of ideas, newest first, with their members nested in the same query.
+
+    `status` only keeps the members with that status, and `members=count` returns
+    just the number of members of each idea instead of the members themselves.
+    """
     try:
-        ideas_response = supabase.table("ideas").select("*").execute()
-        if not ideas_response.data:
-            return []
-        
-        ideas = ideas_response.data
-        idea_ids = [idea['id'] for idea in ideas]
-        
-        members_response = supabase.table("idea_members").select("*").in_("idea_id", idea_ids).execute()
-        members_by_idea = {}
-        if members_response.data:
-            for member in members_response.data:
-                if member['idea_id'] not in members_by_idea:
-                    members_by_idea[member['idea_id']] = []
-                members_by_idea[member['idea_id']].append(member)
-        
-        for idea in ideas:
-            idea["members"] = members_by_idea.get(idea['id'], [])
-            
-        return ideas
+        after = decode_cursor(cursor) if cursor else None
+        columns = IDEA_COLUMNS_WITH_MEMBER_COUNT if members == "count" else IDEA_COLUMNS_WITH_MEMBERS
+
+        ideas, has_more = await fetch_page(lambda n: db.ideas.page(columns, n, after=after, member_status=status), limit)
+        next_cursor = cursor_after(ideas[-1]) if has_more else None
+
+        if members == "count":
+            for idea in ideas:
+                counts = idea.pop("members", None) or []
+                idea["member_count"] = counts[0]["count"] if counts else 0
+
+        ideas = await storage.sign_images(ideas)
+        return fast_response(IdeaPage, {"items": ideas, "next_cursor": next_cursor}, trusted=True)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/", response_model=Idea)
 async def create_idea(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     sub_title: str = Form(...),
     full_explained_idea: str = Form(...),
     image_url: Optional[str] = Form(None),
+    image_path: Optional[str] = Form(None),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Creates an idea.
+
+    The image is either `image_url`, or `image_path` as returned by
+    `create_upload_url`. An image in the ideas bucket must be one of the user's
+    own uploads; it also gets resized variants (see images.py). They are made
+    after the response is sent, so the new idea doesn't have `image_variants` yet.
+    """
+    path = image_path or (storage.object_path(image_url) if image_url else None)
+    # The image of an idea can be read by everyone (see storage.readable_paths), so it can't be someone else's upload.
+    if path and not storage.is_own_path(str(current_user.id), path):
+        raise HTTPException(status_code=400, detail="The image must be one of your own uploads")
     try:
-        response = supabase.table("ideas").insert({
+        values = {
             "title": title,
             "sub_title": sub_title,
             "full_explained_idea": full_explained_idea,
             "user_id": str(current_user.id),
-            "image_url": image_url
-        }).execute()
+            "image_url": image_url or (storage.public_url(path) if path else None),
+        }
+        idea = await db.ideas.create(values)
 
-        if not response.data:
+        if not idea:
             raise HTTPException(status_code=500, detail="Failed to create idea in database")
 
-        return response.data[0]
+        await idea_cache.invalidate(idea["id"])
+        if path and images.images_enabled():
+            background_tasks.add_task(images.add_variants, idea["id"], path)
+        return (await storage.sign_images([idea]))[0]
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not create idea: {e}")
 
-@router.post("/create_upload_url")
+@router.post("/create_upload_url", response_model=UploadUrl)
 async def create_upload_url(file_name: str, current_user: User = Depends(get_current_user)):
+    """Returns a signed URL to upload one file to, and the `path` to pass as `image_path` when creating the idea."""
     try:
-        bucket_name = os.getenv("SUPABASE_STORAGE_BUCKET", "ideas")
-        file_path = f"{current_user.id}/{file_name}"
-        signed_url = supabase.storage.from_(bucket_name).create_signed_upload_url(file_path)
-        return {"signed_url": signed_url}
+        return (await storage.create_upload_urls(str(current_user.id), [file_name]))[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create signed URL: {e}")
 
-@router.get("/{idea_id}", response_model=Idea)
-async def get_idea(idea_id: UUID):
+@router.post("/upload_urls", response_model=List[UploadUrl])
+async def create_upload_urls(file_names: List[str], current_user: User = Depends(get_current_user)):
+    """Returns signed upload URLs for up to UPLOAD_BATCH_MAX_SIZE files, in the order of `file_names`."""
+    if len(file_names) > UPLOAD_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {UPLOAD_BATCH_MAX_SIZE} upload URLs can be created at once")
     try:
-        response = supabase.table("ideas").select("*").eq("id", str(idea_id)).execute()
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Idea not found")
-        
-        idea_data = response.data[0]
-        
-        # Fetch members
-        members_response = supabase.table("idea_members").select("*").eq("idea_id", str(idea_id)).execute()
-        idea_data["members"] = members_response.data if members_response.data else []
-        
-        return idea_data
+        return await storage.create_upload_urls(str(current_user.id), file_names)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to create signed URLs: {e}")
 
-@router.post("/{idea_id}/join")
-async def join_idea(idea_id: UUID, current_user: User = Depends(get_current_user)):
-    try:
-        # Check if the user has already requested to join
-        existing_request = supabase.table("idea_members").select("*").eq("idea_id", str(idea_id)).eq("user_id", str(current_user.id)).execute()
-        if existing_request.data:
-            raise HTTPException(status_code=400, detail="You have already requested to join this idea.")
+@router.post("/signed_urls", response_model=SignedUrls)
+async def create_signed_urls(paths: List[str], current_user: User = Depends(get_current_user)):
+    """
+    Returns signed read URLs for up to SIGN_BATCH_MAX_SIZE objects of the ideas bucket, with at most one storage call.
 
-        response = supabase.table("idea_members").insert({
-            "idea_id": str(idea_id),
-            "user_id": str(current_user.id),
-            "status": "pending"
-        }).execute()
-
-        if not response.data:
-            raise HTTPException(status_code=500, detail="Failed to join idea in database")
+    Only the user's own uploads and the images of existing ideas are signed;
+    any other path is returned in `missing`, as if it didn't exist.
+    """
+    paths = list(dict.fromkeys(paths))
+    if len(paths) > SIGN_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {SIGN_BATCH_MAX_SIZE} objects can be signed at once")
+    try:
+        urls = await storage.sign_paths(await storage.readable_paths(str(current_user.id), paths))
+        return {"urls": urls, "missing": [path for path in paths if path not in urls]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create signed URLs: {e}")
 
-        return response.data[0]
+@router.get("/{idea_id}", response_model=Idea)
+async def get_idea(idea_id: UUID, request: Request, response: Response):
+    try:
+        # The idea and its members are read in one query, and hot ideas are served from the cache.
+        idea_data = await idea_cache.get_idea(str(idea_id))
+        if not idea_data:
+            raise HTTPException(status_code=404, detail="Idea not found")
 
+        idea_data = (await storage.sign_images([idea_data]))[0]
+        return conditional_response(request, response, Idea, idea_data, trusted=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Could not join idea: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
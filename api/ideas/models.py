@@ -1,7 +1,16 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
+from datetime import datetime
 from message.models import IdeaMember
 
+
+class ImageVariants(BaseModel):
+    """The resized WebP versions of an idea's image (see images.py)."""
+    thumb: str
+    card: str
+    full: str
+
+
 class Idea(BaseModel):
     id: str
     title: str
@@ -9,10 +18,34 @@ class Idea(BaseModel):
     full_explained_idea: str
     user_id: str
     image_url: Optional[str] = None
+    image_variants: Optional[ImageVariants] = None
+    created_at: Optional[datetime] = None
     members: List[IdeaMember] = []
+    member_count: Optional[int] = None
+
+
+class IdeaPage(BaseModel):
+    """One page of ideas. Pass `next_cursor` back as `cursor` to get the next page."""
+    items: List[Idea]
+    next_cursor: Optional[str] = None
+
 
 class IdeaCreate(BaseModel):
     title: str
     sub_title: str
     full_explained_idea: str
-    image_url: Optional[str] = None
\ No newline at end of file
+    image_url: Optional[str] = None
+
+
+class UploadUrl(BaseModel):
+    """A signed URL to upload one file to, and the path the file will be stored under."""
+    file_name: str
+    path: str
+    signed_url: str
+    token: str
+
+
+class SignedUrls(BaseModel):
+    """Signed read URLs keyed by object path. `missing` lists the paths that couldn't be signed."""
+    urls: Dict[str, str]
+    missing: List[str] = []
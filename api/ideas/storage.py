@@ -0,0 +1,168 @@
+"""
+This file contains the service that hands out signed storage URLs for idea images.
+
+- Upload URLs: `create_upload_urls` issues signed upload URLs for many files in
+  one API request. Storage has no batch endpoint for them, so they are requested
+  concurrently. Objects are stored under a random name in the user's folder,
+  never under the name the client sent, so a file name can't reach into another
+  folder or overwrite an earlier upload.
+- Read URLs: `sign_paths` signs any number of objects with a single storage call
+  and caches every signed URL until SIGNED_URL_REFRESH_MARGIN seconds before it
+  expires, so a feed page full of images usually needs no storage call at all.
+  Users only get read URLs for what they may see (`readable_paths`): their own
+  uploads, and the images of existing ideas.
+
+With STORAGE_SIGNED_URLS=true (for a private bucket), `sign_images` swaps the
+image URLs of the ideas an endpoint returns for signed ones.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from starlette.concurrency import run_in_threadpool
+
+import db
+from auth import SUPABASE_URL, get_supabase
+from cache import get_backend
+from metrics import track_upstream
+
+STORAGE_BUCKET = os.getenv("SUPABASE_STORAGE_BUCKET", "ideas")
+STORAGE_SIGNED_URLS = os.getenv("STORAGE_SIGNED_URLS", "false").lower() == "true"
+# How long signed read URLs are valid for, and how long before that they are signed again.
+SIGNED_URL_EXPIRES_IN = int(os.getenv("SIGNED_URL_EXPIRES_IN", "3600"))
+SIGNED_URL_REFRESH_MARGIN = int(os.getenv("SIGNED_URL_REFRESH_MARGIN", "300"))
+
+# The storage object a URL points at: /storage/v1/object/[upload/sign/|sign/|public/|authenticated/]<bucket>/<path>
+_OBJECT_URL = re.compile(r"^/storage/v1/object/(?:upload/sign/|sign/|public/|authenticated/)?([^/]+)/(.+)$")
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,8}$")
+# The path of an image variant (see images.py): variants/<digest>/<name>.webp
+_VARIANT_PATH = re.compile(r"^variants/([0-9a-f]{64})/\w+\.webp$")
+
+
+def object_path(url: str) -> Optional[str]:
+    """Returns the path in STORAGE_BUCKET of an object stored in this project's storage, or None."""
+    parsed = urlparse(url)
+    if parsed.netloc and parsed.netloc != urlparse(SUPABASE_URL).netloc:
+        return None
+    match = _OBJECT_URL.match(parsed.path)
+    if not match or match.group(1) != STORAGE_BUCKET:
+        return None
+    return match.group(2)
+
+
+def public_url(path: str) -> str:
+    return get_supabase().storage.from_(STORAGE_BUCKET).get_public_url(path)
+
+
+def upload_path(user_id: str, file_name: str) -> str:
+    """Returns a new object path in the user's folder, keeping only the extension of `file_name`."""
+    extension = os.path.splitext(file_name)[1].lower()
+    return f"{user_id}/{uuid.uuid4().hex}{extension if _EXTENSION.match(extension) else ''}"
+
+
+async def create_upload_urls(user_id: str, file_names: List[str]) -> List[Dict[str, Any]]:
+    """Returns a signed upload URL and the object path of each file, in the order of `file_names`."""
+    bucket = get_supabase().storage.from_(STORAGE_BUCKET)
+
+    async def create(file_name: str) -> Dict[str, Any]:
+        path = upload_path(user_id, file_name)
+        with track_upstream("storage", "create_signed_upload_url"):
+            signed = await run_in_threadpool(bucket.create_signed_upload_url, path)
+        return {"file_name": file_name, "path": path, "signed_url": signed["signed_url"], "token": signed["token"]}
+
+    return list(await asyncio.gather(*(create(file_name) for file_name in file_names)))
+
+
+def is_own_path(user_id: str, path: str) -> bool:
+    """Returns whether `path` is an object in the user's own folder of STORAGE_BUCKET."""
+    return path.startswith(f"{user_id}/") and ".." not in path.split("/")
+
+
+async def readable_paths(user_id: str, paths: Iterable[str]) -> List[str]:
+    """
+    Returns the paths in `paths` that the user may get read URLs for, in order.
+
+    Those are the objects in the user's own folder, and the images (and image
+    variants) of existing ideas. Everything else in the bucket, like other
+    users' uploads that no idea uses, stays private.
+    """
+    paths = [path for path in dict.fromkeys(paths) if path and ".." not in path.split("/") and not path.startswith("/")]
+    others = [path for path in paths if not is_own_path(user_id, path)]
+    referenced = set()
+    if others:
+        # The variants of an image are stored together, so an idea is found by the URL of its "full" variant.
+        lookups = {}
+        for path in others:
+            variant = _VARIANT_PATH.match(path)
+            lookups[path] = public_url(f"variants/{variant.group(1)}/full.webp" if variant else path)
+        for idea in await db.ideas.list_by_images(lookups.values()):
+            urls = [idea.get("image_url")] + list((idea.get("image_variants") or {}).values())
+            referenced.update(object_path(url) for url in urls if url)
+    return [path for path in paths if is_own_path(user_id, path) or path in referenced]
+
+
+def _signed_url_key(path: str) -> str:
+    return f"signed_url:{STORAGE_BUCKET}:{path}"
+
+
+async def sign_paths(paths: Iterable[str]) -> Dict[str, str]:
+    """
+    Returns signed read URLs for objects in STORAGE_BUCKET, keyed by path.
+
+    Cached URLs are reused; the rest are signed with one storage call. Paths that
+    can't be signed (e.g. missing objects) are left out.
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return {}
+    backend = get_backend()
+    cached = await backend.get_many([_signed_url_key(path) for path in paths])
+    urls = {path: url for path, url in zip(paths, cached) if url is not None}
+
+    misses = [path for path in paths if path not in urls]
+    if misses:
+        bucket = get_supabase().storage.from_(STORAGE_BUCKET)
+        with track_upstream("storage", "create_signed_urls"):
+            signed = await run_in_threadpool(bucket.create_signed_urls, misses, SIGNED_URL_EXPIRES_IN)
+        fresh = {item["path"]: item["signedURL"] for item in signed if not item.get("error") and item.get("signedURL")}
+        if fresh:
+            await backend.set_many({_signed_url_key(path): url for path, url in fresh.items()},
+                                   max(SIGNED_URL_EXPIRES_IN - SIGNED_URL_REFRESH_MARGIN, 1))
+        urls.update(fresh)
+    return urls
+
+
+async def sign_images(ideas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Returns copies of `ideas` whose image URLs are signed, when STORAGE_SIGNED_URLS is set.
+
+    All the images of all the ideas are signed together, with at most one storage
+    call. If signing fails, the ideas are returned unchanged.
+    """
+    if not STORAGE_SIGNED_URLS or not ideas:
+        return ideas
+    urls = [idea.get("image_url") for idea in ideas]
+    urls += [url for idea in ideas for url in (idea.get("image_variants") or {}).values()]
+    paths = {url: object_path(url) for url in urls if url}
+    try:
+        signed = await sign_paths(path for path in paths.values() if path)
+    except Exception as e:
+        logging.warning(f"Could not sign image URLs: {e}")
+        return ideas
+
+    def sign(url: Optional[str]) -> Optional[str]:
+        return signed.get(paths.get(url), url) if url else url
+
+    results = []
+    for idea in ideas:
+        idea = dict(idea)
+        idea["image_url"] = sign(idea.get("image_url"))
+        if idea.get("image_variants"):
+            idea["image_variants"] = {name: sign(url) for name, url in idea["image_variants"].items()}
+        results.append(idea)
+    return results
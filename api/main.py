@@ -5,22 +5,55 @@ It brings together all the different parts of the application, including the
 authentication and user profile modules, and exposes the API endpoints.
 """
 
-from fastapi import FastAPI, Depends
-from auth.login import router as login_router
-from auth.signup import router as signup_router
-from auth.forgot_password import router as forgot_password_router
-from user.main import router as user_router
-from ideas.main import router as ideas_router
-from message.main import router as message_router
-from feed.main import router as feed_router
-from search.main import router as search_router
-from auth.dependencies import get_current_user
+import importlib
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from metrics import MetricsMiddleware, TracingMiddleware, trace_exporter
+import db
+from db import LoaderMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from auth.models import User
+
+# Import each router the first time a request needs it instead of all of them at start up.
+# This shortens cold starts on serverless platforms (it is on by default on Vercel), where
+# every new instance imports the app while a user is waiting for the response.
+LAZY_ROUTERS = os.getenv("LAZY_ROUTERS", "true" if os.getenv("VERCEL") else "false").lower() == "true"
+
+# Every router of the API, in the order its routes are matched: the module that defines it,
+# its prefix, its tags, and the paths it serves (used to find the routers a request needs).
+ROUTERS = [
+    ("auth.login", "/auth", ["Authentication"], ("/auth",)),
+    ("auth.signup", "/auth", ["Authentication"], ("/auth",)),
+    ("auth.forgot_password", "/auth", ["Authentication"], ("/auth",)),
+    ("user.main", "/user", ["User Profile"], ("/user",)),
+    ("ideas.main", "/ideas", ["Ideas"], ("/ideas",)),
+    ("message.main", "", ["Messaging"], ("/ideas", "/ws")),
+    ("feed.main", "/feed", ["feed"], ("/feed",)),
+    ("search.main", "/search", ["search"], ("/search",)),
+    ("metrics.main", "", ["metrics"], ("/metrics",)),
+    ("auth.me", "", [], ("/users",)),
+]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Flushes queued chat messages and traces, and closes the realtime subscription, the image workers and the pooled database connections on shutdown."""
+    yield
+    # Imported here rather than at the top so that the chat stays out of the lazy cold start.
+    from message.hub import chat_hub
+    from message.pipeline import message_writer
+    from ideas import images
+
+    await message_writer.stop()
+    await chat_hub.stop()
+    images.close_pool()
+    await db.close_client()
+    await trace_exporter.stop()
+
 
 # Create the main FastAPI application
 # We are disabling the auto-generated docs since we have a custom README for guidance.
-app = FastAPI(docs_url=None, redoc_url=None)
+app = FastAPI(docs_url=None, redoc_url=None, lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
@@ -36,22 +69,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record request counts, latencies and upstream calls for every route
+app.add_middleware(MetricsMiddleware)
+# Trace every request, and log the ones that are slow with the upstream calls they made
+app.add_middleware(TracingMiddleware)
+# Batch and memoize lookups by ID for the duration of each request
+app.add_middleware(LoaderMiddleware)
+
 
 # --- API Routers ---
 
-# Include the authentication routers
-app.include_router(login_router, prefix="/auth", tags=["Authentication"])
-app.include_router(signup_router, prefix="/auth", tags=["Authentication"])
-app.include_router(forgot_password_router, prefix="/auth", tags=["Authentication"])
+class RouterLoader:
+    """Includes the routers of ROUTERS in the app, either all at once or each one when it is first needed."""
+
+    def __init__(self, app: FastAPI, routers):
+        self.app = app
+        self.routers = routers
+        self.loaded = set()
+        self.order = {}
+
+    @property
+    def complete(self) -> bool:
+        return len(self.loaded) == len(self.routers)
 
-# Include the user profile router
-app.include_router(user_router, prefix="/user", tags=["User Profile"])
+    def load(self, indexes):
+        for index in indexes:
+            module, prefix, tags, _ = self.routers[index]
+            router = importlib.import_module(module).router
+            start = len(self.app.router.routes)
+            self.app.include_router(router, prefix=prefix, tags=tags)
+            for route in self.app.router.routes[start:]:
+                self.order[id(route)] = index
+            self.loaded.add(index)
+        # Routes match in the order they are listed, so keep them in the order of ROUTERS
+        # whatever order they were loaded in. The app's own routes come last, as when
+        # everything is loaded up front.
+        self.app.router.routes.sort(key=lambda route: self.order.get(id(route), len(self.routers)))
+        self.app.openapi_schema = None
 
-# Include the ideas router
-app.include_router(ideas_router, prefix="/ideas", tags=["Ideas"])
-app.include_router(message_router, tags=["Messaging"])
-app.include_router(feed_router, prefix="/feed", tags=["feed"])
-app.include_router(search_router, prefix="/search", tags=["search"])
+    def load_all(self):
+        self.load([index for index in range(len(self.routers)) if index not in self.loaded])
+
+    def load_for(self, path: str):
+        if path == self.app.openapi_url:
+            self.load_all()
+            return
+        needed = [
+            index for index, (_, _, _, paths) in enumerate(self.routers)
+            if index not in self.loaded and any(path == served or path.startswith(served + "/") for served in paths)
+        ]
+        if needed:
+            self.load(needed)
+
+
+class LazyRouterMiddleware:
+    """Loads the routers a request needs before it is routed."""
+
+    def __init__(self, app, loader: RouterLoader):
+        self.app = app
+        self.loader = loader
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and not self.loader.complete:
+            path = scope["path"]
+            root_path = scope.get("root_path", "")
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            self.loader.load_for(path)
+        await self.app(scope, receive, send)
+
+
+router_loader = RouterLoader(app, ROUTERS)
+if LAZY_ROUTERS:
+    app.add_middleware(LazyRouterMiddleware, loader=router_loader)
+else:
+    router_loader.load_all()
 
 
 # --- API Endpoints ---
@@ -60,12 +152,3 @@ app.include_router(search_router, prefix="/search", tags=["search"])
 async def root():
     """A simple welcome message to let you know the API is running.""" 
     return {"message": "Welcome to the TeamJoin backend!"}
-
-@app.get("/users/me", response_model=User)
-async def read_current_user_info(current_user: User = Depends(get_current_user)):
-    """
-    Get the basic information for the currently logged-in user.
-
-    This is a protected endpoint and requires a valid JWT access token.
-    """
-    return {"id": current_user.id, "email": current_user.email}
@@ -1,106 +1,186 @@
 
+import asyncio
 from fastapi import HTTPException
-from auth import supabase
+import db
+from cache import idea_cache
+from db.pagination import InvalidCursor, cursor_after, decode_cursor, fetch_page
+from db.repositories import MESSAGE_COLUMNS
 from . import models
 import uuid
-from typing import List
+from typing import Any, Dict, List, Optional
 
-async def create_join_request(idea_id: uuid.UUID, user_id: uuid.UUID) -> models.IdeaMember:
-    try:
-        response = supabase.table('idea_members').insert({
-            'idea_id': str(idea_id),
-            'user_id': str(user_id),
-            'status': 'pending'
-        }).execute()
+# The columns a client can ask for in the message history.
+MESSAGE_FIELDS = MESSAGE_COLUMNS.split(",")
+
+async def can_access_idea_chat(idea_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """
+    Returns True if the user owns the idea or is an accepted member of it.
+
+    This is the single authorization check for reading and writing an idea's chat,
+    over REST and over the WebSocket. It is one cached lookup for hot ideas and a
+    single query otherwise.
+    """
+    return str(user_id) in await idea_cache.get_chat_member_ids(str(idea_id))
 
-        if not response.data:
-            raise HTTPException(status_code=500, detail="Failed to create join request")
+async def join_ideas(idea_ids: List[uuid.UUID], user_id: uuid.UUID) -> List[models.IdeaMember]:
+    """
+    Asks to join each of the ideas and returns the user's request for each of them.
 
-        return models.IdeaMember(**response.data[0])
+    This is one upsert however many ideas are asked for, and it is idempotent: a user
+    who already asked to join an idea (or was accepted or rejected) gets that request
+    back instead of a duplicate. Ideas that don't exist are left out.
+    """
+    try:
+        rows = await db.idea_members.join(dict.fromkeys(str(idea_id) for idea_id in idea_ids), str(user_id))
+        # Only new requests change an idea's members.
+        await asyncio.gather(*(idea_cache.invalidate_members(row["idea_id"]) for row in rows if row.get("created")))
+        return [models.IdeaMember(**row) for row in rows]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def join_idea(idea_id: uuid.UUID, user_id: uuid.UUID) -> models.IdeaMember:
+    members = await join_ideas([idea_id], user_id)
+    if not members:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    return members[0]
+
 async def get_join_requests(idea_id: uuid.UUID, owner_id: uuid.UUID) -> List[models.IdeaMember]:
     try:
         # First, verify the current user is the owner of the idea
-        idea_response = supabase.table('ideas').select('user_id').eq('id', str(idea_id)).execute()
-        if not idea_response.data or idea_response.data[0]['user_id'] != str(owner_id):
+        if await idea_cache.get_owner_id(str(idea_id)) != str(owner_id):
             raise HTTPException(status_code=403, detail="Only the idea owner can view join requests")
 
         # If owner is verified, fetch the join requests
-        response = supabase.table('idea_members').select('*').eq('idea_id', str(idea_id)).eq('status', 'pending').execute()
-        
-        if not response.data:
-            return []
+        rows = await db.idea_members.list_for_idea(str(idea_id), status='pending')
 
-        return [models.IdeaMember(**row) for row in response.data]
+        return [models.IdeaMember(**row) for row in rows]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def update_join_request(request_id: uuid.UUID, status: str, owner_id: uuid.UUID) -> models.IdeaMember:
+async def get_owner_join_requests(owner_id: uuid.UUID, status: Optional[str] = "pending") -> List[models.IdeaMember]:
+    """Returns the join requests for all the ideas the user owns, oldest first, in one query."""
     try:
-        # Verify the current user owns the idea associated with the request
-        request_response = supabase.table('idea_members').select('idea_id').eq('id', str(request_id)).execute()
-        if not request_response.data:
-            raise HTTPException(status_code=404, detail="Join request not found")
-
-        idea_id = request_response.data[0]['idea_id']
-        idea_response = supabase.table('ideas').select('user_id').eq('id', str(idea_id)).execute()
-        if not idea_response.data or idea_response.data[0]['user_id'] != str(owner_id):
-            raise HTTPException(status_code=403, detail="Only the idea owner can update join requests")
+        rows = await db.idea_members.list_for_owner(str(owner_id), status=status)
+        return [models.IdeaMember(**row) for row in rows]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Update the request status
-        response = supabase.table('idea_members').update({'status': status}).eq('id', str(request_id)).execute()
+async def review_join_requests(decisions: Dict[str, str], owner_id: uuid.UUID) -> List[models.IdeaMember]:
+    """
+    Sets the status of many join requests at once.
 
-        if not response.data:
-            raise HTTPException(status_code=500, detail="Failed to update join request")
+    `decisions` maps request IDs to their new status. The requests are looked up
+    in one query, the owner of each of their ideas is checked once (from the
+    cache when possible), and all of them are updated in one statement. Nothing is
+    updated if any request doesn't exist or belongs to an idea the user doesn't own.
+    """
+    try:
+        decisions = {str(request_id): status for request_id, status in decisions.items()}
+        requests = await db.idea_members.list_by_ids(decisions, columns='id,idea_id')
+        idea_ids = {row['id']: row['idea_id'] for row in requests}
+        missing = [request_id for request_id in decisions if request_id not in idea_ids]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Join request not found: {', '.join(missing)}")
+
+        ideas = list(set(idea_ids.values()))
+        owners = await asyncio.gather(*(idea_cache.get_owner_id(idea_id) for idea_id in ideas))
+        if any(owner != str(owner_id) for owner in owners):
+            raise HTTPException(status_code=403, detail="Only the idea owner can update join requests")
 
-        return models.IdeaMember(**response.data[0])
+        rows = await db.idea_members.review(decisions, str(owner_id))
+        await asyncio.gather(*(idea_cache.invalidate_members(idea_id) for idea_id in ideas))
+        return [models.IdeaMember(**row) for row in rows]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def update_join_request(request_id: uuid.UUID, status: str, owner_id: uuid.UUID) -> models.IdeaMember:
+    members = await review_join_requests({str(request_id): status}, owner_id)
+    if not members:
+        raise HTTPException(status_code=500, detail="Failed to update join request")
+    return members[0]
+
 async def create_message(idea_id: uuid.UUID, sender_id: uuid.UUID, content: str) -> models.Message:
     try:
-        # Verify the sender is a member of the idea
-        membership_response = supabase.table('idea_members').select('*').eq('idea_id', str(idea_id)).eq('user_id', str(sender_id)).eq('status', 'accepted').execute()
-        idea_owner_response = supabase.table('ideas').select('user_id').eq('id', str(idea_id)).execute()
-
-        is_owner = idea_owner_response.data and idea_owner_response.data[0]['user_id'] == str(sender_id)
-
-        if not membership_response.data and not is_owner:
+        # Verify the sender is a member of the idea or the owner
+        if not await can_access_idea_chat(idea_id, sender_id):
             raise HTTPException(status_code=403, detail="You are not a member of this idea's chat")
 
         # Create the message
-        response = supabase.table('messages').insert({
-            'idea_id': str(idea_id),
-            'sender_id': str(sender_id),
-            'content': content
-        }).execute()
+        message = await db.messages.create(str(idea_id), str(sender_id), content)
 
-        if not response.data:
+        if not message:
             raise HTTPException(status_code=500, detail="Failed to create message")
 
-        return models.Message(**response.data[0])
+        return models.Message(**message)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def get_messages(idea_id: uuid.UUID, user_id: uuid.UUID) -> List[models.Message]:
+async def get_message_history(
+    idea_id: uuid.UUID,
+    user_id: uuid.UUID,
+    limit: int,
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Returns a page of an idea's chat, oldest message first.
+
+    Without a cursor this is the latest `limit` messages. `before` scrolls back from
+    a `before_cursor`, and `since` returns what was sent after a `since_cursor`
+    (e.g. after a reconnect). Every page is a single keyset query, so opening a long
+    chat costs the same as opening a new one.
+
+    Args:
+        fields: The message columns to return. `id` and `created_at` are always
+            included because the cursors are built from them.
+    """
     try:
         # Verify the user is a member of the idea or the owner
-        membership_response = supabase.table('idea_members').select('*').eq('idea_id', str(idea_id)).eq('user_id', str(user_id)).eq('status', 'accepted').execute()
-        idea_owner_response = supabase.table('ideas').select('user_id').eq('id', str(idea_id)).execute()
-
-        is_owner = idea_owner_response.data and idea_owner_response.data[0]['user_id'] == str(user_id)
-
-        if not membership_response.data and not is_owner:
+        if not await can_access_idea_chat(idea_id, user_id):
             raise HTTPException(status_code=403, detail="You are not authorized to view these messages")
 
-        # Fetch messages
-        response = supabase.table('messages').select('*').eq('idea_id', str(idea_id)).order('created_at').execute()
-
-        if not response.data:
-            return []
-
-        return [models.Message(**row) for row in response.data]
+        columns = MESSAGE_COLUMNS
+        if fields:
+            unknown = set(fields) - set(MESSAGE_FIELDS)
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown message fields: {', '.join(sorted(unknown))}")
+            columns = ",".join(field for field in MESSAGE_FIELDS if field in fields or field in ("id", "created_at"))
+
+        before_position = decode_cursor(before) if before else None
+        since_position = decode_cursor(since) if since else None
+
+        rows, has_more = await fetch_page(
+            lambda n: db.messages.page(str(idea_id), n, columns=columns, before=before_position, since=since_position), limit)
+        if not since_position:
+            # The latest messages come back newest first; the client wants them in chat order.
+            rows.reverse()
+
+        before_cursor = None
+        if rows and (since_position or has_more):
+            before_cursor = cursor_after(rows[0])
+
+        since_cursor = since
+        if rows:
+            since_cursor = cursor_after(rows[-1])
+
+        return {
+            "items": rows,
+            "before_cursor": before_cursor,
+            "since_cursor": since_cursor,
+            "has_more": has_more if since_position else False,
+        }
+    except HTTPException:
+        raise
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
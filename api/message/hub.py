@@ -0,0 +1,190 @@
+"""
+This file contains the realtime hub that delivers new chat messages to WebSocket clients.
+
+The hub holds one Supabase Realtime subscription for the whole process, on
+INSERTs into the 'messages' table. Every new message is looked up by its idea
+and pushed into the queue of each socket subscribed to that idea, so a worker
+can hold thousands of idle chat sockets with a single upstream channel, and
+messages are delivered as soon as they arrive.
+
+Each subscriber has a bounded queue. A client that reads too slowly to keep up
+is not allowed to make the hub buffer without limit: once its queue is full it
+is marked as overflowed and its socket is closed, and the client is expected to
+reconnect and catch up with the history endpoint (`since=`).
+
+The same goes for every subscriber when the upstream subscription is lost (the
+realtime connection closed and could not be restored). The realtime client
+doesn't say when that happens, so a watchdog finds out by itself: every
+CHAT_HUB_CHECK_SECONDS it broadcasts a ping on a channel of its own, and if the
+ping doesn't come back before the next check, it logs a warning and closes all
+the chat sockets, so that their clients catch up on what they missed and
+reconnect; the first of them subscribes again.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any, Dict, Optional, Set, Tuple
+
+from realtime import AsyncRealtimeChannel, AsyncRealtimeClient
+
+from auth import SUPABASE_URL, SUPABASE_KEY
+
+# How many undelivered messages a single socket may have before it is dropped.
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "256"))
+# How often the hub checks that its realtime subscription is still alive, in seconds.
+CHAT_HUB_CHECK_SECONDS = float(os.getenv("CHAT_HUB_CHECK_SECONDS", "5"))
+
+# The close codes and reasons a socket gets when its subscription ends.
+CLOSE_OVERFLOWED = (1013, "Too many undelivered messages")
+CLOSE_UPSTREAM_LOST = (1012, "Chat connection lost, reconnect and catch up")
+
+
+class Subscription:
+    """One socket's view of an idea's chat: a bounded queue of messages waiting to be sent."""
+
+    def __init__(self, idea_id: str, maxsize: int = CHAT_QUEUE_SIZE):
+        self.idea_id = idea_id
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=maxsize)
+        # The (code, reason) to close the socket with, once the subscription has ended.
+        self.closed: Optional[Tuple[int, str]] = None
+
+    @property
+    def overflowed(self) -> bool:
+        return self.closed == CLOSE_OVERFLOWED
+
+    def deliver(self, message: Dict[str, Any]):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Drop the consumer, not the message stream.
+            self.close(CLOSE_OVERFLOWED)
+
+    def close(self, reason: Tuple[int, str]):
+        """Ends the subscription and wakes up its reader, so that it closes the socket with `reason`."""
+        if self.closed:
+            return
+        self.closed = reason
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """Waits for the next message. Returns None once the subscription has ended (see `closed`)."""
+        message = await self.queue.get()
+        return None if self.closed else message
+
+
+class ChatHub:
+    """Fans out message INSERTs from one realtime subscription to per-idea subscriber sets."""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self._client: Optional[AsyncRealtimeClient] = None
+        self._ping_channel: Optional[AsyncRealtimeChannel] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._watchdog: Optional[asyncio.Task] = None
+        # When the last ping came back (see _watch), in event loop time.
+        self._last_pong = 0.0
+
+    def is_connected(self) -> bool:
+        """Whether the realtime subscription is open. A connection that dies is noticed by the watchdog (see _watch)."""
+        return self._client is not None and self._client.is_connected
+
+    async def ensure_started(self):
+        """Opens the realtime subscription the first time a socket needs it, or again after it was lost."""
+        if self.is_connected():
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.is_connected():
+                return
+            if self._client is not None:
+                await self._reset()
+            # The hub reconnects by itself (see _watch), so the client must not retry on its own
+            # in the background while messages are being missed.
+            client = AsyncRealtimeClient(f"{SUPABASE_URL.rstrip('/')}/realtime/v1", SUPABASE_KEY, auto_reconnect=False)
+            await client.connect()
+            channel = client.channel("teamjoin_messages")
+            channel.on_postgres_changes("INSERT", self._on_insert, table="messages", schema="public")
+            await channel.subscribe()
+            # A channel only this hub is on, whose broadcasts come back to it: the watchdog's pings.
+            ping_channel = client.channel(f"teamjoin_hub_{uuid.uuid4().hex}", {"config": {
+                "broadcast": {"ack": False, "self": True}, "presence": {"key": "", "enabled": False}, "private": False,
+            }})
+            ping_channel.on_broadcast("ping", self._on_pong)
+            await ping_channel.subscribe()
+            self._client, self._ping_channel = client, ping_channel
+            if self._watchdog is None or self._watchdog.done():
+                self._watchdog = asyncio.create_task(self._watch())
+            logging.info("Chat hub subscribed to message inserts")
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while self._client is not None:
+            client, pinged_at = self._client, loop.time()
+            try:
+                await self._ping_channel.send_broadcast("ping", {})
+            except Exception as e:
+                # The ping won't come back, which is handled below.
+                logging.warning(f"Chat hub could not ping its realtime subscription: {e}")
+            await asyncio.sleep(CHAT_HUB_CHECK_SECONDS)
+            # A client that replaced the pinged one in the meantime gets its own ping on the next round.
+            if self._client is client and (not self.is_connected() or self._last_pong < pinged_at):
+                sockets = sum(len(subscribers) for subscribers in self.subscribers.values())
+                logging.warning(f"Chat hub lost its realtime subscription; closing {sockets} chat sockets so they reconnect")
+                await self._reset()
+
+    async def _reset(self):
+        """Drops the realtime client and ends every subscription, since they may have missed messages."""
+        client, self._client, self._ping_channel = self._client, None, None
+        for subscribers in list(self.subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close(CLOSE_UPSTREAM_LOST)
+        if client is not None:
+            try:
+                await client.close()
+            except Exception as e:
+                logging.warning(f"Could not close the lost realtime connection: {e}")
+
+    def _on_pong(self, payload: Dict[str, Any]):
+        self._last_pong = asyncio.get_running_loop().time()
+
+    def _on_insert(self, payload: Dict[str, Any]):
+        record = (payload.get("data") or {}).get("record")
+        if record:
+            self.publish(record)
+
+    def publish(self, message: Dict[str, Any]):
+        """Delivers a message to every socket subscribed to its idea."""
+        for subscription in list(self.subscribers.get(str(message.get("idea_id")), ())):
+            subscription.deliver(message)
+
+    def subscribe(self, idea_id: str) -> Subscription:
+        subscription = Subscription(idea_id)
+        self.subscribers.setdefault(idea_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.subscribers.get(subscription.idea_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            # Don't keep empty sets around for ideas nobody is watching any more.
+            del self.subscribers[subscription.idea_id]
+
+    async def stop(self):
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        if self._client is not None:
+            await self._client.close()
+            self._client, self._ping_channel = None, None
+
+
+chat_hub = ChatHub()
@@ -0,0 +1,34 @@
+-- Idempotent joins for POST /ideas/{idea_id}/join and POST /ideas/join.
+--
+-- Run this once in the Supabase SQL editor. It removes duplicate join requests
+-- (keeping the oldest request of each user for each idea), makes
+-- `(idea_id, user_id)` unique so that duplicates can't come back, and adds the
+-- function the API calls through PostgREST (`/rest/v1/rpc/join_ideas`).
+--
+-- `join_ideas` asks to join every idea in `idea_ids` in a single statement. A
+-- user who has no request for an idea gets a pending one; a user who already has
+-- one gets it back unchanged, whatever its status. Concurrent joins by the same
+-- user wait on the unique index instead of both inserting. `created` tells the
+-- two cases apart. Ideas that don't exist are skipped.
+
+DELETE FROM public.idea_members m
+USING public.idea_members older
+WHERE m.idea_id = older.idea_id
+  AND m.user_id = older.user_id
+  AND (m.created_at, m.id) > (older.created_at, older.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idea_members_idea_id_user_id_key ON public.idea_members (idea_id, user_id);
+
+CREATE OR REPLACE FUNCTION public.join_ideas(member_id uuid, idea_ids uuid[])
+RETURNS TABLE (
+  id uuid, idea_id uuid, user_id uuid, status text, created_at timestamptz, created boolean
+)
+LANGUAGE sql VOLATILE
+AS $$
+  INSERT INTO public.idea_members AS m (idea_id, user_id, status)
+  SELECT i.id, member_id, 'pending' FROM public.ideas i WHERE i.id = ANY(idea_ids)
+  -- The no-op update makes the statement return the existing row, even one a
+  -- concurrent transaction has just inserted.
+  ON CONFLICT (idea_id, user_id) DO UPDATE SET status = m.status
+  RETURNING m.id, m.idea_id, m.user_id, m.status, m.created_at, (m.xmax = 0);
+$$;
@@ -1,24 +1,60 @@
 
 import asyncio
+import logging
+import os
+import time
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
 from . import models, database
 from auth.dependencies import get_current_user, get_current_user_ws
 from auth.models import User
-from auth import supabase
+from .hub import Subscription, chat_hub
+from .pipeline import message_writer
+from metrics import start_trace
+from pydantic import ValidationError
 import uuid
-from typing import List
+from typing import List, Optional
 import json
 
 router = APIRouter()
 
+# The most ideas that can be joined in one request.
+JOIN_BATCH_MAX_SIZE = int(os.getenv("JOIN_BATCH_MAX_SIZE", "50"))
+# The most join requests that can be reviewed in one request.
+REVIEW_BATCH_MAX_SIZE = int(os.getenv("REVIEW_BATCH_MAX_SIZE", "100"))
+
 @router.post("/ideas/{idea_id}/join", response_model=models.IdeaMember)
 async def request_to_join_idea(idea_id: uuid.UUID, current_user: User = Depends(get_current_user)):
-    return await database.create_join_request(idea_id=idea_id, user_id=current_user.id)
+    """Asks to join an idea, or returns the request the user already has for it."""
+    return await database.join_idea(idea_id=idea_id, user_id=current_user.id)
+
+@router.post("/ideas/join", response_model=List[models.IdeaMember])
+async def request_to_join_ideas(idea_ids: List[uuid.UUID], current_user: User = Depends(get_current_user)):
+    """Asks to join up to JOIN_BATCH_MAX_SIZE ideas at once. Ideas that don't exist are left out."""
+    if len(set(idea_ids)) > JOIN_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {JOIN_BATCH_MAX_SIZE} ideas can be joined at once")
+    return await database.join_ideas(idea_ids=idea_ids, user_id=current_user.id)
 
 @router.get("/ideas/{idea_id}/requests", response_model=List[models.IdeaMember])
 async def get_idea_join_requests(idea_id: uuid.UUID, current_user: User = Depends(get_current_user)):
     return await database.get_join_requests(idea_id=idea_id, owner_id=current_user.id)
 
+@router.get("/ideas/requests/pending", response_model=List[models.IdeaMember])
+async def get_owner_join_requests(current_user: User = Depends(get_current_user)):
+    """Returns the pending join requests for all the ideas the user owns, oldest first."""
+    return await database.get_owner_join_requests(owner_id=current_user.id)
+
+@router.put("/ideas/requests", response_model=List[models.IdeaMember])
+async def review_idea_join_requests(decisions: List[models.JoinRequestDecision], current_user: User = Depends(get_current_user)):
+    """
+    Accepts or rejects up to REVIEW_BATCH_MAX_SIZE join requests at once and returns them updated.
+
+    If a request is listed more than once, its last decision is applied.
+    """
+    statuses = {str(decision.request_id): decision.status for decision in decisions}
+    if len(statuses) > REVIEW_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {REVIEW_BATCH_MAX_SIZE} join requests can be reviewed at once")
+    return await database.review_join_requests(decisions=statuses, owner_id=current_user.id)
+
 @router.put("/ideas/requests/{request_id}", response_model=models.IdeaMember)
 async def update_idea_join_request(request_id: uuid.UUID, update: models.IdeaMemberUpdate, current_user: User = Depends(get_current_user)):
     return await database.update_join_request(request_id=request_id, status=update.status, owner_id=current_user.id)
@@ -27,6 +63,106 @@ async def update_idea_join_request(request_id: uuid.UUID, update: models.IdeaMem
 async def send_message_to_idea_chat(idea_id: uuid.UUID, message: models.MessageCreate, current_user: User = Depends(get_current_user)):
     return await database.create_message(idea_id=idea_id, sender_id=current_user.id, content=message.content)
 
+@router.get("/ideas/{idea_id}/messages", response_model=models.MessageHistory)
+async def get_idea_chat_history(
+    idea_id: uuid.UUID,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated message columns to return"),
+    current_user: User = Depends(get_current_user),
+):
+    if before and since:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'since', not both")
+    return await database.get_message_history(
+        idea_id=idea_id,
+        user_id=current_user.id,
+        limit=limit,
+        before=before,
+        since=since,
+        fields=fields.split(",") if fields else None,
+    )
+
+# How many of a socket's messages may be waiting to be written before we stop reading from it.
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "32"))
+# How long a socket's access to the chat is trusted before it is checked again, in seconds.
+CHAT_ACCESS_CHECK_SECONDS = float(os.getenv("CHAT_ACCESS_CHECK_SECONDS", "5"))
+
+logger = logging.getLogger("teamjoin.chat")
+
+async def _send_messages(websocket: WebSocket, subscription: Subscription, send_lock: asyncio.Lock,
+                         idea_id: uuid.UUID, user_id: str):
+    """
+    Forwards the idea's new messages to the client as soon as the hub delivers them.
+
+    Before forwarding, the user's access to the chat is checked again once it is
+    older than CHAT_ACCESS_CHECK_SECONDS (a cached lookup), so a member who was
+    removed stops receiving messages and has their socket closed.
+    """
+    checked_at = time.monotonic()
+    while True:
+        message = await subscription.get()
+        if message is None:
+            # The client could not keep up, or the hub lost its subscription. Either way
+            # it may have missed messages: it should reconnect and catch up with `since=`.
+            code, reason = subscription.closed
+            await websocket.close(code=code, reason=reason)
+            return
+        if time.monotonic() - checked_at > CHAT_ACCESS_CHECK_SECONDS:
+            if not await database.can_access_idea_chat(idea_id, user_id):
+                await websocket.close(code=4001, reason="You are no longer a member of this idea's chat")
+                return
+            checked_at = time.monotonic()
+        async with send_lock:
+            await websocket.send_json(message)
+
+async def _reply(websocket: WebSocket, send_lock: asyncio.Lock, payload: dict):
+    try:
+        async with send_lock:
+            await websocket.send_json(payload)
+    except Exception:
+        # The client is gone; there is nobody left to tell.
+        pass
+
+async def _write_and_ack(websocket: WebSocket, send_lock: asyncio.Lock, in_flight: asyncio.Semaphore,
+                         idea_id: uuid.UUID, user_id: str, message: models.MessageSend):
+    try:
+        # Access may have been revoked since the socket connected. This is a cached lookup.
+        if not await database.can_access_idea_chat(idea_id, user_id):
+            await _reply(websocket, send_lock, {"type": "error", "client_id": message.client_id, "detail": "You are not a member of this idea's chat"})
+            return
+        row = await message_writer.submit(str(idea_id), str(user_id), message.content)
+        await _reply(websocket, send_lock, {"type": "ack", "client_id": message.client_id, "id": row["id"], "created_at": row["created_at"]})
+    except Exception as e:
+        await _reply(websocket, send_lock, {"type": "error", "client_id": message.client_id, "detail": f"Failed to send message: {e}"})
+    finally:
+        in_flight.release()
+
+async def _receive_messages(websocket: WebSocket, send_lock: asyncio.Lock, idea_id: uuid.UUID, user_id: str):
+    """
+    Reads the messages the client sends and writes them through the group-commit pipeline.
+
+    The client sends `{"content": "...", "client_id": "..."}` and gets back
+    `{"type": "ack", "client_id": ..., "id": ..., "created_at": ...}` once the
+    message is stored, or `{"type": "error", ...}` if it could not be. The message
+    itself reaches every socket of the chat (including this one) through the hub.
+    """
+    in_flight = asyncio.Semaphore(CHAT_MAX_IN_FLIGHT)
+    writes = set()
+    while True:
+        text = await websocket.receive_text()
+        try:
+            message = models.MessageSend(**json.loads(text))
+        except (ValueError, TypeError, ValidationError):
+            await _reply(websocket, send_lock, {"type": "error", "client_id": None, "detail": "Invalid message"})
+            continue
+
+        # Stop reading once too many of this client's messages are waiting to be written.
+        await in_flight.acquire()
+        task = asyncio.create_task(_write_and_ack(websocket, send_lock, in_flight, idea_id, user_id, message))
+        writes.add(task)
+        task.add_done_callback(writes.discard)
+
 @router.websocket("/ws/ideas/{idea_id}/messages")
 async def websocket_endpoint(websocket: WebSocket, idea_id: uuid.UUID, token: str = Query(...)):
     await websocket.accept()
@@ -35,36 +171,32 @@ async def websocket_endpoint(websocket: WebSocket, idea_id: uuid.UUID, token: st
         # The token is passed as a query parameter. A better approach would be to use
         # a more secure method like passing the token in the headers, but FastAPI websockets
         # do not directly support dependencies with headers.
-        current_user = await get_current_user_ws(token)
-        # Verify the user is a member of the idea or the owner
-        membership_response = supabase.table('idea_members').select('*').eq('idea_id', str(idea_id)).eq('user_id', str(current_user.id)).eq('status', 'accepted').execute()
-        idea_owner_response = supabase.table('ideas').select('user_id').eq('id', str(idea_id)).execute()
-
-        is_owner = idea_owner_response.data and idea_owner_response.data[0]['user_id'] == str(current_user.id)
-
-        if not membership_response.data and not is_owner:
-            await websocket.close(code=4001, reason="You are not authorized to view these messages")
-            return
-
-        # Subscribe to the messages table
-        channel = supabase.realtime.channel(f"idea_{idea_id}_messages")
-
-        async def on_message(payload):
-            if payload["table"] == "messages" and payload["schema"] == "public" and payload["eventType"] == "INSERT":
-                if payload['new']['idea_id'] == str(idea_id):
-                    await websocket.send_json(payload['new'])
-
-        channel.on("postgres_changes", on_message)
-        supabase.realtime.connect()
-        channel.subscribe()
+        # The handshake is traced on its own: the connection itself can stay open for hours.
+        with start_trace("WS /ws/ideas/{idea_id}/messages", attributes={"idea_id": str(idea_id)}):
+            current_user = await get_current_user_ws(token)
+            # Verify the user is a member of the idea or the owner
+            if not await database.can_access_idea_chat(idea_id, current_user.id):
+                await websocket.close(code=4001, reason="You are not authorized to view these messages")
+                return
 
-        while True:
-            # Keep the connection alive
-            await asyncio.sleep(1)
-            await websocket.receive_text() # This is to check if the client is still connected
+            # Subscribe to the idea's messages through the process-wide hub
+            await chat_hub.ensure_started()
+        subscription = chat_hub.subscribe(str(idea_id))
+        send_lock = asyncio.Lock()
+        try:
+            sender = asyncio.create_task(_send_messages(websocket, subscription, send_lock, idea_id, current_user.id))
+            receiver = asyncio.create_task(_receive_messages(websocket, send_lock, idea_id, current_user.id))
+            # Whichever finishes first (the client left, or it fell too far behind) ends the connection.
+            done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                task.result()
+        finally:
+            chat_hub.unsubscribe(subscription)
 
     except WebSocketDisconnect:
-        print("Client disconnected")
+        logger.info("Client disconnected")
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error(f"Chat socket of idea {idea_id} failed: {e}")
         await websocket.close(code=1011)
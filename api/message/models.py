@@ -1,6 +1,6 @@
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
 import uuid
 
@@ -21,6 +21,11 @@ class IdeaMemberCreate(BaseModel):
 class IdeaMemberUpdate(BaseModel):
     status: str
 
+class JoinRequestDecision(BaseModel):
+    """The new status of one join request, for reviewing many requests at once."""
+    request_id: uuid.UUID
+    status: Literal["pending", "accepted", "rejected"]
+
 class Message(BaseModel):
     id: uuid.UUID
     idea_id: uuid.UUID
@@ -33,3 +38,20 @@ class Message(BaseModel):
 
 class MessageCreate(BaseModel):
     content: str
+
+class MessageSend(MessageCreate):
+    """A message sent over the chat WebSocket. `client_id` is echoed back in the acknowledgement."""
+    client_id: Optional[str] = None
+
+class MessageHistory(BaseModel):
+    """
+    A page of an idea's chat, oldest message first.
+
+    Pass `before_cursor` as `before` to load older messages (it is None when there
+    are none), and `since_cursor` as `since` to catch up on newer ones. `has_more`
+    tells a catch-up request that more new messages are waiting.
+    """
+    items: List[Dict[str, Any]]
+    before_cursor: Optional[str] = None
+    since_cursor: Optional[str] = None
+    has_more: bool = False
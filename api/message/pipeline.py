@@ -0,0 +1,129 @@
+"""
+This file contains the group-commit pipeline for chat messages sent over WebSockets.
+
+Instead of one INSERT per message, messages from all sockets are collected into
+a batch and written with a single multi-row INSERT. A batch is written as soon
+as it holds CHAT_BATCH_SIZE messages, or CHAT_BATCH_DELAY seconds after its
+first message arrived, whichever comes first. While one batch is being written
+the next one keeps filling up, so the busier the chats get, the more messages
+share each round trip.
+
+Every sender waits for its own message to be persisted and gets the stored row
+back (with its ID and timestamp), which is what the socket acknowledges. If a
+batch can't be written, its messages are written again one by one, so that one
+bad message (e.g. for an idea that was just deleted) only fails its own sender.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import db
+
+CHAT_BATCH_SIZE = int(os.getenv("CHAT_BATCH_SIZE", "100"))
+CHAT_BATCH_DELAY = float(os.getenv("CHAT_BATCH_DELAY", "0.01"))
+
+
+class MessageWriter:
+    """Buffers message inserts and writes them in batches."""
+
+    def __init__(self, max_batch: int = CHAT_BATCH_SIZE, max_delay: float = CHAT_BATCH_DELAY):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._has_pending: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # The batch being written right now, so that stopping waits for it instead of cancelling it.
+        self._writing: Optional[asyncio.Future] = None
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._has_pending = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, idea_id: str, sender_id: str, content: str) -> Dict[str, Any]:
+        """Queues a message and returns its stored row once the batch holding it is written."""
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(({"idea_id": idea_id, "sender_id": sender_id, "content": content}, future))
+        self._has_pending.set()
+        if len(self._pending) >= self.max_batch:
+            self._batch_full.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            # Give the batch a moment to fill up, unless it is already full.
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), timeout=self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._writing = asyncio.ensure_future(self.flush())
+            await asyncio.shield(self._writing)
+
+    async def flush(self):
+        """Writes everything that is queued right now."""
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if not self._pending:
+            self._has_pending.clear()
+        if len(self._pending) < self.max_batch:
+            self._batch_full.clear()
+        if not batch:
+            return
+
+        try:
+            rows = await self._write(batch)
+        except asyncio.CancelledError:
+            # Cancelled in the middle of a write: don't leave the senders waiting forever.
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                logging.error(f"Failed to write a message: {e}")
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            logging.error(f"Failed to write a batch of {len(batch)} messages, writing them one by one: {e}")
+            await asyncio.gather(*(self._write_one(row, future) for row, future in batch))
+            return
+
+        for (_, future), row in zip(batch, rows):
+            if not future.done():
+                future.set_result(row)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> List[Dict[str, Any]]:
+        # PostgREST returns the inserted rows in the order they were sent.
+        rows = await db.messages.create_many([row for row, _ in batch])
+        if len(rows) != len(batch):
+            raise RuntimeError(f"Expected {len(batch)} stored messages, got {len(rows)}")
+        return rows
+
+    async def _write_one(self, row: Dict[str, Any], future: asyncio.Future):
+        try:
+            stored = await self._write([(row, future)])
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(stored[0])
+
+    async def stop(self):
+        """Waits for the batch being written, writes whatever is still queued and stops the pipeline."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+            self._writing = None
+        while self._pending:
+            await self.flush()
+
+
+message_writer = MessageWriter()
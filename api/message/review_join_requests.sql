@@ -0,0 +1,18 @@
+-- Bulk review of join requests for PUT /ideas/requests.
+--
+-- Run this once in the Supabase SQL editor. It adds the function the API calls
+-- through PostgREST (`/rest/v1/rpc/review_join_requests`), which sets the status
+-- of many join requests in a single statement. `decisions` is a JSON array of
+-- `{"request_id": ..., "status": ...}` objects. Only requests for ideas owned by
+-- `owner_id` are updated, and the updated rows are returned.
+
+CREATE OR REPLACE FUNCTION public.review_join_requests(owner_id uuid, decisions jsonb)
+RETURNS TABLE (id uuid, idea_id uuid, user_id uuid, status text, created_at timestamptz)
+LANGUAGE sql VOLATILE
+AS $$
+  UPDATE public.idea_members AS m
+  SET status = d.status
+  FROM jsonb_to_recordset(decisions) AS d(request_id uuid, status text), public.ideas AS i
+  WHERE m.id = d.request_id AND i.id = m.idea_id AND i.user_id = owner_id
+  RETURNING m.id, m.idea_id, m.user_id, m.status, m.created_at;
+$$;
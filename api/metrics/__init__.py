@@ -0,0 +1,9 @@
+"""
+This package contains the request and upstream call metrics, served in the Prometheus text format at /metrics,
+and the request traces behind the slow-request log.
+"""
+
+from .registry import registry
+from .instrumentation import MetricsMiddleware, track_upstream
+from .tracing import TracingMiddleware, start_span, start_trace
+from .export import exporter as trace_exporter
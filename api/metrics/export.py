@@ -0,0 +1,144 @@
+"""
+This file contains the exporter that ships finished traces in the OTLP JSON format.
+
+The destination is chosen with TRACE_EXPORT:
+
+- "none" (the default) exports nothing; slow requests are still logged.
+- "file" appends one OTLP `ExportTraceServiceRequest` JSON document per line to
+  TRACE_EXPORT_FILE, which any OpenTelemetry collector can replay.
+- "otlp" posts the same documents to an OTLP/HTTP collector at OTLP_ENDPOINT
+  (e.g. a local OpenTelemetry collector, Jaeger or Tempo).
+
+By default only slow traces are exported (TRACE_EXPORT_SLOW_ONLY). Traces are
+buffered and written in batches from a background task, so exporting never
+holds up a request, and when the destination can't keep up traces are dropped
+rather than piling up in memory.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .tracing import Span
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "none")
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_EXPORT_SLOW_ONLY = os.getenv("TRACE_EXPORT_SLOW_ONLY", "true").lower() == "true"
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_EXPORT_MAX_QUEUE = int(os.getenv("TRACE_EXPORT_MAX_QUEUE", "1000"))
+SERVICE_NAME = os.getenv("SERVICE_NAME", "teamjoin-api")
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP JSON encodes 64-bit integers as strings.
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    otlp: Dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in span.attributes.items()],
+        # 1 = OK, 2 = ERROR
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        otlp["parentSpanId"] = span.parent_id
+    return otlp
+
+
+def to_otlp(traces: List[Span]) -> Dict[str, Any]:
+    """Turns finished traces into a single OTLP `ExportTraceServiceRequest` document."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "teamjoin"},
+                "spans": [_otlp_span(span) for root in traces for span in root.walk()],
+            }],
+        }],
+    }
+
+
+class TraceExporter:
+    """Buffers finished traces and writes them out in batches."""
+
+    def __init__(self, mode: str = TRACE_EXPORT, slow_only: bool = TRACE_EXPORT_SLOW_ONLY,
+                 interval: float = TRACE_EXPORT_INTERVAL, max_queue: int = TRACE_EXPORT_MAX_QUEUE):
+        self.mode = mode
+        self.slow_only = slow_only
+        self.interval = interval
+        self.max_queue = max_queue
+        self._pending: List[Span] = []
+        self._dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def offer(self, root: Span, slow: bool):
+        """Queues a finished trace for export, if it should be exported at all."""
+        if self.mode not in ("file", "otlp") or (self.slow_only and not slow):
+            return
+        if len(self._pending) >= self.max_queue:
+            self._dropped += 1
+            return
+        self._pending.append(root)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        """Writes out everything that is queued right now."""
+        batch, self._pending = self._pending, []
+        if self._dropped:
+            logging.error(f"Dropped {self._dropped} traces because the exporter could not keep up")
+            self._dropped = 0
+        if not batch:
+            return
+        document = json.dumps(to_otlp(batch), default=str)
+        try:
+            if self.mode == "file":
+                await asyncio.to_thread(self._append, document)
+            else:
+                if self._http is None:
+                    self._http = httpx.AsyncClient(timeout=5)
+                response = await self._http.post(OTLP_ENDPOINT, content=document, headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+        except Exception as e:
+            logging.error(f"Failed to export {len(batch)} traces: {e}")
+
+    @staticmethod
+    def _append(document: str):
+        with open(TRACE_EXPORT_FILE, "a") as f:
+            f.write(document + "\n")
+
+    async def stop(self):
+        """Writes whatever is still queued and stops the exporter."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+exporter = TraceExporter()
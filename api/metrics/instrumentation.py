@@ -0,0 +1,195 @@
+"""
+This file contains the instrumentation that records what the API spends its time on.
+
+Three things are measured:
+
+- Every HTTP request, by method and route template (e.g. `/ideas/{idea_id}`,
+  never the raw path): counts by status, latency and request/response payload
+  sizes, plus the number of requests in flight.
+- Every upstream call (PostgREST queries, Supabase auth and storage), by service
+  and operation: counts by outcome, latency and response sizes.
+- Per request, how many upstream calls it made and how long it spent waiting on
+  them. A route whose upstream call count grows with its page size has an N+1;
+  a route whose upstream time is close to the sum of its calls' latencies runs
+  them sequentially; and a route whose total latency is much larger than its
+  upstream time spends it locally (validation, serialization, or waiting for a
+  blocked event loop, which `event_loop_lag_seconds` shows on its own).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from .registry import COUNT_BUCKETS, SIZE_BUCKETS, registry
+from .tracing import KIND_CLIENT, Span, route_template, start_span
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# How often the event loop lag probe wakes up, in seconds.
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last byte of its response.", ("method", "route"))
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+http_request_size = registry.histogram(
+    "http_request_size_bytes", "Size of request bodies.", ("method", "route"), SIZE_BUCKETS)
+http_response_size = registry.histogram(
+    "http_response_size_bytes", "Size of response bodies.", ("method", "route"), SIZE_BUCKETS)
+http_upstream_calls = registry.histogram(
+    "http_request_upstream_calls", "Upstream calls made while serving a single request.", ("method", "route"), COUNT_BUCKETS)
+http_upstream_duration = registry.histogram(
+    "http_request_upstream_duration_seconds", "Total time a single request spent waiting on upstream calls.", ("method", "route"))
+
+upstream_requests = registry.counter(
+    "upstream_requests_total", "Calls to Supabase services.", ("service", "operation", "outcome"))
+upstream_duration = registry.histogram(
+    "upstream_request_duration_seconds", "Latency of calls to Supabase services.", ("service", "operation"))
+upstream_response_size = registry.histogram(
+    "upstream_response_size_bytes", "Size of the responses returned by Supabase services.", ("service", "operation"), SIZE_BUCKETS)
+
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop wakes up from a timer. High values mean something blocked it.")
+
+
+class RequestStats:
+    """The upstream calls made on behalf of one request. Shared with the threads the request runs work in."""
+
+    __slots__ = ("calls", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class UpstreamCall:
+    """Handed out by `track_upstream` so the caller can report what the call returned."""
+
+    __slots__ = ("response_size", "span")
+
+    def __init__(self, span: Optional[Span] = None):
+        self.response_size: Optional[int] = None
+        self.span = span
+
+    def tag(self, **attributes: Any):
+        """Adds attributes (table, filters, row count, ...) to the call's trace span."""
+        if self.span is not None:
+            self.span.set_attributes(attributes)
+
+
+@contextmanager
+def track_upstream(service: str, operation: str):
+    """
+    Measures one call to a Supabase service and traces it as a child span of the current request.
+
+    Works around both awaited and blocking calls:
+
+        with track_upstream("postgrest", "GET ideas") as call:
+            response = await ...
+            call.response_size = len(response.content)
+    """
+    with start_span(f"{service} {operation}", KIND_CLIENT, {"upstream.service": service, "upstream.operation": operation}) as span:
+        call = UpstreamCall(span)
+        if not METRICS_ENABLED:
+            yield call
+            return
+
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            yield call
+            outcome = "ok"
+        finally:
+            elapsed = time.perf_counter() - start
+            upstream_requests.inc(service=service, operation=operation, outcome=outcome)
+            upstream_duration.observe(elapsed, service=service, operation=operation)
+            if call.response_size is not None:
+                upstream_response_size.observe(call.response_size, service=service, operation=operation)
+                call.tag(**{"upstream.response_size": call.response_size})
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.calls += 1
+                stats.seconds += elapsed
+
+
+class MetricsMiddleware:
+    """
+    Records every HTTP request going through the application.
+
+    This is a plain ASGI middleware rather than a `BaseHTTPMiddleware`, so it
+    adds no extra task per request and doesn't buffer streaming responses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lag_probe: Optional[asyncio.Task] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        if self._lag_probe is None or self._lag_probe.done():
+            self._lag_probe = asyncio.create_task(_probe_event_loop_lag())
+
+        method = scope["method"]
+        status = 500
+        request_size = 0
+        response_size = 0
+
+        async def receive_wrapper():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        # The route is only known once routing has run, so the in-flight gauge is keyed by method alone.
+        http_requests_in_flight.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec(method=method)
+            _request_stats.reset(token)
+
+            route = route_template(scope)
+            http_requests.inc(method=method, route=route, status=str(status))
+            http_request_duration.observe(elapsed, method=method, route=route)
+            http_request_size.observe(request_size, method=method, route=route)
+            http_response_size.observe(response_size, method=method, route=route)
+            http_upstream_calls.observe(stats.calls, method=method, route=route)
+            http_upstream_duration.observe(stats.seconds, method=method, route=route)
+
+
+async def _probe_event_loop_lag():
+    """Measures how late the loop wakes up from a sleep. Anything well above zero means something blocked it."""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            expected = loop.time() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            event_loop_lag.observe(max(0.0, loop.time() - expected))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"Event loop lag probe stopped: {e}")
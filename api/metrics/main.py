@@ -0,0 +1,15 @@
+"""
+This file contains the endpoint Prometheus scrapes.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .registry import registry
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """Returns every metric of this worker in the Prometheus text exposition format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
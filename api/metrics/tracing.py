@@ -0,0 +1,220 @@
+"""
+This file contains the request-scoped tracing that shows which chain of upstream calls made a request slow.
+
+Every request gets a root span named after its route (e.g. `GET /ideas/{idea_id}`),
+and every Supabase call made while serving it (see `track_upstream`) becomes a
+child span tagged with what it did: the table, the filters, the number of rows.
+The current span is kept in a context variable, so spans opened in worker
+threads (`run_in_threadpool`) and in concurrently gathered tasks still land
+under the right parent.
+
+When a request takes longer than SLOW_REQUEST_THRESHOLD_MS, its whole span tree
+is logged as one structured JSON line. Traces can also be exported in the OTLP
+JSON format (see `export.py`).
+"""
+
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "500"))
+
+logger = logging.getLogger("teamjoin.slow_requests")
+
+# Span kinds, as numbered by OTLP.
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+
+class Span:
+    """One timed operation, with the spans of the operations it was made of."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "error", "children")
+
+    def __init__(self, name: str, kind: int = KIND_INTERNAL, parent: Optional["Span"] = None):
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.children: List["Span"] = []
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1_000_000
+
+    def walk(self):
+        """Yields this span and every span below it."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_tree(self) -> Dict[str, Any]:
+        """A compact, readable form of the span and its children, used in the slow-request log."""
+        tree: Dict[str, Any] = {"name": self.name, "duration_ms": round(self.duration_ms, 2)}
+        if self.attributes:
+            tree["attributes"] = self.attributes
+        if self.error:
+            tree["error"] = self.error
+        if self.children:
+            tree["children"] = [child.to_tree() for child in sorted(self.children, key=lambda s: s.start_ns)]
+        return tree
+
+
+def _describe(error: BaseException) -> str:
+    lines = str(error).splitlines()
+    return f"{type(error).__name__}: {lines[0]}" if lines else type(error).__name__
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+    """
+    Opens a child span of the current one for the duration of the block.
+
+    Outside of a traced request this does nothing and yields None, so callers
+    must not assume they get a span back.
+    """
+    parent = _current_span.get()
+    if parent is None or not TRACING_ENABLED:
+        yield None
+        return
+
+    span = Span(name, kind, parent)
+    if attributes:
+        span.attributes.update(attributes)
+    parent.children.append(span)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = _describe(e)
+        raise
+    finally:
+        span.end()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, kind: int = KIND_SERVER, attributes: Optional[Dict[str, Any]] = None):
+    """
+    Opens the root span of a new trace, e.g. for a request or a WebSocket handshake.
+
+    When the block ends, the trace is logged if it was slow and handed to the exporter.
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    span = Span(name, kind)
+    if attributes:
+        span.attributes.update(attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = _describe(e)
+        raise
+    finally:
+        span.end()
+        _current_span.reset(token)
+        _finish_trace(span)
+
+
+def _finish_trace(root: Span):
+    from .export import exporter
+
+    slow = root.duration_ms >= SLOW_REQUEST_THRESHOLD_MS
+    if slow:
+        spans = list(root.walk())
+        logger.warning(json.dumps({
+            "event": "slow_request",
+            "trace_id": root.trace_id,
+            "name": root.name,
+            "duration_ms": round(root.duration_ms, 2),
+            "threshold_ms": SLOW_REQUEST_THRESHOLD_MS,
+            "upstream_calls": sum(1 for span in spans if span.kind == KIND_CLIENT),
+            "spans": root.to_tree(),
+        }, default=str))
+    exporter.offer(root, slow)
+
+
+def route_template(scope) -> str:
+    """Returns the path template of the route that served the request, e.g. `/ideas/{idea_id}`."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    regex = getattr(route, "path_regex", None)
+    if template is None or regex is None:
+        # Unmatched paths are grouped together so that scanners can't blow up the label set.
+        return "unmatched"
+    path = scope["path"]
+    root_path = scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    # Depending on the FastAPI version, an included router's route may only know its path
+    # relative to the router's prefix. Find the prefix by matching the route against the
+    # shortest suffix of the path it accepts.
+    for index, char in enumerate(path):
+        if char == "/" and regex.match(path[index:]):
+            return path[:index] + template
+    return template
+
+
+class TracingMiddleware:
+    """Opens a root span for every HTTP request and names it after the route that served it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with start_trace(f"{method} {scope['path']}", attributes={"http.method": method, "http.target": scope["path"]}) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                span.name = f"{method} {route}"
+                span.set_attributes({"http.route": route, "http.status_code": status})
+                if status >= 500 and span.error is None:
+                    span.error = f"HTTP {status}"
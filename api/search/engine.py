@@ -0,0 +1,99 @@
+"""
+This file runs searches against the full-text index of ideas and profiles.
+
+The index itself lives in Postgres (see search_index.sql): a stemmed, weighted
+`tsvector` column with a GIN index on each table, so a query never scans the
+tables. This file turns the user's text into a prefix-matching query, asks every
+source for its best matches at the same time and merges them into one ranked
+list.
+
+Each source has its own timeout. A source that is slow or failing is left out
+of the results instead of failing the whole search, so the endpoint is only
+ever as slow as its slowest healthy source.
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import re
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import db
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "50"))
+# How long a single source may take before the search gives up on it, in seconds.
+SEARCH_SOURCE_TIMEOUT = float(os.getenv("SEARCH_SOURCE_TIMEOUT", "2"))
+# The most results a single source may contribute, and so how deep pages can go (`offset + limit`).
+SEARCH_SOURCE_MAX_RESULTS = int(os.getenv("SEARCH_SOURCE_MAX_RESULTS", "200"))
+
+# Result type -> the repository search that produces it. Every search returns rows
+# of `id, score, highlight, data`, best matches first.
+SOURCES: Dict[str, Callable[..., Awaitable[List[Dict[str, Any]]]]] = {
+    "idea": db.ideas.search,
+    "user": db.profiles.search,
+}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def build_tsquery(q: str) -> Optional[str]:
+    """
+    Turns free text into a Postgres tsquery where every word is a prefix match.
+
+    Only word characters are kept, so the text can never break the tsquery syntax.
+    "Mobile desig" becomes "mobile:* & desig:*".
+    """
+    words = _WORD.findall(q.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+async def _search_source(result_type: str, tsquery: str, limit: int) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+    """Runs one source. Returns None instead of rows if the source timed out or failed."""
+    try:
+        rows = await asyncio.wait_for(SOURCES[result_type](tsquery, limit), timeout=SEARCH_SOURCE_TIMEOUT)
+        return result_type, rows
+    except asyncio.TimeoutError:
+        logging.warning(f"Search source '{result_type}' timed out after {SEARCH_SOURCE_TIMEOUT}s")
+    except Exception as e:
+        logging.error(f"Search source '{result_type}' failed: {e}")
+    return result_type, None
+
+
+def _ranked(result_type: str, rows: List[Dict[str, Any]]):
+    return ((-row["score"], result_type, row) for row in rows)
+
+
+async def search(q: str, limit: int = SEARCH_PAGE_SIZE, offset: int = 0) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Returns one page of ideas and users matching `q`, best matches first.
+
+    Each source is asked for its top `offset + limit` matches, which is enough to
+    cut the requested page out of the merged ranking. Pages end at
+    SEARCH_SOURCE_MAX_RESULTS; the route rejects any that would go past it.
+
+    Returns:
+        The results of the page, and the types of the sources that were left out
+        because they timed out or failed.
+    """
+    tsquery = build_tsquery(q)
+    if not tsquery:
+        return [], []
+
+    window = min(offset + limit, SEARCH_SOURCE_MAX_RESULTS)
+    answers = await asyncio.gather(*(_search_source(result_type, tsquery, window) for result_type in SOURCES))
+
+    missing = [result_type for result_type, rows in answers if rows is None]
+    ranked = [_ranked(result_type, rows) for result_type, rows in answers if rows]
+
+    # Every source is already sorted by score, so merging them is a single pass
+    # that stops as soon as the page is full.
+    results = [
+        {"type": result_type, "data": row["data"], "score": row["score"], "highlight": row["highlight"]}
+        for _, result_type, row in islice(heapq.merge(*ranked, key=lambda entry: entry[0]), offset, window)
+    ]
+    return results, missing
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from typing import List
-from ideas.models import Idea
-from user.database import supabase
 from auth.dependencies import get_current_user
 from auth.models import User
+from . import engine
 from .models import SearchResult
 
 router = APIRouter()
@@ -11,22 +11,19 @@ router = APIRouter()
 @router.get("/", response_model=List[SearchResult])
 async def search_all(
     q: str = Query(..., min_length=3),
+    limit: int = Query(engine.SEARCH_PAGE_SIZE, ge=1, le=engine.SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
     current_user: User = Depends(get_current_user)
 ):
-    results = []
+    # Every source returns at most SEARCH_SOURCE_MAX_RESULTS matches, so deeper pages would silently come back short or empty.
+    if offset + limit > engine.SEARCH_SOURCE_MAX_RESULTS:
+        raise HTTPException(status_code=400,
+                            detail=f"offset + limit can be at most {engine.SEARCH_SOURCE_MAX_RESULTS}")
 
-    # Search for ideas
-    ideas_response = supabase.table("ideas").select("*").or_(f"title.ilike.%{q}%,full_explained_idea.ilike.%{q}%").execute()
-    if ideas_response.data:
-        for item in ideas_response.data:
-            results.append(SearchResult(type="idea", data=item))
+    # Ideas and users are searched concurrently through the full-text index and ranked together.
+    results, missing = await engine.search(q, limit=limit, offset=offset)
 
-    # Search for users by name
-    users_response = supabase.table("profiles").select("*, user:users(email)").ilike("user_data->>name", f"%{q}%").execute()
-    if users_response.data:
-        for item in users_response.data:
-            results.append(SearchResult(type="user", data=item))
-
-    
-
-    return results
\ No newline at end of file
+    # The results are already in their final shape, so they are sent as they are
+    # instead of being validated again row by row against SearchResult.
+    headers = {"X-Search-Partial": ",".join(missing)} if missing else None
+    return JSONResponse(content=results, headers=headers)
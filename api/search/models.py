@@ -1,6 +1,8 @@
 from pydantic import BaseModel
-from typing import Any, Literal
+from typing import Any, Literal, Optional
 
 class SearchResult(BaseModel):
     type: Literal["idea", "user"]
-    data: Any
\ No newline at end of file
+    data: Any
+    score: float = 0.0
+    highlight: Optional[str] = None
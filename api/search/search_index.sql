@@ -0,0 +1,87 @@
+-- Full-text search index for /search.
+--
+-- Run this once in the Supabase SQL editor. It adds a maintained `tsvector`
+-- column (a generated column, so Postgres keeps it up to date on every insert
+-- and update) and a GIN index to `ideas` and `profiles`, and the two functions
+-- the API calls through PostgREST (`/rest/v1/rpc/search_ideas` and
+-- `/rest/v1/rpc/search_profiles`).
+--
+-- Words are stemmed with the 'english' configuration, and the API turns every
+-- word of the query into a prefix match (`word:*`), so "desig" finds "designers".
+-- Results are ranked with ts_rank_cd over weighted fields (title > subtitle >
+-- body) and come with a highlighted snippet built by ts_headline. The snippet is
+-- only computed for the rows on the requested page.
+
+-- --- Ideas ---
+
+ALTER TABLE public.ideas
+  ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(sub_title, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(full_explained_idea, '')), 'C')
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS ideas_search_vector_idx ON public.ideas USING gin (search_vector);
+
+CREATE OR REPLACE FUNCTION public.search_ideas(query text, max_results int DEFAULT 20, skip int DEFAULT 0)
+RETURNS TABLE (id uuid, score real, highlight text, data jsonb)
+LANGUAGE sql STABLE
+AS $$
+  WITH q AS (SELECT to_tsquery('english', query) AS tsq),
+  hits AS (
+    SELECT i.*, ts_rank_cd(i.search_vector, q.tsq, 32) AS score
+    FROM public.ideas i, q
+    WHERE i.search_vector @@ q.tsq
+    ORDER BY score DESC, i.created_at DESC
+    LIMIT max_results OFFSET skip
+  )
+  SELECT
+    h.id,
+    h.score,
+    ts_headline('english', coalesce(h.title, '') || ' — ' || coalesce(h.full_explained_idea, ''), q.tsq,
+                'StartSel=<mark>, StopSel=</mark>, MaxWords=25, MinWords=8, MaxFragments=2'),
+    jsonb_build_object(
+      'id', h.id, 'title', h.title, 'sub_title', h.sub_title, 'user_id', h.user_id,
+      'image_url', h.image_url, 'created_at', h.created_at
+    )
+  FROM hits h, q
+  ORDER BY h.score DESC, h.created_at DESC;
+$$;
+
+-- --- Profiles ---
+
+ALTER TABLE public.profiles
+  ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(user_data->>'name', '')), 'A') ||
+    setweight(jsonb_to_tsvector('english', coalesce(skills, '{}'::jsonb), '["key", "string"]'), 'B') ||
+    setweight(to_tsvector('english', coalesce(user_data->>'about', '')), 'C')
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS profiles_search_vector_idx ON public.profiles USING gin (search_vector);
+
+-- SECURITY INVOKER, so it only returns the profiles the caller may read anyway.
+-- PostgREST lets anyone with the anon key call it directly, so it must not reach
+-- past row level security (e.g. into auth.users for email addresses).
+CREATE OR REPLACE FUNCTION public.search_profiles(query text, max_results int DEFAULT 20, skip int DEFAULT 0)
+RETURNS TABLE (id uuid, score real, highlight text, data jsonb)
+LANGUAGE sql STABLE SECURITY INVOKER
+AS $$
+  WITH q AS (SELECT to_tsquery('english', query) AS tsq),
+  hits AS (
+    SELECT p.uuid, p.user_data, p.skills, ts_rank_cd(p.search_vector, q.tsq, 32) AS score
+    FROM public.profiles p, q
+    WHERE p.search_vector @@ q.tsq
+    ORDER BY score DESC, p.uuid
+    LIMIT max_results OFFSET skip
+  )
+  SELECT
+    h.uuid,
+    h.score,
+    ts_headline('english', coalesce(h.user_data->>'name', '') || ' — ' || coalesce(h.user_data->>'about', ''), q.tsq,
+                'StartSel=<mark>, StopSel=</mark>, MaxWords=25, MinWords=8'),
+    jsonb_build_object('uuid', h.uuid, 'user_data', h.user_data, 'skills', h.skills)
+  FROM hits h, q
+  ORDER BY h.score DESC, h.uuid;
+$$;
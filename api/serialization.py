@@ -0,0 +1,129 @@
+"""
+This file contains the fast JSON path for endpoints that return long lists of database rows.
+
+By default FastAPI validates whatever an endpoint returns against its
+`response_model`, building one model instance per row (and per nested member)
+and parsing every UUID and timestamp again before encoding them. For a page of
+ideas with their members, that is most of the CPU time of the request.
+
+With FAST_JSON=true, endpoints that return `fast_response(...)` skip that work:
+
+- Rows that come straight from the database (`trusted=True`) are not validated
+  again. They are only trimmed to the fields of the response model, with the
+  model's defaults filled in, so clients get the same keys as before.
+  Timestamps keep the ISO 8601 form the database sent them in.
+- Anything else is validated and turned into JSON bytes in one pass by a
+  pydantic TypeAdapter, built once per response model.
+
+The JSON is encoded with orjson when it is installed (`pip install orjson`),
+and with the standard library otherwise.
+"""
+
+import json
+import os
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Union, get_args, get_origin
+
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() == "true"
+
+_MISSING = object()
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """A JSON response encoded with orjson (when installed) instead of the standard JSON encoder."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _projector(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    """Returns a function that trims values of type `annotation` to their model fields, or None if they are kept as is."""
+    origin = get_origin(annotation)
+    if origin is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _projector(args[0]) if len(args) == 1 else None
+    if origin in (list, List):
+        args = get_args(annotation)
+        item = _projector(args[0]) if args else None
+        if item is None:
+            return None
+        return lambda values: [item(value) for value in values] if values is not None else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _model_projector(annotation)
+    return None
+
+
+@lru_cache(maxsize=None)
+def _model_projector(model: type) -> Callable[[Any], Any]:
+    fields = [(name, field, _projector(field.annotation)) for name, field in model.model_fields.items()]
+
+    def project(row):
+        if row is None:
+            return None
+        projected = {}
+        for name, field, nested in fields:
+            value = row.get(name, _MISSING)
+            if value is _MISSING:
+                value = None if field.is_required() else field.get_default(call_default_factory=True)
+            elif nested is not None:
+                value = nested(value)
+            projected[name] = value
+        return projected
+
+    return project
+
+
+@lru_cache(maxsize=None)
+def _compiled_projector(response_type: Any) -> Callable[[Any], Any]:
+    return _projector(response_type) or (lambda content: content)
+
+
+@lru_cache(maxsize=None)
+def _adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+def trusted_response(response_type: Any, content: Any) -> Response:
+    """Encodes database rows shaped like `response_type` without validating them."""
+    return FastJSONResponse(_compiled_projector(response_type)(content))
+
+
+def validated_response(response_type: Any, content: Any) -> Response:
+    """
+    Validates `content` against `response_type` and encodes it in one pass.
+
+    Recent FastAPI versions do much the same for a `response_model`; older ones
+    go through `jsonable_encoder` and the standard JSON encoder instead.
+    """
+    adapter = _adapter(response_type)
+    return Response(adapter.dump_json(adapter.validate_python(content)), media_type="application/json")
+
+
+def fast_response(response_type: Any, content: Any, trusted: bool = False) -> Any:
+    """
+    Returns what an endpoint whose response model is `response_type` should return for `content`.
+
+    Without FAST_JSON, this is `content` itself, which FastAPI validates and
+    encodes as usual. `trusted` marks content built only from database rows.
+    """
+    if not FAST_JSON:
+        return content
+    if trusted:
+        return trusted_response(response_type, content)
+    return validated_response(response_type, content)
@@ -5,7 +5,9 @@ It provides a clean interface for creating, retrieving, and updating user profil
 """
 
 from fastapi import HTTPException
-from auth import supabase
+import db
+from cache import profile_cache
+from db import loaders
 from . import models
 import logging
 
@@ -29,19 +31,22 @@ async def create_user_profile(user_id: str, profile: models.UserProfileCreate):
     try:
         # Insert the new profile data into the 'profiles' table.
         # The 'uuid' field links this profile to the user in Supabase Auth.
-        response = supabase.table('profiles').insert({
+        created = await db.profiles.create({
             'uuid': user_id,
             'user_data': profile.user_data,
             'skills': profile.skills
-        }).execute()
+        })
 
         # Check if data was actually returned from the insert operation
-        if not response.data:
+        if not created:
             logging.error("Failed to create profile: No data returned from Supabase after insert.")
             raise HTTPException(status_code=500, detail="Failed to create profile: No data returned.")
 
-        # Return the first (and only) item from the response data
-        return response.data[0]
+        await profile_cache.invalidate(str(user_id))
+        loaders().profiles.prime(str(user_id), created)
+        return created
+    except HTTPException:
+        raise
     except Exception as e:
         # Log the error for debugging purposes and raise an HTTPException
         logging.error(f"Error creating profile for user {user_id}: {e}")
@@ -61,15 +66,11 @@ async def get_user_profile(user_id: str):
         HTTPException: If there's an error during the retrieval process.
     """
     try:
-        # Select all columns from the 'profiles' table where the 'uuid' matches the user_id.
-        response = supabase.table('profiles').select('*').eq('uuid', user_id).execute()
-
-        # If no data is found, return None
-        if not response.data:
-            return None
-
-        # Return the first (and only) item from the response data
-        return response.data[0]
+        # Load the profile through the request's loader, so asking for it again in the
+        # same request costs nothing. If no data is found, the loader returns None.
+        profile = await loaders().profiles.load(str(user_id))
+        # Hand out a copy, since callers add fields (like the email) to it.
+        return dict(profile) if profile else None
     except Exception as e:
         # Log the error and raise an HTTPException
         logging.error(f"Error getting profile for user {user_id}: {e}")
@@ -91,18 +92,21 @@ async def update_user_profile(user_id: str, profile: models.UserProfileUpdate):
     """
     try:
         # Update the profile data in the 'profiles' table for the given user_id.
-        response = supabase.table('profiles').update({
+        updated = await db.profiles.update(user_id, {
             'user_data': profile.user_data,
             'skills': profile.skills
-        }).eq('uuid', user_id).execute()
+        })
 
         # Check if data was actually returned from the update operation
-        if not response.data:
+        if not updated:
             logging.error("Failed to update profile: No data returned from Supabase after update.")
             raise HTTPException(status_code=500, detail="Failed to update profile: No data returned.")
 
-        # Return the first (and only) item from the response data
-        return response.data[0]
+        await profile_cache.invalidate(str(user_id))
+        loaders().profiles.prime(str(user_id), updated)
+        return updated
+    except HTTPException:
+        raise
     except Exception as e:
         # Log the error and raise an HTTPException
         logging.error(f"Error updating profile for user {user_id}: {e}")
@@ -1,13 +1,25 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
+from uuid import UUID
 from . import models, database
 from auth.dependencies import get_current_user
 from pydantic import BaseModel
 from ideas.models import Idea
+from ideas import storage
+from conditional import conditional_response
+from cache import profile_cache
+from serialization import fast_response
+import db
+from db.pagination import InvalidCursor, cursor_after, decode_cursor, fetch_page
 
 router = APIRouter()
 
+PROFILE_BATCH_MAX_SIZE = int(os.getenv("PROFILE_BATCH_MAX_SIZE", "500"))
+USER_IDEAS_PAGE_SIZE = int(os.getenv("USER_IDEAS_PAGE_SIZE", "20"))
+USER_IDEAS_MAX_PAGE_SIZE = int(os.getenv("USER_IDEAS_MAX_PAGE_SIZE", "100"))
+
 class User(BaseModel):
     id: str
     email: str
@@ -17,59 +29,70 @@ async def create_profile(profile: models.UserProfileCreate, current_user: User =
     db_profile = await database.get_user_profile(user_id=current_user.id)
     if db_profile:
         raise HTTPException(status_code=400, detail="Profile already exists")
-    return await database.create_user_profile(user_id=current_user.id, profile=profile)
+    created = await database.create_user_profile(user_id=current_user.id, profile=profile)
+    created["email"] = current_user.email
+    return created
 
 @router.get("/profile", response_model=models.UserProfile)
-async def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     profile = await database.get_user_profile(user_id=current_user.id)
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     profile["email"] = current_user.email
-    return profile
+    return conditional_response(request, response, models.UserProfile, profile, private_to=current_user.id)
 
 @router.put("/profile", response_model=models.UserProfile)
 async def update_profile(profile: models.UserProfileUpdate, current_user: User = Depends(get_current_user)):
-    return await database.update_user_profile(user_id=current_user.id, profile=profile)
+    updated = await database.update_user_profile(user_id=current_user.id, profile=profile)
+    updated["email"] = current_user.email
+    return updated
+
+@router.get("/ideas", response_model=models.UserIdeaPage)
+async def get_user_ideas(
+    limit: int = Query(USER_IDEAS_PAGE_SIZE, ge=1, le=USER_IDEAS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    member_counts: bool = False,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Returns a page of the ideas the user owns or is an accepted member of, newest first.
 
-@router.get("/ideas")
-async def get_user_ideas(current_user: User = Depends(get_current_user)):
-    # Fetch ideas where the user is the owner
-    owner_ideas_response = database.supabase.table("ideas").select("*").eq("user_id", current_user.id).execute()
-    
-    # Fetch ideas where the user is a member
-    member_ideas_response = await database.supabase.table("idea_members").select("idea_id").eq("user_id", current_user.id).eq("status", "accepted").execute()
-    
-    member_idea_ids = [item['idea_id'] for item in member_ideas_response.data]
-    
-    if not member_idea_ids:
-        return owner_ideas_response.data
+    Each idea has the user's `role` in it, and with `member_counts` its number of
+    accepted members. The whole page is answered by one database query (see user_ideas.sql).
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        ideas, has_more = await fetch_page(
+            lambda n: db.ideas.list_for_user(current_user.id, n, after=after, member_counts=member_counts), limit)
+        next_cursor = cursor_after(ideas[-1]) if has_more else None
+        ideas = await storage.sign_images(ideas)
+        return fast_response(models.UserIdeaPage, {"items": ideas, "next_cursor": next_cursor}, trusted=True)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    ideas_response = await database.supabase.table("ideas").select("*").in_("id", member_idea_ids).execute()
-    
-    # Combine owner ideas and member ideas, avoiding duplicates
-    owner_ideas = owner_ideas_response.data
-    member_ideas = ideas_response.data
-    
-    combined_ideas = {idea['id']: idea for idea in owner_ideas}
-    for idea in member_ideas:
-        if idea['id'] not in combined_ideas:
-            combined_ideas[idea['id']] = idea
-            
-    return list(combined_ideas.values())
+@router.post("/profiles/batch", response_model=models.ProfileBatch)
+async def get_users_profiles(user_ids: List[UUID], current_user: User = Depends(get_current_user)):
+    """
+    Returns the profiles of up to PROFILE_BATCH_MAX_SIZE users, keyed by user ID.
 
-@router.post("/profiles/batch")
-async def get_users_profiles(user_ids: List[str]):
+    Duplicate IDs are looked up once, cached profiles are served without a
+    database hop, and the rest are loaded in concurrent chunks.
+    """
+    unique_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+    if len(unique_ids) > PROFILE_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {PROFILE_BATCH_MAX_SIZE} user IDs can be looked up at once")
     try:
-        response = await database.supabase.table("profiles").select("*").in_("uuid", user_ids).execute()
-        if response.data:
-            return response.data
-        return []
+        profiles = await profile_cache.get_many(unique_ids)
+        return {
+            "profiles": profiles,
+            "missing": [user_id for user_id in unique_ids if user_id not in profiles],
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/teams", response_model=List[Idea])
-async def get_user_teams(current_user: User = Depends(get_current_user)):
-    response = await database.supabase.table("ideas").select("*").eq("user_id", current_user.id).execute()
-    if response.data:
-        return response.data
-    return []
+async def get_user_teams(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    teams = await storage.sign_images(await db.ideas.list_by_owner(current_user.id))
+    return conditional_response(request, response, List[Idea], teams, trusted=True, private_to=current_user.id)
@@ -6,7 +6,8 @@ used for data validation, serialization, and documentation.
 """
 
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Literal
+from ideas.models import Idea
 
 class UserProfileBase(BaseModel):
     """The base model for a user profile. It contains the common fields."""
@@ -30,3 +31,21 @@ class UserProfile(UserProfileBase):
         """This tells Pydantic to work with ORM objects, which is useful when
         working with databases."""
         orm_mode = True
+
+class PublicProfile(UserProfileBase):
+    """The part of a user's profile that other users can see."""
+    uuid: str
+
+class ProfileBatch(BaseModel):
+    """The profiles asked for, keyed by user ID. `missing` lists the users who have no profile."""
+    profiles: Dict[str, PublicProfile]
+    missing: List[str] = []
+
+class UserIdea(Idea):
+    """An idea the user is involved in, with whether they own it or are an accepted member of it."""
+    role: Literal["owner", "member"]
+
+class UserIdeaPage(BaseModel):
+    """One page of the user's ideas. Pass `next_cursor` back as `cursor` to get the next page."""
+    items: List[UserIdea]
+    next_cursor: Optional[str] = None
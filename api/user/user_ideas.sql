@@ -0,0 +1,52 @@
+-- The "ideas I'm involved in" view for GET /user/ideas.
+--
+-- Run this once in the Supabase SQL editor. It adds the function the API calls
+-- through PostgREST (`/rest/v1/rpc/user_ideas`), which returns the ideas a user
+-- owns and the ideas they are an accepted member of in one query, newest first,
+-- each tagged with the user's role. Pages are cut with a keyset on
+-- `(created_at, id)`: pass the last row of the previous page as `after_created_at`
+-- and `after_id`. With `with_member_counts`, every idea also carries its number
+-- of accepted members.
+
+CREATE INDEX IF NOT EXISTS ideas_user_id_created_at_idx ON public.ideas (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idea_members_user_id_status_idx ON public.idea_members (user_id, status);
+CREATE INDEX IF NOT EXISTS idea_members_idea_id_status_idx ON public.idea_members (idea_id, status);
+
+-- The columns it returns have changed over time, and a function's result type can't be replaced in place.
+DROP FUNCTION IF EXISTS public.user_ideas(uuid, int, timestamptz, uuid, boolean);
+
+CREATE FUNCTION public.user_ideas(
+  member_id uuid,
+  max_results int DEFAULT 20,
+  after_created_at timestamptz DEFAULT NULL,
+  after_id uuid DEFAULT NULL,
+  with_member_counts boolean DEFAULT false
+)
+RETURNS TABLE (
+  id uuid, title text, sub_title text, full_explained_idea text, user_id uuid,
+  image_url text, image_variants jsonb, created_at timestamptz, role text, member_count bigint
+)
+LANGUAGE sql STABLE
+AS $$
+  WITH involved AS (
+    SELECT i.id, 'owner' AS role FROM public.ideas i WHERE i.user_id = member_id
+    UNION ALL
+    SELECT m.idea_id, 'member' FROM public.idea_members m
+    WHERE m.user_id = member_id AND m.status = 'accepted'
+  ),
+  -- An owner who is also listed as a member is only returned once, as the owner.
+  roles AS (
+    SELECT DISTINCT ON (v.id) v.id, v.role FROM involved v ORDER BY v.id, v.role = 'owner' DESC
+  )
+  SELECT
+    i.id, i.title, i.sub_title, i.full_explained_idea, i.user_id, i.image_url, i.image_variants, i.created_at,
+    r.role,
+    CASE WHEN with_member_counts THEN (
+      SELECT count(*) FROM public.idea_members m WHERE m.idea_id = i.id AND m.status = 'accepted'
+    ) END
+  FROM roles r
+  JOIN public.ideas i ON i.id = r.id
+  WHERE after_created_at IS NULL OR (i.created_at, i.id) < (after_created_at, after_id)
+  ORDER BY i.created_at DESC, i.id DESC
+  LIMIT max_results;
+$$;
@@ -0,0 +1,5 @@
+"""
+An async load-testing harness for the TeamJoin backend, with a local stand-in for Supabase.
+
+See run.py for how to run it.
+"""
@@ -0,0 +1,135 @@
+"""
+Measures the cold start of the backend: what a user waits for when a new serverless instance starts.
+
+Every sample runs in a fresh Python process (from api/, like Vercel), which
+times importing `main` and then serving one request to the app in-process.
+Samples are taken with the routers loaded up front and lazily (LAZY_ROUTERS),
+for a few paths, and the medians are reported:
+
+    python -m loadtest.coldstart --runs 7
+
+By default the Supabase stand-in (see stub.py) is started so that requests
+that reach Supabase get real answers. Save a run with `--save coldstart.json`
+and compare a later one with `--compare coldstart.json` to catch regressions.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import jwt
+
+from .report import save, load
+from .run import API_DIR, _wait_until_up
+from .stub import STUB_JWT_SECRET
+
+DEFAULT_PATHS = ["/", "/feed/", "/ideas/"]
+
+# Runs inside the fresh process; prints the timings as JSON on its last line.
+SAMPLE = """
+import time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+import asyncio, json, sys
+import httpx
+
+async def first_request():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://coldstart") as client:
+        return (await client.get(sys.argv[1])).status_code
+
+status = asyncio.run(first_request())
+done = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_response_ms": (done - imported) * 1000, "status": status}))
+"""
+
+
+def sample(path: str, lazy: bool, env: Dict[str, str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", SAMPLE, path],
+        cwd=API_DIR, env={**env, "LAZY_ROUTERS": "true" if lazy else "false"},
+        capture_output=True, text=True, check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def measure(paths: List[str], runs: int, env: Dict[str, str]) -> Dict[str, Any]:
+    results = {}
+    for mode in ("eager", "lazy"):
+        for path in paths:
+            samples = [sample(path, mode == "lazy", env) for _ in range(runs)]
+            results[f"{mode} {path}"] = {
+                "runs": runs,
+                "status": samples[-1]["status"],
+                "import_ms": statistics.median(s["import_ms"] for s in samples),
+                "first_response_ms": statistics.median(s["first_response_ms"] for s in samples),
+                "total_ms": statistics.median(s["import_ms"] + s["first_response_ms"] for s in samples),
+                "process_ms": statistics.median(s["process_ms"] for s in samples),
+            }
+    return {"results": results}
+
+
+def format_results(summary: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    header = f"{'mode and path':<24} {'status':>6} {'import ms':>10} {'first resp ms':>14} {'total ms':>9} {'process ms':>11}"
+    if baseline:
+        header += f" {'Δtotal':>8}"
+    lines = [header, "-" * len(header)]
+    for name, r in summary["results"].items():
+        line = (f"{name:<24} {r['status']:>6} {r['import_ms']:>10.1f} {r['first_response_ms']:>14.1f} "
+                f"{r['total_ms']:>9.1f} {r['process_ms']:>11.1f}")
+        before = (baseline or {}).get("results", {}).get(name)
+        if before and before["total_ms"]:
+            line += f" {(r['total_ms'] - before['total_ms']) / before['total_ms'] * 100:>+7.0f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the cold start of the TeamJoin backend.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode and path (the median is reported).")
+    parser.add_argument("--path", action="append", help=f"A path to request (repeatable, default: {' '.join(DEFAULT_PATHS)}).")
+    parser.add_argument("--no-stub", action="store_true", help="Use SUPABASE_URL and SUPABASE_KEY from the environment instead of the stand-in.")
+    parser.add_argument("--stub-port", type=int, default=54330, help="Port of the Supabase stand-in.")
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare the results with a previously saved JSON file.")
+    args = parser.parse_args(argv)
+
+    env = {**os.environ}
+    env.pop("VERCEL", None)
+    stub = None
+    if not args.no_stub:
+        stub = subprocess.Popen(
+            [sys.executable, "-m", "loadtest.stub", "--port", str(args.stub_port), "--latency-ms", "0"],
+            cwd=os.path.dirname(API_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        _wait_until_up(f"http://127.0.0.1:{args.stub_port}/auth/v1/.well-known/jwks.json")
+        env.update({
+            "SUPABASE_URL": f"http://127.0.0.1:{args.stub_port}",
+            "SUPABASE_KEY": jwt.encode({"role": "anon", "iss": "supabase"}, STUB_JWT_SECRET, algorithm="HS256"),
+            "DB_HTTP2": "false",
+        })
+    try:
+        summary = measure(args.path or DEFAULT_PATHS, args.runs, env)
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait(timeout=10)
+
+    baseline = load(args.compare) if args.compare else None
+    print(format_results(summary, baseline))
+    if args.save:
+        save(summary, args.save)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+The flows of test_cli.py, replayed by a virtual user without any prompts.
+
+Each virtual user signs up, verifies its email, logs in, creates and updates
+its profile, creates an idea (with an uploaded image, through a signed upload
+URL) and opens the idea's chat WebSocket. It then loops over a mix of the
+read-heavy endpoints and sending chat messages until the run ends. Every chat
+message carries a unique marker, so the time it takes to come back over the
+WebSocket is measured as the delivery latency.
+"""
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import httpx
+import websockets
+
+from .report import Recorder
+
+# How often each action is picked in the steady-state loop.
+ACTIONS = {
+    "feed": 30,
+    "idea": 15,
+    "send_message": 15,
+    "history": 10,
+    "search": 10,
+    "profile": 10,
+    "my_ideas": 10,
+}
+
+
+class FlowError(Exception):
+    """Raised when a setup step fails, since nothing after it can work."""
+
+
+class VirtualUser:
+    def __init__(self, number: int, http: httpx.AsyncClient, ws_url: str, recorder: Recorder,
+                 otp: str, image: bytes, think_time: float = 0.0):
+        self.number = number
+        self.http = http
+        self.ws_url = ws_url
+        self.recorder = recorder
+        self.otp = otp
+        self.image = image
+        self.think_time = think_time
+        suffix = uuid.uuid4().hex[:10]
+        self.email = f"loadtest-{number}-{suffix}@example.com"
+        self.password = f"pw-{suffix}"
+        self.token: Optional[str] = None
+        self.idea_id: Optional[str] = None
+        self.pending_messages: Dict[str, float] = {}
+        self.websocket: Any = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    async def call(self, name: str, method: str, url: str, expect: int = 200, **kwargs) -> httpx.Response:
+        """Makes one request and records it under `name` (the method and route template)."""
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(name, time.perf_counter() - start, ok=False, detail=f"{type(e).__name__}: {e}")
+            raise FlowError(f"{name} failed: {e}")
+        ok = response.status_code == expect
+        self.recorder.record(name, time.perf_counter() - start, ok=ok, detail=None if ok else f"{response.status_code} {response.text}")
+        return response
+
+    async def setup(self):
+        """Walks through test_cli.py options 1, 2, 3, 6, 7, 8, 9 and 11."""
+        response = await self.call("POST /auth/signup", "POST", "/auth/signup",
+                                   json={"email": self.email, "password": self.password, "name": f"Load Tester {self.number}"})
+        if response.status_code != 200:
+            raise FlowError("signup failed")
+        await self.call("POST /auth/verify-otp", "POST", "/auth/verify-otp", json={"email": self.email, "token": self.otp})
+        response = await self.call("POST /auth/login", "POST", "/auth/login", json={"email": self.email, "password": self.password})
+        if response.status_code != 200:
+            raise FlowError("login failed")
+        self.token = response.json()["access_token"]
+
+        await self.call("GET /users/me", "GET", "/users/me")
+        profile = {
+            "user_data": {"name": f"Load Tester {self.number}", "location": "Benchmark", "about": "I generate load."},
+            "skills": {"python": "expert", "fastapi": random.choice(["intermediate", "expert"])},
+        }
+        await self.call("POST /user/profile", "POST", "/user/profile", json=profile)
+        await self.call("GET /user/profile", "GET", "/user/profile")
+        profile["user_data"]["about"] = "I generate load, updated."
+        await self.call("PUT /user/profile", "PUT", "/user/profile", json=profile)
+
+        # Create an idea with an image: get a signed upload URL, upload to it, then create the idea.
+        response = await self.call("POST /ideas/create_upload_url", "POST", "/ideas/create_upload_url",
+                                   params={"file_name": f"loadtest-{uuid.uuid4().hex}.jpg"})
+        image_url = None
+        if response.status_code == 200:
+            signed_url = response.json()["signed_url"]
+            start = time.perf_counter()
+            upload = await self.http.put(signed_url, content=self.image)
+            self.recorder.record("PUT storage signed upload", time.perf_counter() - start, ok=upload.status_code == 200,
+                                 detail=upload.text)
+            image_url = signed_url.split("?")[0]
+        idea = {"title": f"Load test idea {self.number}", "sub_title": "Benchmarking the backend",
+                "full_explained_idea": "An idea created by a virtual user of the load test."}
+        if image_url:
+            idea["image_url"] = image_url
+        response = await self.call("POST /ideas/", "POST", "/ideas/", data=idea)
+        if response.status_code != 200:
+            raise FlowError("creating the idea failed")
+        self.idea_id = response.json()["id"]
+
+    async def listen(self):
+        """Test_cli.py option 13: listens on the idea's chat and measures how long messages take to arrive."""
+        uri = f"{self.ws_url}/ws/ideas/{self.idea_id}/messages?token={self.token}"
+        start = time.perf_counter()
+        try:
+            async with websockets.connect(uri, open_timeout=10) as websocket:
+                self.recorder.record("WS connect", time.perf_counter() - start)
+                self.websocket = websocket
+                async for raw in websocket:
+                    message = json.loads(raw)
+                    sent_at = self.pending_messages.pop(message.get("content", ""), None)
+                    if sent_at is not None:
+                        self.recorder.record("WS delivery", time.perf_counter() - sent_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.recorder.record("WS connect", time.perf_counter() - start, ok=False, detail=f"{type(e).__name__}: {e}")
+        finally:
+            self.websocket = None
+
+    async def act(self, action: str):
+        if action == "feed":
+            await self.call("GET /feed/", "GET", "/feed/", params={"limit": 20})
+        elif action == "idea":
+            await self.call("GET /ideas/{idea_id}", "GET", f"/ideas/{self.idea_id}")
+        elif action == "send_message":
+            # Test_cli.py option 12. The content doubles as the marker to match the WebSocket delivery.
+            content = f"loadtest {uuid.uuid4().hex}"
+            self.pending_messages[content] = time.perf_counter()
+            response = await self.call("POST /ideas/{idea_id}/messages", "POST", f"/ideas/{self.idea_id}/messages",
+                                       json={"content": content})
+            if response.status_code != 200:
+                self.pending_messages.pop(content, None)
+        elif action == "history":
+            await self.call("GET /ideas/{idea_id}/messages", "GET", f"/ideas/{self.idea_id}/messages", params={"limit": 50})
+        elif action == "search":
+            await self.call("GET /search/", "GET", "/search/", params={"q": random.choice(["load", "idea", "bench", "python"])})
+        elif action == "profile":
+            await self.call("GET /user/profile", "GET", "/user/profile")
+        elif action == "my_ideas":
+            await self.call("GET /user/ideas", "GET", "/user/ideas")
+
+    async def run(self, stop_at: float):
+        """Sets up, then keeps acting until `stop_at` (a `time.perf_counter()` value)."""
+        try:
+            await self.setup()
+        except FlowError as e:
+            self.recorder.fail("virtual user setup", str(e))
+            return
+
+        listener = asyncio.create_task(self.listen())
+        names, weights = zip(*ACTIONS.items())
+        try:
+            while time.perf_counter() < stop_at:
+                try:
+                    await self.act(random.choices(names, weights)[0])
+                except FlowError:
+                    pass
+                if self.think_time:
+                    await asyncio.sleep(self.think_time)
+            # Give the last messages a moment to come back over the socket.
+            await asyncio.sleep(1.0)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            for _ in self.pending_messages:
+                self.recorder.fail("WS delivery", "message never arrived over the WebSocket")
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of the per-row cost of returning a page of ideas (see api/serialization.py).
+
+A page of synthetic ideas, each with a few members, shaped exactly like the
+rows PostgREST returns, is served by a throwaway FastAPI app in three ways:
+
+- "standard": returned as is, validated against `response_model` and encoded by FastAPI.
+- "validated": `validated_response`, a precompiled TypeAdapter validating and encoding in one pass.
+- "trusted": `trusted_response`, no validation, trimmed to the model's fields and encoded with orjson.
+
+Each request goes through the whole ASGI stack in-process, so the numbers
+include everything FastAPI does for the response but no network:
+
+    python -m loadtest.jsonbench --rows 1000 --members 3
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .run import API_DIR
+
+sys.path.insert(0, API_DIR)
+
+from fastapi import FastAPI  # noqa: E402
+
+import serialization  # noqa: E402
+from ideas.models import IdeaPage  # noqa: E402
+
+
+def make_page(rows: int, members: int) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    items = []
+    for number in range(rows):
+        idea_id = str(uuid.uuid4())
+        created_at = (now - timedelta(minutes=number)).isoformat()
+        items.append({
+            "id": idea_id,
+            "title": f"Idea number {number}",
+            "sub_title": "A short pitch for the feed card",
+            "full_explained_idea": "A longer explanation of the idea. " * 8,
+            "user_id": str(uuid.uuid4()),
+            "image_url": f"https://example.supabase.co/storage/v1/object/public/idea-images/{idea_id}.jpg",
+            "created_at": created_at,
+            "members": [
+                {"id": str(uuid.uuid4()), "idea_id": idea_id, "user_id": str(uuid.uuid4()),
+                 "status": "accepted", "created_at": created_at}
+                for _ in range(members)
+            ],
+        })
+    return {"items": items, "next_cursor": "eyJjcmVhdGVkX2F0IjoiMjAyNC0wMS0wMVQwMDowMDowMCswMDowMCJ9"}
+
+
+def make_app(page: Dict[str, Any]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/standard", response_model=IdeaPage)
+    async def standard():
+        return page
+
+    @app.get("/validated", response_model=IdeaPage)
+    async def validated():
+        return serialization.validated_response(IdeaPage, page)
+
+    @app.get("/trusted", response_model=IdeaPage)
+    async def trusted():
+        return serialization.trusted_response(IdeaPage, page)
+
+    return app
+
+
+async def bench(app: FastAPI, path: str, requests: int) -> Dict[str, float]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.get(path)
+        response.raise_for_status()
+        size = len(response.content)
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get(path)
+            timings.append(time.perf_counter() - start)
+    return {"median_ms": statistics.median(timings) * 1000, "bytes": size}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the per-row cost of serializing a page of ideas.")
+    parser.add_argument("--rows", type=int, default=1000, help="Ideas on the page.")
+    parser.add_argument("--members", type=int, default=3, help="Members embedded in each idea.")
+    parser.add_argument("--requests", type=int, default=30, help="Requests per variant (the median is reported).")
+    args = parser.parse_args(argv)
+
+    app = make_app(make_page(args.rows, args.members))
+    encoder = "orjson" if serialization.orjson is not None else "json (orjson is not installed)"
+    print(f"{args.rows} ideas with {args.members} members each, encoder for trusted rows: {encoder}")
+    header = f"{'variant':<10} {'ms/request':>11} {'µs/row':>8} {'speedup':>8} {'bytes':>10}"
+    print(header)
+    print("-" * len(header))
+    baseline = None
+    for variant in ("standard", "validated", "trusted"):
+        result = asyncio.run(bench(app, f"/{variant}", args.requests))
+        baseline = baseline or result["median_ms"]
+        print(f"{variant:<10} {result['median_ms']:>11.2f} {result['median_ms'] * 1000 / args.rows:>8.2f} "
+              f"{baseline / result['median_ms']:>7.1f}x {result['bytes']:>10}")
+
+
+if __name__ == "__main__":
+    main()
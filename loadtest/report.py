@@ -0,0 +1,101 @@
+"""
+Latency bookkeeping and the end-of-run report.
+
+Every request is recorded under its endpoint (method + route template), so the
+report shows throughput and p50/p95/p99 latency per endpoint. WebSocket delivery
+latency (the time from sending a message to receiving it on the chat socket) is
+recorded under its own name. A run can be saved as JSON and compared with a
+previous one to see what a change did.
+"""
+
+import json
+import math
+from typing import Any, Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects latencies (in seconds) and errors per endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_samples: Dict[str, str] = {}
+
+    def record(self, name: str, seconds: float, ok: bool = True, detail: Optional[str] = None):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            if detail and name not in self.error_samples:
+                self.error_samples[name] = detail[:200]
+
+    def fail(self, name: str, detail: str):
+        """Counts an error that has no meaningful latency, e.g. a message that never arrived."""
+        self.latencies.setdefault(name, [])
+        self.errors[name] = self.errors.get(name, 0) + 1
+        self.error_samples.setdefault(name, detail[:200])
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values) or [0.0]
+            endpoints[name] = {
+                "count": len(self.latencies[name]),
+                "errors": self.errors.get(name, 0),
+                "rps": len(self.latencies[name]) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "max_ms": values[-1] * 1000,
+            }
+        total = sum(e["count"] for name, e in endpoints.items() if not name.startswith("WS "))
+        return {
+            "elapsed_s": elapsed,
+            "requests": total,
+            "rps": total / elapsed if elapsed else 0.0,
+            "errors": sum(self.errors.values()),
+            "endpoints": endpoints,
+            "error_samples": self.error_samples,
+        }
+
+
+def format_summary(summary: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    header = f"{'endpoint':<44} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    if baseline:
+        header += f" {'Δp95':>8} {'Δrps':>8}"
+    lines = [header, "-" * len(header)]
+    for name, e in summary["endpoints"].items():
+        line = (f"{name:<44} {e['count']:>7} {e['errors']:>5} {e['rps']:>8.1f} "
+                f"{e['p50_ms']:>9.1f} {e['p95_ms']:>9.1f} {e['p99_ms']:>9.1f} {e['max_ms']:>9.1f}")
+        before = (baseline or {}).get("endpoints", {}).get(name)
+        if before:
+            line += f" {_change(before['p95_ms'], e['p95_ms']):>8} {_change(before['rps'], e['rps']):>8}"
+        lines.append(line)
+    lines.append("-" * len(header))
+    lines.append(f"{summary['requests']} requests in {summary['elapsed_s']:.1f}s: "
+                 f"{summary['rps']:.1f} req/s, {summary['errors']} errors")
+    for name, detail in summary["error_samples"].items():
+        lines.append(f"  first error on {name}: {detail}")
+    return "\n".join(lines)
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "-"
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def save(summary: Dict[str, Any], path: str):
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
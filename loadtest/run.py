@@ -0,0 +1,144 @@
+"""
+Runs N concurrent virtual users against the backend and reports throughput and latency per endpoint.
+
+Against a backend that is already running (e.g. pointed at a real Supabase project):
+
+    python -m loadtest.run --base-url http://127.0.0.1:8000 --users 50 --duration 60 --otp <code>
+
+Fully offline, against the bundled Supabase stand-in (see stub.py). This starts
+the stand-in and the backend (with uvicorn, from api/) as subprocesses, runs the
+load and stops both:
+
+    python -m loadtest.run --local --users 50 --duration 30 --stub-latency-ms 20
+
+Save a run with `--save before.json` and compare a later one with
+`--compare before.json` to see how a change moved p95 latency and throughput.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+import httpx
+import jwt
+
+from . import report
+from .flows import VirtualUser
+from .stub import STUB_JWT_SECRET, STUB_OTP
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+DEFAULT_IMAGE = os.path.join(os.path.dirname(API_DIR), "test .jpg")
+
+
+def _wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+@contextmanager
+def local_stack(backend_port: int, stub_port: int, stub_latency_ms: float, workers: int, verbose: bool = False):
+    """Starts the Supabase stand-in and the backend pointed at it, and stops both afterwards."""
+    processes: List[subprocess.Popen] = []
+    # The backend logs every upstream request; keep that out of the report unless asked for.
+    output = None if verbose else subprocess.DEVNULL
+    try:
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "loadtest.stub", "--port", str(stub_port), "--latency-ms", str(stub_latency_ms)],
+            cwd=os.path.dirname(API_DIR), stdout=output, stderr=output,
+        ))
+        _wait_until_up(f"http://127.0.0.1:{stub_port}/auth/v1/.well-known/jwks.json")
+
+        anon_key = jwt.encode({"role": "anon", "iss": "supabase"}, STUB_JWT_SECRET, algorithm="HS256")
+        env = {
+            **os.environ,
+            "SUPABASE_URL": f"http://127.0.0.1:{stub_port}",
+            "SUPABASE_KEY": anon_key,
+            "SUPABASE_JWT_SECRET": STUB_JWT_SECRET,
+            # The stand-in speaks HTTP/1.1 only.
+            "DB_HTTP2": "false",
+        }
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(backend_port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=API_DIR, env=env, stdout=output, stderr=output,
+        ))
+        _wait_until_up(f"http://127.0.0.1:{backend_port}/")
+        yield f"http://127.0.0.1:{backend_port}"
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def run_load(base_url: str, users: int, duration: float, ramp_up: float, think_time: float,
+                   otp: str, image: bytes) -> report.Recorder:
+    recorder = report.Recorder()
+    ws_url = base_url.replace("https://", "wss://").replace("http://", "ws://")
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=limits) as http:
+        stop_at = time.perf_counter() + ramp_up + duration
+
+        async def start(number: int):
+            # Spread the virtual users over the ramp-up period instead of starting them all at once.
+            await asyncio.sleep(ramp_up * number / max(1, users))
+            await VirtualUser(number, http, ws_url, recorder, otp, image, think_time).run(stop_at)
+
+        await asyncio.gather(*(start(number) for number in range(users)))
+    return recorder
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load test the TeamJoin backend with concurrent virtual users.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="The backend to test (ignored with --local).")
+    parser.add_argument("--users", type=int, default=20, help="Number of concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of steady load after the ramp-up.")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which the virtual users start.")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between the actions of a virtual user.")
+    parser.add_argument("--otp", default=STUB_OTP, help="The email OTP to verify sign ups with.")
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="The image uploaded with each idea.")
+    parser.add_argument("--local", action="store_true", help="Start the Supabase stand-in and the backend locally.")
+    parser.add_argument("--port", type=int, default=8765, help="Backend port with --local.")
+    parser.add_argument("--stub-port", type=int, default=54329, help="Supabase stand-in port with --local.")
+    parser.add_argument("--stub-latency-ms", type=float, default=10.0, help="Simulated Supabase round trip with --local.")
+    parser.add_argument("--workers", type=int, default=1, help="Backend worker processes with --local.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the local stand-in and backend.")
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare the results with a previously saved JSON file.")
+    args = parser.parse_args(argv)
+
+    image = open(args.image, "rb").read() if os.path.exists(args.image) else os.urandom(64 * 1024)
+
+    def run(base_url: str):
+        started = time.perf_counter()
+        recorder = asyncio.run(run_load(base_url, args.users, args.duration, args.ramp_up,
+                                        args.think_ms / 1000, args.otp, image))
+        return recorder.summary(time.perf_counter() - started)
+
+    if args.local:
+        with local_stack(args.port, args.stub_port, args.stub_latency_ms, args.workers, args.verbose) as base_url:
+            summary = run(base_url)
+    else:
+        summary = run(args.base_url)
+
+    baseline = report.load(args.compare) if args.compare else None
+    print(report.format_summary(summary, baseline))
+    if args.save:
+        report.save(summary, args.save)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,782 @@
+"""
+A local stand-in for the Supabase APIs the backend talks to, for load tests without network access.
+
+It implements just enough of each service for every flow in test_cli.py:
+
+- PostgREST (`/rest/v1`): in-memory tables with the filters, embedded resources,
+  ordering, pagination, upserts and RPCs the backend uses.
+- Auth (`/auth/v1`): sign up, OTP verification (the code is always STUB_OTP),
+  password sign in, user lookup and update. Tokens are HS256 JWTs signed with
+  STUB_JWT_SECRET, so the backend verifies them locally when it is started with
+  the same SUPABASE_JWT_SECRET.
+- Storage (`/storage/v1`): signed upload URLs, uploads, downloads and signed URLs.
+- Realtime (`/realtime/v1/websocket`): the Phoenix channel protocol, pushing
+  `postgres_changes` INSERT events for every row inserted through PostgREST.
+
+Every HTTP call can be delayed by `--latency-ms` to stand in for the network
+round trip to a real Supabase project. Nothing is persisted.
+
+    python -m loadtest.stub --port 54321 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import secrets
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import jwt
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+STUB_JWT_SECRET = "loadtest-jwt-secret-loadtest-jwt-secret"
+STUB_OTP = "123456"
+
+# Foreign keys, as (table, embedded table) -> (local column, remote column, is one-to-many).
+RELATIONS: Dict[Tuple[str, str], Tuple[str, str, bool]] = {
+    ("ideas", "idea_members"): ("id", "idea_id", True),
+    ("ideas", "messages"): ("id", "idea_id", True),
+    ("ideas", "profiles"): ("user_id", "uuid", False),
+    ("idea_members", "ideas"): ("idea_id", "id", False),
+    ("idea_members", "profiles"): ("user_id", "uuid", False),
+    ("messages", "ideas"): ("idea_id", "id", False),
+    ("messages", "profiles"): ("sender_id", "uuid", False),
+}
+PRIMARY_KEYS = {"ideas": "id", "idea_members": "id", "messages": "id", "profiles": "uuid"}
+# Columns with a hash index, so the stub doesn't become the bottleneck of a benchmark.
+INDEXED_COLUMNS = {"id", "uuid", "idea_id", "user_id", "sender_id"}
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class PostgrestError(Exception):
+    def __init__(self, status_code: int, message: str, code: str = "PGRST000"):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.code = code
+
+
+# --- Query parsing ---
+
+def split_top_level(text: str, separator: str = ",") -> List[str]:
+    """Splits on `separator`, except inside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return [part for part in parts if part != ""]
+
+
+def unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+class Embed:
+    def __init__(self, alias: str, table: str, select: "Selection", inner: bool):
+        self.alias = alias
+        self.table = table
+        self.select = select
+        self.inner = inner
+
+
+class Selection:
+    """A parsed `select` parameter: plain columns plus embedded resources."""
+
+    def __init__(self, text: str):
+        self.columns: List[Tuple[str, str]] = []  # (output name, column)
+        self.star = False
+        self.count = False
+        self.embeds: List[Embed] = []
+        for item in split_top_level(text or "*"):
+            item = item.strip()
+            if item == "*":
+                self.star = True
+            elif item == "count":
+                self.count = True
+            elif "(" in item:
+                head, inner_text = item.split("(", 1)
+                alias, _, table = head.rpartition(":")
+                table, _, hint = table.partition("!")
+                self.embeds.append(Embed(alias or table, table, Selection(inner_text[:-1]), hint == "inner"))
+            else:
+                alias, _, column = item.rpartition(":")
+                column = column.split("::")[0]
+                self.columns.append((alias or column, column))
+
+
+def compare(row_value: Any, operator: str, raw: str) -> bool:
+    if operator == "is":
+        lowered = raw.lower()
+        if lowered == "null":
+            return row_value is None
+        if lowered in ("true", "false"):
+            return row_value is (lowered == "true")
+        return False
+    if operator == "in":
+        values = [unquote(v) for v in split_top_level(raw.strip("()"))]
+        return any(compare(row_value, "eq", value) for value in values)
+    if row_value is None:
+        return False
+    if operator in ("like", "ilike"):
+        pattern = "^" + re.escape(raw).replace(r"\*", ".*").replace("%", ".*") + "$"
+        return re.match(pattern, str(row_value), re.IGNORECASE if operator == "ilike" else 0) is not None
+
+    value: Any = raw
+    if isinstance(row_value, bool):
+        value = raw.lower() == "true"
+    elif isinstance(row_value, (int, float)):
+        try:
+            value = type(row_value)(raw)
+        except ValueError:
+            return False
+    else:
+        row_value = str(row_value)
+    if operator == "eq":
+        return row_value == value
+    if operator == "neq":
+        return row_value != value
+    if operator == "gt":
+        return row_value > value
+    if operator == "gte":
+        return row_value >= value
+    if operator == "lt":
+        return row_value < value
+    if operator == "lte":
+        return row_value <= value
+    raise PostgrestError(400, f"Unsupported operator: {operator}")
+
+
+def column_value(row: Dict[str, Any], column: str) -> Any:
+    """The value of a column, or of a `column->>key` field of a JSON column (as text)."""
+    if "->>" in column:
+        name, _, key = column.partition("->>")
+        value = row.get(name)
+        value = value.get(key) if isinstance(value, dict) else None
+        return None if value is None else str(value)
+    return row.get(column)
+
+
+def parse_condition(column: str, expression: str) -> Callable[[Dict[str, Any]], bool]:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, raw = expression.partition(".")
+    raw = unquote(raw)
+
+    def check(row: Dict[str, Any]) -> bool:
+        result = compare(column_value(row, column), operator, raw)
+        return not result if negate else result
+    return check
+
+
+def parse_logic(operator: str, text: str) -> Callable[[Dict[str, Any]], bool]:
+    """Parses the body of an `or=(...)` / `and=(...)` filter, including nested groups."""
+    checks = []
+    for part in split_top_level(text.strip()[1:-1]):
+        part = part.strip()
+        negate = part.startswith("not.")
+        if negate:
+            part = part[4:]
+        if part.startswith(("and(", "or(")):
+            nested_operator, _, body = part.partition("(")
+            check = parse_logic(nested_operator, "(" + body)
+        else:
+            column, _, expression = part.partition(".")
+            check = parse_condition(column, expression)
+        checks.append((lambda c: (lambda row: not c(row)))(check) if negate else check)
+    if operator == "or":
+        return lambda row: any(check(row) for check in checks)
+    return lambda row: all(check(row) for check in checks)
+
+
+class Query:
+    """Everything the query string of a PostgREST request says about which rows to touch and return."""
+
+    def __init__(self, params: List[Tuple[str, str]]):
+        self.select = Selection("*")
+        self.filters: List[Tuple[str, Callable]] = []
+        self.indexed: List[Tuple[str, str]] = []
+        self.embedded_filters: Dict[str, List[Callable]] = {}
+        self.orders: List[Tuple[str, bool]] = []
+        self.limit: Optional[int] = None
+        self.offset = 0
+        self.on_conflict: Optional[List[str]] = None
+        for key, value in params:
+            if key == "select":
+                self.select = Selection(value)
+            elif key == "order":
+                for part in value.split(","):
+                    column, _, direction = part.partition(".")
+                    self.orders.append((column, direction.startswith("desc")))
+            elif key == "limit":
+                self.limit = int(value)
+            elif key == "offset":
+                self.offset = int(value)
+            elif key == "on_conflict":
+                self.on_conflict = value.split(",")
+            elif key == "columns":
+                continue
+            elif key in ("or", "and"):
+                self.filters.append(("", parse_logic(key, value)))
+            elif "." in key:
+                alias, _, column = key.partition(".")
+                self.embedded_filters.setdefault(alias, []).append(parse_condition(column, value))
+            else:
+                if value.startswith("eq.") and key in INDEXED_COLUMNS:
+                    self.indexed.append((key, unquote(value[3:])))
+                self.filters.append((key, parse_condition(key, value)))
+
+
+# --- Storage engine ---
+
+class Table:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: List[Dict[str, Any]] = []
+        self.indexes: Dict[str, Dict[str, List[Dict[str, Any]]]] = {column: {} for column in INDEXED_COLUMNS}
+
+    def add(self, row: Dict[str, Any]):
+        self.rows.append(row)
+        for column, index in self.indexes.items():
+            if row.get(column) is not None:
+                index.setdefault(str(row[column]), []).append(row)
+
+    def reindex(self, row: Dict[str, Any], old: Dict[str, Any]):
+        for column, index in self.indexes.items():
+            if old.get(column) != row.get(column):
+                if old.get(column) is not None:
+                    index[str(old[column])].remove(row)
+                if row.get(column) is not None:
+                    index.setdefault(str(row[column]), []).append(row)
+
+    def remove(self, row: Dict[str, Any]):
+        self.rows.remove(row)
+        for column, index in self.indexes.items():
+            if row.get(column) is not None:
+                index[str(row[column])].remove(row)
+
+    def candidates(self, query: Query) -> List[Dict[str, Any]]:
+        if query.indexed:
+            column, value = query.indexed[0]
+            return list(self.indexes[column].get(value, ()))
+        return list(self.rows)
+
+
+class Database:
+    def __init__(self):
+        self.tables: Dict[str, Table] = {name: Table(name) for name in PRIMARY_KEYS}
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._last_created_at = ""
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            raise PostgrestError(404, f"Could not find the table 'public.{name}' in the schema cache", "PGRST205")
+        return self.tables[name]
+
+    def created_at(self) -> str:
+        # Keep timestamps strictly increasing, like a real sequence of inserts would be.
+        stamp = now_iso()
+        if stamp <= self._last_created_at:
+            last = datetime.fromisoformat(self._last_created_at)
+            stamp = last.replace(microsecond=(last.microsecond + 1) % 1_000_000).isoformat()
+        self._last_created_at = stamp
+        return stamp
+
+    def defaults(self, table: str, values: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(values)
+        key = PRIMARY_KEYS[table]
+        if key != "uuid":
+            row.setdefault(key, str(uuid.uuid4()))
+        if table != "profiles":
+            row.setdefault("created_at", self.created_at())
+        if table == "idea_members":
+            row.setdefault("status", "pending")
+        if table == "ideas":
+            for column in ("sub_title", "full_explained_idea", "image_url", "image_variants"):
+                row.setdefault(column, None)
+            row.setdefault("member_count", 0)
+        if table == "profiles":
+            row.setdefault("user_data", {})
+            row.setdefault("skills", {})
+        return row
+
+    def select(self, table_name: str, query: Query) -> List[Dict[str, Any]]:
+        table = self.table(table_name)
+        rows = [row for row in table.candidates(query) if all(check(row) for _, check in query.filters)]
+        for column, desc in reversed(query.orders):
+            rows.sort(key=lambda row: (row.get(column) is None, "" if row.get(column) is None else row.get(column)),
+                      reverse=desc)
+        rows = rows[query.offset:]
+        if query.limit is not None:
+            rows = rows[:query.limit]
+        return rows
+
+    def project(self, table_name: str, rows: List[Dict[str, Any]], selection: Selection,
+                embedded_filters: Dict[str, List[Callable]]) -> List[Dict[str, Any]]:
+        if selection.count:
+            return [{"count": len(rows)}]
+        results = []
+        for row in rows:
+            result = {k: v for k, v in row.items() if k != "search_vector"} if selection.star else {}
+            for name, column in selection.columns:
+                result[name] = row.get(column)
+            keep = True
+            for embed in selection.embeds:
+                relation = RELATIONS.get((table_name, embed.table))
+                if relation is None:
+                    raise PostgrestError(400, f"Could not find a relationship between '{table_name}' and '{embed.table}'", "PGRST200")
+                local, remote, many = relation
+                related = list(self.table(embed.table).indexes.get(remote, {}).get(str(row.get(local)), ())) \
+                    if remote in INDEXED_COLUMNS else \
+                    [r for r in self.table(embed.table).rows if r.get(remote) == row.get(local)]
+                checks = embedded_filters.get(embed.alias, [])
+                related = [r for r in related if all(check(r) for check in checks)]
+                if embed.inner and not related:
+                    keep = False
+                projected = self.project(embed.table, related, embed.select, {})
+                result[embed.alias] = projected if many else (projected[0] if projected else None)
+            if keep:
+                results.append(result)
+        return results
+
+    def insert(self, table_name: str, values: List[Dict[str, Any]], query: Query, merge: Optional[bool]) -> List[Dict[str, Any]]:
+        table = self.table(table_name)
+        stored = []
+        for value in values:
+            existing = None
+            if merge is not None:
+                conflict = query.on_conflict or [PRIMARY_KEYS[table_name]]
+                existing = next((row for row in table.rows if all(str(row.get(c)) == str(value.get(c)) for c in conflict)), None)
+            elif PRIMARY_KEYS[table_name] in value:
+                key = PRIMARY_KEYS[table_name]
+                if table.indexes[key].get(str(value[key])):
+                    raise PostgrestError(409, f'duplicate key value violates unique constraint "{table_name}_pkey"', "23505")
+            if existing is not None:
+                if merge:
+                    old = dict(existing)
+                    existing.update(value)
+                    table.reindex(existing, old)
+                    self.count_members(table_name, old, existing)
+                    stored.append(existing)
+                continue
+            row = self.defaults(table_name, value)
+            table.add(row)
+            self.count_members(table_name, None, row)
+            stored.append(row)
+            for listener in self.listeners:
+                listener(table_name, row)
+        return stored
+
+    def update(self, table_name: str, values: Dict[str, Any], query: Query) -> List[Dict[str, Any]]:
+        table = self.table(table_name)
+        rows = self.select(table_name, query)
+        for row in rows:
+            old = dict(row)
+            row.update(values)
+            table.reindex(row, old)
+            self.count_members(table_name, old, row)
+        return rows
+
+    def delete(self, table_name: str, query: Query) -> List[Dict[str, Any]]:
+        table = self.table(table_name)
+        rows = self.select(table_name, query)
+        for row in rows:
+            table.remove(row)
+            self.count_members(table_name, row, None)
+        return rows
+
+    def count_members(self, table_name: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """Keeps `ideas.member_count` (accepted members only) up to date, like the trigger in api/feed/member_count.sql."""
+        if table_name != "idea_members":
+            return
+        for row, delta in ((old, -1), (new, 1)):
+            if row and row.get("status") == "accepted":
+                for idea in self.tables["ideas"].indexes["id"].get(str(row.get("idea_id")), ()):
+                    idea["member_count"] = idea.get("member_count", 0) + delta
+
+    # --- RPCs (see api/search/search_index.sql) ---
+
+    def search(self, table_name: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        words = re.findall(r"([a-z0-9_]+):\*", (params.get("query") or "").lower())
+        limit, skip = int(params.get("max_results", 20)), int(params.get("skip", 0))
+        hits = []
+        for row in self.tables[table_name].rows:
+            if table_name == "ideas":
+                fields = [(row.get("title"), 1.0), (row.get("sub_title"), 0.4), (row.get("full_explained_idea"), 0.2)]
+            else:
+                user_data, skills = row.get("user_data") or {}, row.get("skills") or {}
+                fields = [(user_data.get("name"), 1.0), (" ".join(f"{k} {v}" for k, v in skills.items()), 0.4),
+                          (user_data.get("about"), 0.2)]
+            score = 0.0
+            for word in words:
+                matched = [weight for text, weight in fields if text and re.search(rf"\b{re.escape(word)}", str(text).lower())]
+                if not matched:
+                    break
+                score += max(matched)
+            else:
+                if words:
+                    hits.append((score, row))
+        hits.sort(key=lambda hit: -hit[0])
+        results = []
+        for score, row in hits[skip:skip + limit]:
+            if table_name == "ideas":
+                data = {k: row.get(k) for k in ("id", "title", "sub_title", "user_id", "image_url", "created_at")}
+                results.append({"id": row["id"], "score": score, "highlight": row.get("title"), "data": data})
+            else:
+                data = {"uuid": row["uuid"], "user_data": row.get("user_data"), "skills": row.get("skills")}
+                results.append({"id": row["uuid"], "score": score, "highlight": (row.get("user_data") or {}).get("name"), "data": data})
+        return results
+
+    def user_ideas(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        ideas, members = self.tables["ideas"], self.tables["idea_members"]
+        user_id = str(params["member_id"])
+        roles = {row["id"]: "owner" for row in ideas.indexes["user_id"].get(user_id, ())}
+        for member in members.indexes["user_id"].get(user_id, ()):
+            if member.get("status") == "accepted":
+                roles.setdefault(member["idea_id"], "member")
+        after = (params["after_created_at"], params["after_id"]) if params.get("after_created_at") else None
+        rows = []
+        for idea_id, role in roles.items():
+            for idea in ideas.indexes["id"].get(str(idea_id), ()):
+                if after and (idea["created_at"], idea["id"]) >= after:
+                    continue
+                row = {k: idea.get(k) for k in ("id", "title", "sub_title", "full_explained_idea", "user_id",
+                                                "image_url", "image_variants", "created_at")}
+                row["role"] = role
+                row["member_count"] = sum(
+                    1 for member in members.indexes["idea_id"].get(str(idea_id), ()) if member.get("status") == "accepted"
+                ) if params.get("with_member_counts") else None
+                rows.append(row)
+        rows.sort(key=lambda row: (row["created_at"], row["id"]), reverse=True)
+        return rows[:int(params.get("max_results", 20))]
+
+
+    def join_ideas(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        ideas, members = self.tables["ideas"], self.tables["idea_members"]
+        user_id = str(params["member_id"])
+        results = []
+        for idea_id in dict.fromkeys(str(idea_id) for idea_id in params.get("idea_ids") or []):
+            if not ideas.indexes["id"].get(idea_id):
+                continue
+            existing = next((row for row in members.indexes["idea_id"].get(idea_id, ()) if row["user_id"] == user_id), None)
+            row = existing or self.insert("idea_members", [{"idea_id": idea_id, "user_id": user_id}], Query([]), None)[0]
+            results.append({**row, "created": existing is None})
+        return results
+
+    def review_join_requests(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        ideas, members = self.tables["ideas"], self.tables["idea_members"]
+        owner_id = str(params["owner_id"])
+        results = []
+        for decision in params.get("decisions") or []:
+            for row in members.indexes["id"].get(str(decision["request_id"]), ()):
+                if any(idea["user_id"] == owner_id for idea in ideas.indexes["id"].get(str(row["idea_id"]), ())):
+                    old = dict(row)
+                    row["status"] = decision["status"]
+                    members.reindex(row, old)
+                    self.count_members("idea_members", old, row)
+                    results.append(row)
+        return results
+
+# --- Realtime ---
+
+class RealtimeHub:
+    """Pushes postgres_changes events to the channels that asked for them."""
+
+    def __init__(self, database: Database):
+        self.connections: Dict[int, Tuple[asyncio.Queue, Dict[str, List[Dict[str, Any]]]]] = {}
+        self.next_binding_id = 1
+        database.listeners.append(self.on_insert)
+
+    def on_insert(self, table: str, row: Dict[str, Any]):
+        for queue, channels in self.connections.values():
+            for topic, bindings in channels.items():
+                ids = [b["id"] for b in bindings if b.get("table") in (None, table) and b.get("event") in ("INSERT", "*")]
+                if ids:
+                    queue.put_nowait({
+                        "topic": topic, "event": "postgres_changes", "ref": None,
+                        "payload": {"ids": ids, "data": {
+                            "schema": "public", "table": table, "commit_timestamp": now_iso(),
+                            "type": "INSERT", "errors": None, "columns": [], "record": row,
+                        }},
+                    })
+
+
+# --- Application ---
+
+def create_app(latency: float = 0.0) -> FastAPI:
+    app = FastAPI(docs_url=None, redoc_url=None)
+    database = Database()
+    realtime = RealtimeHub(database)
+    objects: Dict[str, bytes] = {}
+    app.state.database = database
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    @app.exception_handler(PostgrestError)
+    async def postgrest_error(request: Request, error: PostgrestError):
+        return JSONResponse({"message": error.message, "code": error.code, "details": None, "hint": None}, status_code=error.status_code)
+
+    # --- PostgREST ---
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str, request: Request):
+        params = await request.json() if await request.body() else {}
+        if function == "search_ideas":
+            return database.search("ideas", params)
+        if function == "search_profiles":
+            return database.search("profiles", params)
+        if function == "user_ideas":
+            return database.user_ideas(params)
+        if function == "join_ideas":
+            return database.join_ideas(params)
+        if function == "review_join_requests":
+            return database.review_join_requests(params)
+        raise PostgrestError(404, f"Could not find the function public.{function}", "PGRST202")
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH", "DELETE"])
+    async def rest(table: str, request: Request):
+        query = Query(list(request.query_params.multi_items()))
+        prefer = request.headers.get("prefer", "")
+        if request.method == "GET":
+            rows = database.select(table, query)
+            body = database.project(table, rows, query.select, query.embedded_filters)
+            headers = {}
+            if "count=" in prefer:
+                total = len(database.select(table, Query([(k, v) for k, v in request.query_params.multi_items() if k not in ("limit", "offset")])))
+                headers["Content-Range"] = f"{query.offset}-{query.offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+            return JSONResponse(body, headers=headers)
+
+        payload = await request.json() if request.method in ("POST", "PATCH") else None
+        if request.method == "POST":
+            merge = None
+            if "resolution=merge-duplicates" in prefer:
+                merge = True
+            elif "resolution=ignore-duplicates" in prefer:
+                merge = False
+            rows = database.insert(table, payload if isinstance(payload, list) else [payload], query, merge)
+            status = 201
+        elif request.method == "PATCH":
+            rows = database.update(table, payload, query)
+            status = 200
+        else:
+            rows = database.delete(table, query)
+            status = 200
+        if "return=representation" not in prefer:
+            return Response(status_code=204 if status == 200 else status)
+        return JSONResponse(database.project(table, rows, query.select, {}), status_code=status)
+
+    # --- Auth ---
+
+    def auth_error(status: int, message: str) -> JSONResponse:
+        return JSONResponse({"code": status, "error_code": "stub_error", "msg": message}, status_code=status)
+
+    def public_user(user: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in user.items() if k != "password"}
+
+    def session_for(user: Dict[str, Any]) -> Dict[str, Any]:
+        issued = int(time.time())
+        token = jwt.encode({
+            "sub": user["id"], "email": user["email"], "aud": "authenticated", "role": "authenticated",
+            "iat": issued, "exp": issued + 3600,
+        }, STUB_JWT_SECRET, algorithm="HS256")
+        user["last_sign_in_at"] = now_iso()
+        return {"access_token": token, "refresh_token": secrets.token_urlsafe(16), "expires_in": 3600,
+                "expires_at": issued + 3600, "token_type": "bearer", "user": public_user(user)}
+
+    def user_by_email(email: str) -> Optional[Dict[str, Any]]:
+        return next((u for u in database.users.values() if u["email"] == email), None)
+
+    def user_from_request(request: Request) -> Optional[Dict[str, Any]]:
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        try:
+            claims = jwt.decode(token, STUB_JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+        except jwt.PyJWTError:
+            return None
+        return database.users.get(claims["sub"])
+
+    @app.post("/auth/v1/signup")
+    async def signup(request: Request):
+        body = await request.json()
+        existing = user_by_email(body.get("email"))
+        if existing and existing.get("email_confirmed_at"):
+            return auth_error(422, "User already registered")
+        user = existing or {
+            "id": str(uuid.uuid4()), "aud": "authenticated", "role": "authenticated", "email": body.get("email"),
+            "app_metadata": {"provider": "email"}, "user_metadata": (body.get("data") or {}),
+            "created_at": now_iso(), "email_confirmed_at": None,
+        }
+        user["password"] = body.get("password")
+        user["confirmation_sent_at"] = now_iso()
+        database.users[user["id"]] = user
+        return public_user(user)
+
+    @app.post("/auth/v1/verify")
+    async def verify(request: Request):
+        body = await request.json()
+        user = user_by_email(body.get("email"))
+        if user is None or body.get("token") != STUB_OTP:
+            return auth_error(403, "Token has expired or is invalid")
+        user["email_confirmed_at"] = user["confirmed_at"] = now_iso()
+        return session_for(user)
+
+    @app.post("/auth/v1/token")
+    async def token(request: Request):
+        body = await request.json()
+        user = user_by_email(body.get("email"))
+        if user is None or user.get("password") != body.get("password"):
+            return auth_error(400, "Invalid login credentials")
+        if not user.get("email_confirmed_at"):
+            return auth_error(400, "Email not confirmed")
+        return session_for(user)
+
+    @app.get("/auth/v1/user")
+    async def get_user(request: Request):
+        user = user_from_request(request)
+        return public_user(user) if user else auth_error(401, "Invalid JWT")
+
+    @app.put("/auth/v1/user")
+    async def update_user(request: Request):
+        user = user_from_request(request)
+        if user is None:
+            return auth_error(401, "Invalid JWT")
+        body = await request.json()
+        if "password" in body:
+            user["password"] = body["password"]
+        user["updated_at"] = now_iso()
+        return public_user(user)
+
+    @app.post("/auth/v1/recover")
+    async def recover():
+        return {}
+
+    @app.post("/auth/v1/logout")
+    async def logout():
+        return Response(status_code=204)
+
+    @app.get("/auth/v1/.well-known/jwks.json")
+    async def jwks():
+        return {"keys": []}
+
+    # --- Storage ---
+
+    @app.post("/storage/v1/object/upload/sign/{bucket}/{path:path}")
+    async def create_signed_upload_url(bucket: str, path: str):
+        return {"url": f"/object/upload/sign/{bucket}/{path}?token={secrets.token_urlsafe(16)}"}
+
+    @app.put("/storage/v1/object/upload/sign/{bucket}/{path:path}")
+    async def upload_to_signed_url(bucket: str, path: str, request: Request):
+        objects[f"{bucket}/{path}"] = await request.body()
+        return {"Key": f"{bucket}/{path}"}
+
+    @app.post("/storage/v1/object/sign/{bucket}/{path:path}")
+    async def create_signed_url(bucket: str, path: str):
+        return {"signedURL": f"/object/sign/{bucket}/{path}?token={secrets.token_urlsafe(16)}"}
+
+    @app.post("/storage/v1/object/sign/{bucket}")
+    async def create_signed_urls(bucket: str, request: Request):
+        body = await request.json()
+        return [{"path": path, "signedURL": f"/object/sign/{bucket}/{path}?token={secrets.token_urlsafe(16)}", "error": None}
+                if f"{bucket}/{path}" in objects else
+                {"path": path, "signedURL": None, "error": "Either the object does not exist or you do not have access to it"}
+                for path in body.get("paths", [])]
+
+    # After the sign routes, which it would otherwise shadow.
+    @app.api_route("/storage/v1/object/{bucket}/{path:path}", methods=["POST", "PUT"])
+    async def upload(bucket: str, path: str, request: Request):
+        objects[f"{bucket}/{path}"] = await request.body()
+        return {"Key": f"{bucket}/{path}", "Id": str(uuid.uuid4())}
+
+    @app.api_route("/storage/v1/object/{path:path}", methods=["GET", "HEAD"])
+    async def download(path: str, request: Request):
+        # Both /object/<bucket>/<path> and /object/{public|authenticated}/<bucket>/<path>.
+        visibility, _, rest = path.partition("/")
+        data = objects.get(rest if visibility in ("public", "authenticated") else path)
+        if data is None:
+            return JSONResponse({"statusCode": "404", "error": "not_found", "message": "Object not found"}, status_code=404)
+        return Response(b"" if request.method == "HEAD" else data, media_type="application/octet-stream",
+                        headers={"content-length": str(len(data))})
+
+    # --- Realtime ---
+
+    @app.websocket("/realtime/v1/websocket")
+    async def realtime_socket(websocket: WebSocket):
+        await websocket.accept()
+        queue: asyncio.Queue = asyncio.Queue()
+        channels: Dict[str, List[Dict[str, Any]]] = {}
+        # The topics whose broadcasts go back to this connection (`broadcast.self`).
+        echoed: Set[str] = set()
+        realtime.connections[id(websocket)] = (queue, channels)
+
+        async def writer():
+            while True:
+                await websocket.send_text(json.dumps(await queue.get()))
+
+        writer_task = asyncio.create_task(writer())
+        try:
+            while True:
+                message = json.loads(await websocket.receive_text())
+                topic, event, ref = message.get("topic"), message.get("event"), message.get("ref")
+                response: Dict[str, Any] = {}
+                if event == "phx_join":
+                    bindings = []
+                    for binding in (message.get("payload", {}).get("config", {}).get("postgres_changes") or []):
+                        bindings.append({**binding, "id": realtime.next_binding_id})
+                        realtime.next_binding_id += 1
+                    channels[topic] = bindings
+                    if (message.get("payload", {}).get("config", {}).get("broadcast") or {}).get("self"):
+                        echoed.add(topic)
+                    response = {"postgres_changes": bindings}
+                elif event == "phx_leave":
+                    channels.pop(topic, None)
+                    echoed.discard(topic)
+                elif event == "broadcast" and topic in echoed:
+                    queue.put_nowait({"topic": topic, "event": "broadcast", "ref": None, "payload": message.get("payload")})
+                queue.put_nowait({"topic": topic, "event": "phx_reply", "ref": ref,
+                                  "payload": {"status": "ok", "response": response}})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            writer_task.cancel()
+            realtime.connections.pop(id(websocket), None)
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the local Supabase stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every HTTP call, to stand in for the network.")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms / 1000), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
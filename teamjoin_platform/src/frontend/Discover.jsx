@@ -1,6 +1,6 @@
 // React for building components and managing state
 import { useState } from "react";
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import { fetchFeed, requestToJoinIdea } from "../lib/api";
 
 // Import our UI components from the design system
@@ -26,14 +26,22 @@ export default function Discover() {
   // State to track which category filter is selected
   const [selectedCategory, setSelectedCategory] = useState("All");
   
+  // State to track how the feed is sorted
+  const [sortBy, setSortBy] = useState("newest");
+
   // State to track which projects the user has requested to join
   const [requestedProjects, setRequestedProjects] = useState([]);
 
-  const { data: projects, isLoading, isError, error } = useQuery({
-    queryKey: ["feed"],
-    queryFn: fetchFeed,
+  // The feed comes in pages; each page carries the cursor of the next one
+  const rank = sortBy === "members" ? "members" : "recent";
+  const { data, isLoading, isError, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
+    queryKey: ["feed", rank],
+    queryFn: ({ pageParam }) => fetchFeed({ pageParam, rank }),
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
     staleTime: 1000 * 60 * 5, // 5 minutes
   });
+  const projects = data?.pages.flatMap((page) => page.items);
 
   const joinMutation = useMutation({
     mutationFn: requestToJoinIdea,
@@ -102,12 +110,11 @@ export default function Discover() {
         </div>
         
         <div className="flex items-center gap-4 ml-auto">
-          <Select defaultValue="trending">
+          <Select value={sortBy} onValueChange={setSortBy}>
             <SelectTrigger className="w-32">
               <SelectValue />
             </SelectTrigger>
             <SelectContent>
-              <SelectItem value="trending">Trending</SelectItem>
               <SelectItem value="newest">Newest</SelectItem>
               <SelectItem value="members">Most Members</SelectItem>
             </SelectContent>
@@ -154,7 +161,7 @@ export default function Discover() {
               <div className="flex items-center justify-between">
                 <div className="flex items-center gap-2 text-sm text-text-secondary">
                   <Users className="h-4 w-4" />
-                  <span>{project.members ? project.members.length : 0} members</span>
+                  <span>{project.member_count ?? 0} members</span>
                 </div>
                 
                 <div className="flex gap-2">
@@ -176,8 +183,17 @@ export default function Discover() {
         ))}
       </div>
 
+      {/* Load More - the search box only filters the ideas loaded so far */}
+      {hasNextPage && (
+        <div className="text-center">
+          <Button variant="outline" disabled={isFetchingNextPage} onClick={() => fetchNextPage()}>
+            {isFetchingNextPage ? "Loading..." : "Load more ideas"}
+          </Button>
+        </div>
+      )}
+
       {/* Empty State - Show when no projects match filters */}
-      {(!filteredProjects || filteredProjects.length === 0) && (
+      {(!filteredProjects || filteredProjects.length === 0) && !hasNextPage && (
         <div className="text-center py-12">
           <div className="w-24 h-24 mx-auto mb-4 bg-muted rounded-full flex items-center justify-center">
             <Users className="h-8 w-8 text-muted-foreground" />
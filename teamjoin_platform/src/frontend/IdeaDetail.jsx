@@ -70,7 +70,7 @@ function IdeaDetail() {
           <div className="flex items-center gap-4">
             {/* Project avatar */}
             <Avatar className="h-16 w-16">
-              <AvatarImage src={projectData.image_url || "/placeholder.svg"} />
+              <AvatarImage src={projectData.image_variants?.thumb || projectData.image_url || "/placeholder.svg"} />
               <AvatarFallback className="bg-brand-primary text-primary-foreground text-lg">
                 {projectData.title.slice(0, 2)}
               </AvatarFallback>
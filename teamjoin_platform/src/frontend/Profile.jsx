@@ -1,6 +1,6 @@
 // React for building components and managing state
 import { useState } from "react";
-import { useQuery } from "@tanstack/react-query";
+import { useInfiniteQuery, useQuery } from "@tanstack/react-query";
 import { fetchUserProfile, fetchUserIdeas, fetchUserTeams } from "../lib/api";
 
 // Import our UI components from the design system
@@ -23,11 +23,20 @@ export default function Profile() {
     staleTime: 1000 * 60 * 5, // 5 minutes
   });
 
-  const { data: ideas } = useQuery({
+  // The user's ideas come in pages; each page carries the cursor of the next one
+  const {
+    data: ideaPages,
+    fetchNextPage: fetchMoreIdeas,
+    hasNextPage: hasMoreIdeas,
+    isFetchingNextPage: isFetchingMoreIdeas,
+  } = useInfiniteQuery({
     queryKey: ["userIdeas"],
     queryFn: fetchUserIdeas,
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
     staleTime: 1000 * 60 * 5, // 5 minutes
   });
+  const ideas = ideaPages?.pages.flatMap((page) => page.items);
 
   const { data: teams } = useQuery({
     queryKey: ["userTeams"],
@@ -198,6 +207,14 @@ export default function Profile() {
               </Button>
             </div>
           ))}
+
+          {hasMoreIdeas && (
+            <div className="text-center">
+              <Button variant="outline" size="sm" disabled={isFetchingMoreIdeas} onClick={() => fetchMoreIdeas()}>
+                {isFetchingMoreIdeas ? "Loading..." : "Load more"}
+              </Button>
+            </div>
+          )}
           
           <div className="text-center text-sm text-text-secondary pt-4 border-t">
             You can have up to 3 pending requests. Keep exploring to find your next team.
@@ -81,7 +81,7 @@ export default function Search() {
                         </Avatar>
                         <div>
                           <CardTitle>{result.data.user_data?.name}</CardTitle>
-                          <p className="text-muted-foreground">{result.data.user?.email}</p>
+                          <p className="text-muted-foreground">{result.data.user_data?.title}</p>
                         </div>
                       </div>
                     </CardHeader>
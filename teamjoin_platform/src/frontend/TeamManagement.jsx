@@ -53,7 +53,7 @@ function TeamManagement() {
               <CardTitle className="flex items-center gap-2">
                 {/* Team avatar */}
                 <Avatar className="h-8 w-8">
-                  <AvatarImage src={team.image_url || "/placeholder.svg"} />
+                  <AvatarImage src={team.image_variants?.thumb || team.image_url || "/placeholder.svg"} />
                   <AvatarFallback className="bg-brand-primary text-primary-foreground">
                     {team.title.substring(0, 2)}
                   </AvatarFallback>
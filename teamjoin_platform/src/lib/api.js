@@ -81,13 +81,20 @@ export const updateUserProfile = async (profileData) => {
   return response.json();
 };
 
-export const fetchUserIdeas = async () => {
+// Returns one page of the user's ideas: `{ items, next_cursor }`. Pass `next_cursor`
+// back as `pageParam` to load the next page; it is null on the last page.
+export const fetchUserIdeas = async ({ pageParam } = {}) => {
   const token = localStorage.getItem("access_token");
   if (!token) {
     throw new Error("No authentication token found.");
   }
 
-  const response = await fetch(`${API_BASE_URL}/user/ideas`, {
+  const params = new URLSearchParams();
+  if (pageParam) {
+    params.set("cursor", pageParam);
+  }
+
+  const response = await fetch(`${API_BASE_URL}/user/ideas?${params}`, {
     method: "GET",
     headers: {
       "Content-Type": "application/json",
@@ -125,8 +132,16 @@ export const fetchUserTeams = async () => {
   return response.json();
 };
 
-export const fetchFeed = async () => {
-  const response = await fetch(`${API_BASE_URL}/feed/`, {
+// Returns one page of the feed: `{ items, next_cursor }`. Pass `next_cursor` back as
+// `pageParam` to load the next page; it is null on the last page. `rank` is
+// "recent" (newest first) or "members" (most members first).
+export const fetchFeed = async ({ pageParam, rank = "recent" } = {}) => {
+  const params = new URLSearchParams({ rank });
+  if (pageParam) {
+    params.set("cursor", pageParam);
+  }
+
+  const response = await fetch(`${API_BASE_URL}/feed/?${params}`, {
     method: "GET",
     headers: {
       "Content-Type": "application/json",
@@ -162,7 +162,7 @@ def create_idea_with_image_cli():
                 print("Could not get signed URL")
                 return
 
-            signed_url = signed_url_response["signed_url"]["signedUrl"]
+            signed_url = signed_url_response["signed_url"]
 
             # 2. Upload file to Supabase Storage
             with open(image_path, 'rb') as f: